@@ -9,3 +9,5 @@ app = Celery("config")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks()
+
+from config import celery_metrics  # noqa: E402,F401  Сигналы метрик задач и сервер метрик воркера
@@ -0,0 +1,189 @@
+"""
+Метрики задач Celery для Prometheus.
+
+При постановке задачи в очередь в заголовки сообщения записываются время постановки
+(enqueued_at) и время постановки исходной задачи цепочки (origin_enqueued_at): задача,
+поставленная из другой задачи, наследует его. Поэтому для send_telegram_batch видно время
+от постановки send_daily_reminders до доставки напоминаний.
+
+По сигналам воркера считаются:
+    - celery_tasks_total: Завершенные задачи по имени и результату (succeeded, failed, retried);
+    - celery_task_runtime_seconds: Время выполнения задачи;
+    - celery_task_queue_wait_seconds: Ожидание в очереди (от постановки или от eta до начала);
+    - celery_task_end_to_end_seconds: От постановки исходной задачи цепочки до завершения;
+    - celery_queue_length: Длина очередей брокера Redis (считывается при каждом сборе метрик).
+
+Воркер отдает метрики по HTTP на порту CELERY_METRICS_PORT (см. start_metrics_server).
+При пуле prefork нужен PROMETHEUS_MULTIPROC_DIR: задачи выполняются в дочерних процессах,
+и их метрики собираются из файлов.
+"""
+
+import os
+import shutil
+import time
+from datetime import datetime
+
+import redis
+from celery import current_task, signals
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+ENQUEUED_HEADER = "enqueued_at"
+ORIGIN_HEADER = "origin_enqueued_at"
+METRICS_PORT_ENV = "CELERY_METRICS_PORT"
+# Очереди Redis с приоритетами хранятся в отдельных списках: имя, имя + разделитель + приоритет
+PRIORITY_SEPARATOR = "\x06\x16"
+PRIORITY_STEPS = (0, 3, 6, 9)
+
+TASKS = Counter("celery_tasks_total", "Завершенные задачи Celery", ["task", "result"])
+RUNTIME = Histogram(
+    "celery_task_runtime_seconds",
+    "Время выполнения задачи Celery",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds",
+    "Ожидание задачи в очереди до начала выполнения",
+    ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+END_TO_END = Histogram(
+    "celery_task_end_to_end_seconds",
+    "Время от постановки исходной задачи цепочки до завершения задачи",
+    ["task"],
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 900, 1800, 3600),
+)
+
+_started = {}  # task_id -> время начала выполнения (perf_counter)
+
+
+def request_header(request, name):
+    """
+    Возвращает заголовок сообщения задачи: воркер переносит их в атрибуты request, apply() — в request.headers.
+    """
+    value = getattr(request, name, None)
+    if value is None:
+        value = (getattr(request, "headers", None) or {}).get(name)
+    return value
+
+
+@signals.before_task_publish.connect
+def add_enqueue_headers(headers=None, **kwargs):
+    if headers is None:
+        return
+    now = time.time()
+    headers[ENQUEUED_HEADER] = now
+    origin = request_header(current_task.request, ORIGIN_HEADER) if current_task else None
+    headers[ORIGIN_HEADER] = origin or now
+
+
+@signals.task_prerun.connect
+def task_started(task_id=None, task=None, **kwargs):
+    _started[task_id] = time.perf_counter()
+    enqueued_at = request_header(task.request, ENQUEUED_HEADER)
+    if enqueued_at is None:
+        return
+    # Для отложенной задачи (countdown, eta) ожидание считается от назначенного времени
+    eta = task.request.eta
+    if eta:
+        enqueued_at = max(enqueued_at, (datetime.fromisoformat(eta) if isinstance(eta, str) else eta).timestamp())
+    QUEUE_WAIT.labels(task.name).observe(max(time.time() - enqueued_at, 0))
+
+
+@signals.task_postrun.connect
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        RUNTIME.labels(task.name).observe(time.perf_counter() - started)
+    if state == "SUCCESS":
+        TASKS.labels(task.name, "succeeded").inc()
+        origin = request_header(task.request, ORIGIN_HEADER)
+        if origin is not None:
+            END_TO_END.labels(task.name).observe(max(time.time() - origin, 0))
+
+
+@signals.task_failure.connect
+def task_failed(sender=None, **kwargs):
+    TASKS.labels(sender.name, "failed").inc()
+
+
+@signals.task_retry.connect
+def task_retried(sender=None, **kwargs):
+    TASKS.labels(sender.name, "retried").inc()
+
+
+class QueueLengthCollector:
+    """
+    Сборщик длины очередей брокера Redis (LLEN списков очередей).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.client = redis.Redis.from_url(app.conf.broker_url, socket_timeout=2, socket_connect_timeout=2)
+
+    def queue_names(self):
+        """
+        Очереди воркера, очередь по умолчанию и очереди из CELERY_TASK_ROUTES (их обслуживают другие воркеры).
+        """
+        names = set(self.app.amqp.queues) | {self.app.conf.task_default_queue}
+        routes = self.app.conf.task_routes
+        if isinstance(routes, dict):
+            names.update(route["queue"] for route in routes.values() if isinstance(route, dict) and "queue" in route)
+        return sorted(names)
+
+    def collect(self):
+        family = GaugeMetricFamily("celery_queue_length", "Задачи в очереди брокера", labels=["queue"])
+        names = self.queue_names()
+        pipeline = self.client.pipeline(transaction=False)
+        for name in names:
+            for step in PRIORITY_STEPS:
+                pipeline.llen(f"{name}{PRIORITY_SEPARATOR}{step}" if step else name)
+        try:
+            lengths = pipeline.execute()
+        except redis.RedisError:
+            return
+        lengths = iter(lengths)
+        for name in names:
+            family.add_metric([name], sum(next(lengths) for _ in PRIORITY_STEPS))
+        yield family
+
+
+def metrics_registry(app):
+    """
+    Возвращает реестр метрик воркера: метрики задач (из всех процессов при PROMETHEUS_MULTIPROC_DIR) и очередей.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    if app.conf.broker_url and app.conf.broker_url.startswith(("redis://", "rediss://", "unix://")):
+        registry.register(QueueLengthCollector(app))
+    return registry
+
+
+@signals.worker_init.connect
+def reset_multiprocess_metrics(**kwargs):
+    """
+    Очищает каталог метрик prometheus_client от файлов прошлого запуска воркера.
+    """
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+@signals.worker_ready.connect
+def start_metrics_server(sender=None, **kwargs):
+    """
+    Запускает HTTP-сервер метрик в главном процессе воркера, если задан CELERY_METRICS_PORT.
+    """
+    port = os.getenv(METRICS_PORT_ENV)
+    if port:
+        start_http_server(int(port), registry=metrics_registry(sender.app))
+
+
+@signals.worker_process_shutdown.connect
+def mark_process_dead(pid=None, **kwargs):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,60 @@
+"""
+Бэкенд PostgreSQL с метриками соединений.
+
+Совпадает с django.db.backends.postgresql и дополнительно считает открытия соединений
+с базой (или с pgbouncer) и их длительность, открытые сейчас соединения и соединения,
+не прошедшие проверку CONN_HEALTH_CHECKS. По этим метрикам подбираются
+CONN_MAX_AGE и размеры пулов pgbouncer (см. config.pgbouncer).
+
+Каждому соединению добавляется обработчик выполнения SQL для метрик запросов
+(см. config.request_metrics).
+"""
+
+import time
+
+from django.db.backends.postgresql import base
+from prometheus_client import Counter, Gauge, Histogram
+
+from config.request_metrics import record_query
+
+CONNECT_LATENCY = Histogram(
+    "db_connect_seconds",
+    "Время открытия соединения с базой данных",
+    ["alias"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+OPEN_CONNECTIONS = Gauge(
+    "db_connections_open",
+    "Открытые соединения с базой данных",
+    ["alias"],
+    multiprocess_mode="livesum",
+)
+UNUSABLE_CONNECTIONS = Counter(
+    "db_connections_unusable",
+    "Соединения, не прошедшие проверку перед повторным использованием (CONN_HEALTH_CHECKS)",
+    ["alias"],
+)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.execute_wrappers.append(record_query)
+
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        CONNECT_LATENCY.labels(self.alias).observe(time.perf_counter() - started)
+        OPEN_CONNECTIONS.labels(self.alias).inc()
+        return connection
+
+    def _close(self):
+        if self.connection is not None and not self.connection.closed:
+            OPEN_CONNECTIONS.labels(self.alias).dec()
+        return super()._close()
+
+    def is_usable(self):
+        usable = super().is_usable()
+        if not usable:
+            UNUSABLE_CONNECTIONS.labels(self.alias).inc()
+        return usable
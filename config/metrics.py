@@ -0,0 +1,48 @@
+"""
+Точка выдачи метрик процесса в формате Prometheus.
+
+Если задана переменная окружения PROMETHEUS_MULTIPROC_DIR (несколько воркеров gunicorn),
+метрики собираются из файлов всех воркеров, иначе — только текущего процесса. Если задан
+PGBOUNCER_STATS_DSN, к ним добавляются метрики пулов pgbouncer (см. config.pgbouncer).
+
+Точка доступна только сотрудникам (is_staff) и сборщику метрик с заголовком
+Authorization: Bearer <METRICS_TOKEN>; остальным отвечает 404, как несуществующий маршрут.
+"""
+
+import hmac
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+from config import pgbouncer
+
+
+def metrics(request):
+    """
+    Отдает текущие значения метрик процесса (счетчики и гистограммы prometheus_client).
+    """
+    if not has_access(request):
+        raise Http404
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    content = generate_latest(registry)
+    pool_registry = pgbouncer.registry()
+    if pool_registry is not None:
+        content += generate_latest(pool_registry)
+    return HttpResponse(content, content_type=CONTENT_TYPE_LATEST)
+
+
+def has_access(request):
+    """
+    Проверяет, что метрики запрашивает сотрудник или сборщик с токеном METRICS_TOKEN.
+    """
+    if request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
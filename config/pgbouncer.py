@@ -0,0 +1,92 @@
+"""
+Метрики пулов pgbouncer для Prometheus.
+
+При каждом сборе метрик выполняется SHOW POOLS в консоли администратора pgbouncer
+(база pgbouncer, пользователь из ADMIN_USERS или STATS_USERS) и для каждого пула
+(база, пользователь) отдаются занятые и ожидающие клиенты, занятые и свободные
+соединения с сервером и максимальное время ожидания клиента. Если pgbouncer недоступен,
+pgbouncer_up равно 0.
+
+Функции:
+    - registry: Реестр с метриками pgbouncer, если задан PGBOUNCER_STATS_DSN.
+"""
+
+import psycopg2
+from django.conf import settings
+from prometheus_client import CollectorRegistry
+from prometheus_client.core import GaugeMetricFamily
+
+CONNECT_TIMEOUT = 2  # Секунды: сбор метрик не должен зависать, если pgbouncer недоступен
+
+# Столбец SHOW POOLS -> имя и описание метрики
+POOL_COLUMNS = {
+    "cl_active": ("pgbouncer_pool_client_active", "Клиенты, привязанные к соединению с сервером или простаивающие"),
+    "cl_waiting": ("pgbouncer_pool_client_waiting", "Клиенты, ожидающие свободное соединение с сервером"),
+    "sv_active": ("pgbouncer_pool_server_active", "Соединения с сервером, занятые клиентами"),
+    "sv_idle": ("pgbouncer_pool_server_idle", "Свободные соединения с сервером"),
+    "sv_used": ("pgbouncer_pool_server_used", "Соединения с сервером, ожидающие проверки перед выдачей"),
+    "sv_login": ("pgbouncer_pool_server_login", "Соединения с сервером в процессе открытия"),
+}
+
+
+class PgbouncerCollector:
+    """
+    Сборщик метрик пулов pgbouncer (SHOW POOLS).
+    """
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+
+    def collect(self):
+        up = GaugeMetricFamily("pgbouncer_up", "Доступна ли консоль администратора pgbouncer")
+        try:
+            rows = self.fetch_pools()
+        except psycopg2.Error:
+            up.add_metric([], 0)
+            yield up
+            return
+        up.add_metric([], 1)
+        yield up
+
+        families = {
+            column: GaugeMetricFamily(name, documentation, labels=["database", "user"])
+            for column, (name, documentation) in POOL_COLUMNS.items()
+        }
+        max_wait = GaugeMetricFamily(
+            "pgbouncer_pool_max_wait_seconds",
+            "Сколько ждет самый старый клиент в очереди пула",
+            labels=["database", "user"],
+        )
+        for row in rows:
+            labels = [row["database"], row["user"]]
+            for column, family in families.items():
+                family.add_metric(labels, int(row.get(column) or 0))
+            max_wait.add_metric(labels, int(row.get("maxwait") or 0) + int(row.get("maxwait_us") or 0) / 1_000_000)
+        yield from families.values()
+        yield max_wait
+
+    def fetch_pools(self):
+        """
+        Возвращает строки SHOW POOLS в виде словарей (столбцы зависят от версии pgbouncer).
+        """
+        connection = psycopg2.connect(self.dsn, connect_timeout=CONNECT_TIMEOUT)
+        try:
+            # Консоль администратора не поддерживает транзакции
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute("SHOW POOLS")
+                columns = [column.name for column in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            connection.close()
+
+
+def registry():
+    """
+    Возвращает реестр с метриками pgbouncer или None, если PGBOUNCER_STATS_DSN не задан.
+    """
+    if not settings.PGBOUNCER_STATS_DSN:
+        return None
+    result = CollectorRegistry()
+    result.register(PgbouncerCollector(settings.PGBOUNCER_STATS_DSN))
+    return result
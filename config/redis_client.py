@@ -0,0 +1,21 @@
+"""
+Общий клиент Redis для служебных структур (ограничение частоты, кэши, журналы доставки).
+
+Используется REDIS_URL, а если он не задан — брокер Celery, когда это Redis.
+"""
+
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    """
+    Возвращает клиент Redis процесса или None, если Redis не настроен.
+    """
+    url = settings.REDIS_URL or settings.CELERY_BROKER_URL
+    if not url or not url.startswith(("redis://", "rediss://", "unix://")):
+        return None
+    return redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2, health_check_interval=30)
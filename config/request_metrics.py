@@ -0,0 +1,186 @@
+"""
+Метрики запросов: число SQL-запросов, время в базе, общее время и размер ответа.
+
+Включается настройкой REQUEST_METRICS_ENABLED; иначе middleware не подключается.
+Для каждого запроса:
+    - в заголовок Server-Timing добавляются db (время в базе и число запросов) и total;
+    - в гистограммы Prometheus (метка view — имя маршрута, например habits:habit-detail)
+      записываются число запросов, время в базе, общее время и размер ответа;
+    - запрос дольше REQUEST_METRICS_SLOW_MS записывается в журнал вместе с самыми
+      долгими SQL-запросами (одинаковые запросы суммируются).
+
+SQL-запросы учитываются обработчиком выполнения, который бэкенд config.db_backend
+добавляет каждому соединению. Учет ведется в переменной контекста, поэтому работает и
+для синхронных, и для асинхронных представлений; вне запроса обработчик ничего не делает.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+SLOW_LOG_STATEMENTS = 5  # Сколько самых долгих SQL-запросов записывается в журнал медленного запроса
+SLOW_LOG_SQL_LENGTH = 1000  # До скольких символов сокращается текст SQL в журнале
+
+QUERIES = Histogram(
+    "http_request_db_queries",
+    "Число SQL-запросов на HTTP-запрос",
+    ["view"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+DB_LATENCY = Histogram(
+    "http_request_db_seconds",
+    "Время выполнения SQL-запросов на HTTP-запрос",
+    ["view"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса (включая middleware)",
+    ["view", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Размер тела ответа (для потоковых ответов не учитывается)",
+    ["view"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+
+current = ContextVar("request_metrics", default=None)
+
+
+class QueryRecorder:
+    """
+    Накопитель SQL-запросов одного HTTP-запроса.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def add(self, sql, duration):
+        self.queries.append((sql, duration))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def top(self, limit=SLOW_LOG_STATEMENTS):
+        """
+        Возвращает самые долгие SQL-запросы: [(sql, число выполнений, суммарное время), ...].
+        """
+        totals = defaultdict(lambda: [0, 0.0])
+        for sql, duration in self.queries:
+            totals[sql][0] += 1
+            totals[sql][1] += duration
+        statements = sorted(((sql, count, total) for sql, (count, total) in totals.items()), key=lambda item: -item[2])
+        return statements[:limit]
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обработчик выполнения SQL (connection.execute_wrapper): учитывает запрос в текущем HTTP-запросе.
+    """
+    recorder = current.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add(sql, time.perf_counter() - started)
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware метрик запросов (см. описание модуля).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.slow_seconds = settings.REQUEST_METRICS_SLOW_MS / 1000
+        self.histograms = {}  # (view, method) -> дочерние гистограммы с метками (labels() заметно дороже)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        recorder, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.finish(request, response, recorder, started)
+
+    @staticmethod
+    def start():
+        recorder = QueryRecorder()
+        return recorder, current.set(recorder), time.perf_counter()
+
+    def finish(self, request, response, recorder, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else "<unresolved>"
+        db_duration = recorder.duration
+
+        histograms = self.histograms.get((view, request.method))
+        if histograms is None:
+            histograms = self.histograms[view, request.method] = (
+                QUERIES.labels(view),
+                DB_LATENCY.labels(view),
+                LATENCY.labels(view, request.method),
+                RESPONSE_SIZE.labels(view),
+            )
+        queries, db_latency, latency, response_size = histograms
+        queries.observe(recorder.count)
+        db_latency.observe(db_duration)
+        latency.observe(duration)
+        if not response.streaming:
+            response_size.observe(len(response.content))
+
+        timing = f'db;dur={db_duration * 1000:.1f};desc="{recorder.count} queries", total;dur={duration * 1000:.1f}'
+        if response.has_header("Server-Timing"):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response["Server-Timing"] = timing
+
+        if duration >= self.slow_seconds:
+            statements = "\n".join(
+                f"  {total * 1000:.1f} мс, {count}x: {sql[:SLOW_LOG_SQL_LENGTH]}"
+                for sql, count, total in recorder.top()
+            )
+            logger.warning(
+                "Медленный запрос %s %s (%s): %.1f мс, SQL-запросов %d, в базе %.1f мс\n%s",
+                request.method,
+                request.get_full_path(),
+                view,
+                duration * 1000,
+                recorder.count,
+                db_duration * 1000,
+                statements,
+            )
+        return response
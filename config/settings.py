@@ -12,7 +12,7 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 
 DEBUG = os.getenv("DEBUG") == "True"
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host.strip() for host in os.getenv("ALLOWED_HOSTS", "").split(",") if host.strip()]
 
 
 INSTALLED_APPS = [
@@ -33,6 +33,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",  # Статические файлы без обращения к представлениям Django
+    "config.request_metrics.RequestMetricsMiddleware",  # Метрики запросов, если REQUEST_METRICS_ENABLED
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -65,14 +67,22 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "config.db_backend",  # PostgreSQL с метриками соединений
         "NAME": os.getenv("POSTGRES_DB"),
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT"),
+        # Сколько секунд соединение переиспользуется между запросами и задачами (0 — закрывается после каждого).
+        # Под ASGI каждый запрос выполняется в новом потоке, поэтому там нужен 0 и пул pgbouncer
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,  # Переиспользуемое соединение проверяется перед первым запросом
+        # Серверные курсоры (iterator) остаются включенными: через pgbouncer в режиме transaction они работают
+        # только внутри транзакции, поэтому потоковое чтение выполняется в transaction.atomic()
     }
 }
+# Консоль администратора pgbouncer для метрик пулов, например "host=pgbouncer port=6432 dbname=pgbouncer user=..."
+PGBOUNCER_STATS_DSN = os.getenv("PGBOUNCER_STATS_DSN")
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -101,12 +111,32 @@ USE_TZ = True
 
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"  # Сюда collectstatic собирает файлы для WhiteNoise
+
+# Имена с хэшем содержимого (можно кэшировать навсегда) требуют collectstatic, поэтому включаются в продакшене
+STATIC_MANIFEST = os.getenv("STATIC_MANIFEST") == "True"
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    # collectstatic заранее сохраняет сжатые gzip/brotli копии файлов
+    "staticfiles": {
+        "BACKEND": (
+            "whitenoise.storage.CompressedManifestStaticFilesStorage"
+            if STATIC_MANIFEST
+            else "whitenoise.storage.CompressedStaticFilesStorage"
+        )
+    },
+}
 
 MEDIA_URL = "media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
 AUTH_USER_MODEL = "users.Users"
 
+# Блокировать ли пользователей, которые ни разу не входили: last_login пишется только с UPDATE_LAST_LOGIN,
+# поэтому у учетных записей, входивших до его включения, last_login пуст
+BLOCK_NEVER_LOGGED_IN_USERS = os.getenv("BLOCK_NEVER_LOGGED_IN_USERS") == "True"
+BLOCK_INACTIVE_USERS_BATCH_SIZE = int(os.getenv("BLOCK_INACTIVE_USERS_BATCH_SIZE", 0))  # 0 — одним UPDATE
+
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -122,7 +152,7 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",  # JWT авторизация
+        "users.authentication.StatelessJWTAuthentication",  # JWT авторизация без запроса пользователя к базе
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",  # Закрываем доступ авторизацией по умолчанию
@@ -134,7 +164,28 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "UPDATE_LAST_LOGIN": True,  # Вход через users/login/ обновляет last_login (по нему блокируются неактивные)
 }
+# Метрики запросов (SQL, время, размер ответа) в Server-Timing и /metrics/, журнал медленных запросов
+REQUEST_METRICS_ENABLED = os.getenv("REQUEST_METRICS_ENABLED") == "True"
+REQUEST_METRICS_SLOW_MS = int(os.getenv("REQUEST_METRICS_SLOW_MS", 500))
+# Токен сборщика метрик: /metrics/ отдается с заголовком Authorization: Bearer <токен> или сотрудникам
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Сколько секунд кэшируется состояние учетной записи (is_active и т.д.): за это время вступает в силу блокировка
+AUTH_USER_STATE_TIMEOUT = int(os.getenv("AUTH_USER_STATE_TIMEOUT", 30))
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
+PUBLIC_FEED_CACHE_TIMEOUT = int(os.getenv("PUBLIC_FEED_CACHE_TIMEOUT", 300))  # Время жизни страниц ленты, сек.
 
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_BROKER_URL")
@@ -144,6 +195,36 @@ CELERY_TASK_TIME_LIMIT = 30 * 60
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 
+# Очереди задач (у каждой свой воркер, см. docker-compose.yaml):
+#   - telegram: отправка напоминаний — срочные задачи, ожидающие сеть; пул потоков с большой concurrency;
+#   - scheduling: выборка привычек и постановка отправки в очередь — короткие задачи раз в минуту;
+#   - maintenance: обслуживание базы (блокировка пользователей, секции журнала) — долгие задачи, prefork.
+# Незамаршрутизированные задачи попадают в очередь по умолчанию celery, ее обслуживает воркер maintenance.
+CELERY_TASK_ROUTES = {
+    "habits.tasks.send_telegram_message": {"queue": "telegram"},
+    "habits.tasks.send_telegram_batch": {"queue": "telegram"},
+    "habits.tasks.send_due_reminders": {"queue": "scheduling"},
+    "habits.tasks.send_daily_reminders": {"queue": "scheduling"},
+    "habits.tasks.retry_failed_reminders": {"queue": "scheduling"},
+    "users.tasks.block_inactive_users": {"queue": "maintenance"},
+    "habits.tasks.create_completion_partitions": {"queue": "maintenance"},
+    "habits.tasks.purge_reminder_deliveries": {"queue": "maintenance"},
+}
+# Подтверждение после выполнения (задача не теряется при падении воркера, но может выполниться повторно)
+# включено только для задач, которые безопасно повторить: отправки защищены журналом доставки (habits.ledger),
+# send_due_reminders сдвигает срок в той же транзакции, обслуживание безопасно повторяется.
+# Рассылки по расписанию (send_daily_reminders, retry_failed_reminders) подтверждаются при получении:
+# следующий запуск beat все равно подберет пропущенное, а повторная доставка лишь заново обошла бы привычки.
+CELERY_TASK_ANNOTATIONS = {
+    "habits.tasks.send_telegram_message": {"acks_late": True},
+    "habits.tasks.send_telegram_batch": {"acks_late": True},
+    "habits.tasks.send_due_reminders": {"acks_late": True},
+    "users.tasks.block_inactive_users": {"acks_late": True},
+    "habits.tasks.create_completion_partitions": {"acks_late": True},
+    "habits.tasks.purge_reminder_deliveries": {"acks_late": True},
+}
+CELERY_TASK_REJECT_ON_WORKER_LOST = True  # Задачи с acks_late возвращаются в очередь, если процесс воркера погиб
+
 CELERY_BEAT_SCHEDULE = {
     "block-inactive-users-every-day": {
         "task": "users.tasks.block_inactive_users",
@@ -152,17 +233,44 @@ CELERY_BEAT_SCHEDULE = {
             "expires": 3600,
         },
     },
-    "send-daily-reminders": {
-        "task": "habits.tasks.send_daily_reminders",
-        "schedule": crontab(hour=8, minute=0),  # Напоминания каждый день в 8 утра
+    "send-due-reminders-every-minute": {
+        "task": "habits.tasks.send_due_reminders",
+        "schedule": crontab(),  # Каждую минуту отправляем напоминания, срок которых наступил
+        "options": {
+            "expires": 55,
+        },
+    },
+    "retry-failed-reminders-every-10-minutes": {
+        "task": "habits.tasks.retry_failed_reminders",
+        "schedule": crontab(minute="*/10"),  # Повторяем неудачные напоминания по журналу доставки
+        "options": {
+            "expires": 540,
+        },
+    },
+    "purge-reminder-deliveries-every-day": {
+        "task": "habits.tasks.purge_reminder_deliveries",
+        "schedule": crontab(hour=4, minute=0),  # Удаляем старые записи журнала доставки
+        "options": {
+            "expires": 3600,
+        },
+    },
+    "create-completion-partitions-every-day": {
+        "task": "habits.tasks.create_completion_partitions",
+        "schedule": crontab(hour=3, minute=0),  # Заранее создаем секции журнала выполнений
         "options": {
             "expires": 3600,
         },
     },
 }
 
-TELEGRAM_URL = "http://api.telegram.org/bot"
+TELEGRAM_URL = os.getenv("TELEGRAM_URL", "https://api.telegram.org/bot")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_GLOBAL_RATE_LIMIT = float(os.getenv("TELEGRAM_GLOBAL_RATE_LIMIT", 30))  # Сообщений в секунду на бота
+TELEGRAM_CHAT_RATE_LIMIT = float(os.getenv("TELEGRAM_CHAT_RATE_LIMIT", 1))  # Сообщений в секунду в один чат
+# Соединений с Telegram на процесс воркера: не меньше числа потоков воркера очереди telegram
+TELEGRAM_POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", 10))
+# Сколько сообщений пачки напоминаний отправляется одновременно (асинхронный клиент, одно соединение на запрос)
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv("TELEGRAM_SEND_CONCURRENCY", 20))
 
 
 CORS_ALLOWED_ORIGINS = [
@@ -8,15 +8,21 @@
     - "swagger<format>/": Представление схемы API в формате JSON или YAML.
     - "swagger/": Интерфейс Swagger для визуализации API документации.
     - "redoc/": Интерфейс ReDoc для визуализации API документации.
+    - "metrics/": Метрики процесса в формате Prometheus.
+
+Статические файлы в режиме DEBUG отдаются маршрутами staticfiles (под ASGI-сервером нет runserver).
 """
 
 from django.contrib import admin
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import path, include
 
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from config.metrics import metrics
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Snippets API",
@@ -41,4 +47,7 @@ urlpatterns = [
         name="schema-swagger-ui",
     ),
     path("redoc/", schema_view.with_ui("redoc", cache_timeout=0), name="schema-redoc"),
+    path("metrics/", metrics, name="metrics"),
 ]
+
+urlpatterns += staticfiles_urlpatterns()
@@ -0,0 +1,327 @@
+"""
+Выгрузка привычек с данными пользователей для продуктовой аналитики.
+
+Привычки читаются из базы потоком (серверный курсор) пачками по batch_size строк.
+Каждая пачка превращается в столбцы и сразу записывается в выходной формат, поэтому
+память не зависит от числа строк:
+    - parquet: Apache Parquet, одна группа строк на пачку (нужен pyarrow);
+    - arrow: поток Arrow IPC (нужен pyarrow);
+    - csv: CSV с заголовком (через pyarrow, если он установлен, иначе модулем csv).
+
+Сводка (распределения по времени суток, периодичности и длительности, доля публичных
+привычек) считается по тем же пачкам с помощью numpy.bincount: накапливаются только
+счетчики значений, а процентили считаются по ним точно, без хранения самих значений.
+
+Функции:
+    - available_formats: Форматы выгрузки, доступные в текущем окружении.
+    - export_chunks: Генератор байтов выгрузки в заданном формате.
+    - summarize: Сводка по привычкам без выгрузки строк.
+    - percentiles: Точные процентили по счетчикам целых значений.
+    - top_values: Самые частые значения текстового поля привычек.
+"""
+
+import csv
+import io
+from itertools import islice
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, IntegerField
+from django.db.models.functions import Cast, ExtractHour, ExtractMinute, ExtractSecond
+from habits.models import Habit
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow необязателен, остается выгрузка в CSV
+    pa = None
+
+EXPORT_BATCH_SIZE = 50_000  # Сколько строк читается с сервера и записывается за раз
+PERCENTILES = (50, 90, 95, 99)
+EXECUTION_TIME_BUCKET = 10  # Ширина интервала гистограммы длительности, секунды
+TOP_VALUES_LIMIT = 20  # Сколько самых частых действий и мест включать в сводку
+
+# Столбцы выгрузки: имя столбца и выражение для values_list
+COLUMNS = {
+    "id": F("id"),
+    "user_id": F("user_id"),
+    "user_city": F("user__city"),
+    "user_date_joined": F("user__date_joined"),
+    "action": F("action"),
+    "place": F("place"),
+    # Время суток в секундах: так его можно сразу обрабатывать numpy без разбора datetime.time
+    "time": Cast(
+        ExtractHour("time") * 3600 + ExtractMinute("time") * 60 + ExtractSecond("time"), output_field=IntegerField()
+    ),
+    "is_pleasant": F("is_pleasant"),
+    "periodicity": F("periodicity"),
+    "execution_time": F("execution_time"),
+    "is_public": F("is_public"),
+}
+
+CONTENT_TYPES = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "csv": ("text/csv", "csv"),
+}
+
+
+def available_formats():
+    """
+    Возвращает форматы выгрузки, доступные в текущем окружении (parquet и arrow требуют pyarrow).
+    """
+    return list(CONTENT_TYPES) if pa is not None else ["csv"]
+
+
+def arrow_schema():
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("user_id", pa.int64()),
+            ("user_city", pa.string()),
+            ("user_date_joined", pa.timestamp("us", tz="UTC")),
+            ("action", pa.string()),
+            ("place", pa.string()),
+            ("time", pa.time32("s")),
+            ("is_pleasant", pa.bool_()),
+            ("periodicity", pa.int32()),
+            ("execution_time", pa.int32()),
+            ("is_public", pa.bool_()),
+        ]
+    )
+
+
+def habit_batches(queryset=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Читает привычки потоком (серверный курсор внутри транзакции) и возвращает их пачками столбцов.
+
+    Yields:
+        dict: Имя столбца -> кортеж значений пачки.
+    """
+    queryset = Habit.objects.all() if queryset is None else queryset
+    rows = (
+        queryset.order_by("id")
+        .annotate(**{f"export_{name}": expression for name, expression in COLUMNS.items()})
+        .values_list(*(f"export_{name}" for name in COLUMNS))
+        .iterator(chunk_size=batch_size)
+    )
+    with transaction.atomic(savepoint=False):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield dict(zip(COLUMNS, zip(*batch)))
+
+
+class HabitSummary:
+    """
+    Сводка по привычкам, накапливаемая по пачкам столбцов.
+
+    Хранит только счетчики значений (numpy.bincount), поэтому память не зависит от числа строк.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.public = 0
+        self.pleasant = 0
+        self.hours = np.zeros(24, dtype=np.int64)
+        self.periodicity = np.zeros(0, dtype=np.int64)
+        self.execution_time = np.zeros(0, dtype=np.int64)
+
+    def add(self, batch):
+        """
+        Учитывает пачку столбцов (см. habit_batches).
+        """
+        self.total += len(batch["id"])
+        self.public += int(np.count_nonzero(np.asarray(batch["is_public"], dtype=bool)))
+        self.pleasant += int(np.count_nonzero(np.asarray(batch["is_pleasant"], dtype=bool)))
+        self.hours += np.bincount(np.asarray(batch["time"], dtype=np.int64) // 3600, minlength=24)[:24]
+        self.periodicity = _add_counts(self.periodicity, np.asarray(batch["periodicity"], dtype=np.int64))
+        self.execution_time = _add_counts(self.execution_time, np.asarray(batch["execution_time"], dtype=np.int64))
+
+    def as_dict(self):
+        """
+        Возвращает сводку в виде, пригодном для JSON.
+        """
+        starts = np.arange(0, len(self.execution_time), EXECUTION_TIME_BUCKET)
+        buckets = np.add.reduceat(self.execution_time, starts) if len(starts) else []
+        return {
+            "total": self.total,
+            "public": self.public,
+            "private": self.total - self.public,
+            "public_ratio": round(self.public / self.total, 4) if self.total else None,
+            "pleasant": self.pleasant,
+            "time_of_day_histogram": self.hours.tolist(),
+            "periodicity_distribution": {
+                int(value): int(count) for value, count in enumerate(self.periodicity) if count
+            },
+            "periodicity_percentiles": percentiles(self.periodicity),
+            "execution_time_histogram": {
+                f"{start}-{start + EXECUTION_TIME_BUCKET - 1}": int(count)
+                for start, count in zip(starts.tolist(), buckets)
+                if count
+            },
+            "execution_time_percentiles": percentiles(self.execution_time),
+        }
+
+
+def _add_counts(counts, values):
+    """
+    Прибавляет к счетчикам значений счетчики новой пачки, расширяя массив при необходимости.
+    """
+    batch_counts = np.bincount(values, minlength=len(counts))
+    batch_counts[: len(counts)] += counts
+    return batch_counts
+
+
+def percentiles(counts, levels=PERCENTILES):
+    """
+    Возвращает точные процентили целых значений по их счетчикам.
+
+    Результат совпадает с numpy.percentile (линейная интерполяция) по исходным значениям,
+    но для расчета нужны только счетчики.
+
+    Args:
+        counts (numpy.ndarray): counts[v] — сколько раз встретилось значение v.
+        levels (tuple): Уровни процентилей.
+
+    Returns:
+        dict: {"p50": значение, ...}; для пустых данных значения равны None.
+    """
+    total = int(counts.sum())
+    if not total:
+        return {f"p{level}": None for level in levels}
+    cumulative = np.cumsum(counts)
+    ranks = np.asarray(levels, dtype=float) / 100 * (total - 1)
+    lower = np.searchsorted(cumulative, np.floor(ranks), side="right")
+    upper = np.searchsorted(cumulative, np.ceil(ranks), side="right")
+    values = lower + (upper - lower) * (ranks - np.floor(ranks))
+    return {f"p{level}": round(float(value), 2) for level, value in zip(levels, values)}
+
+
+def top_values(field, limit=TOP_VALUES_LIMIT, queryset=None):
+    """
+    Возвращает самые частые значения текстового поля привычек (группировка выполняется в базе).
+    """
+    queryset = Habit.objects.all() if queryset is None else queryset
+    rows = queryset.values(field).order_by().annotate(count=Count("id")).order_by("-count", field)[:limit]
+    return [{"value": row[field], "count": row["count"]} for row in rows]
+
+
+def summarize(queryset=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Считает сводку по привычкам за один потоковый проход и добавляет самые частые действия и места.
+
+    Returns:
+        dict: Сводка (см. HabitSummary.as_dict) с ключами top_actions и top_places.
+    """
+    summary = HabitSummary()
+    for batch in habit_batches(queryset, batch_size):
+        summary.add(batch)
+    return {
+        **summary.as_dict(),
+        "top_actions": top_values("action", queryset=queryset),
+        "top_places": top_values("place", queryset=queryset),
+    }
+
+
+def export_chunks(output_format, summary=None, queryset=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Выгружает привычки в заданном формате по мере чтения из базы.
+
+    Args:
+        output_format (str): parquet, arrow или csv (см. available_formats).
+        summary (HabitSummary, optional): Сводка, которую нужно накопить по тем же пачкам.
+        queryset (QuerySet, optional): Привычки для выгрузки. По умолчанию — все.
+        batch_size (int): Сколько строк читается и записывается за раз.
+
+    Yields:
+        bytes: Очередная часть выгрузки.
+    """
+    if output_format not in available_formats():
+        raise ValueError(f"Формат выгрузки {output_format} недоступен.")
+
+    sink = _ChunkSink()
+    writer = _make_writer(output_format, sink)
+    for batch in habit_batches(queryset, batch_size):
+        if summary is not None:
+            summary.add(batch)
+        writer.write(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Файлоподобный приемник, отдающий записанные байты частями (для потоковой выгрузки).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class _ArrowWriter:
+    def __init__(self, output_format, sink):
+        self.schema = arrow_schema()
+        if output_format == "parquet":
+            self.writer = pq.ParquetWriter(sink, self.schema)
+        elif output_format == "arrow":
+            self.writer = pa.ipc.new_stream(sink, self.schema)
+        else:
+            self.writer = pa_csv.CSVWriter(sink, self.schema)
+
+    def write(self, batch):
+        arrays = [pa.array(batch[field.name], type=field.type) for field in self.schema]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class _CsvWriter:
+    def __init__(self, sink):
+        self.sink = sink
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(COLUMNS)
+        self._flush()
+
+    def write(self, batch):
+        times = [f"{value // 3600:02d}:{value // 60 % 60:02d}:{value % 60:02d}" for value in batch["time"]]
+        batch = dict(batch, time=times)
+        self.writer.writerows(zip(*(batch[name] for name in COLUMNS)))
+        self._flush()
+
+    def _flush(self):
+        self.sink.write(self.buffer.getvalue().encode())
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+    def close(self):
+        pass
+
+
+def _make_writer(output_format, sink):
+    if pa is None:
+        return _CsvWriter(sink)
+    return _ArrowWriter(output_format, sink)
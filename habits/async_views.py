@@ -0,0 +1,213 @@
+"""
+Асинхронные представления API привычек для запуска под ASGI.
+
+Представления написаны на асинхронном ORM Django (aget, async for) и не занимают поток
+воркера на время запросов к Postgres. Формат ответов совпадает с синхронными
+представлениями: привычки кодируются быстрым путем (см. encoders), страницы списков
+используют те же курсоры, что и HabitPagination, ошибки имеют вид {"detail": ...}.
+
+Представления:
+    - habit_list: Список привычек текущего пользователя.
+    - habit_detail: Привычка текущего пользователя.
+    - public_habit_list: Лента публичных привычек (с кэшем и условными запросами).
+    - habit_remind: Постановка напоминания о привычке в очередь.
+"""
+
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework import exceptions, status
+from rest_framework.pagination import Cursor
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from habits import encoders, feed_cache
+from habits.models import Habit
+from habits.tasks import send_telegram_message
+from habits.views import HabitPagination
+from users.authentication import aget_user
+
+
+class AsyncHabitPagination(HabitPagination):
+    """
+    Курсорная пагинация HabitPagination с асинхронной выборкой страницы.
+
+    Курсор разбирается, а ссылки next/previous строятся публичными методами CursorPagination
+    (decode_cursor, get_paginated_response), поэтому они совместимы с синхронными представлениями.
+    Здесь только выбирается окно строк после курсора (async for) и заполняется состояние страницы,
+    которое читают эти методы. Строки — словари из encoders.habit_values.
+    """
+
+    async def apaginate_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, None)
+        self.cursor = self.decode_cursor(request)
+        cursor = self.cursor or Cursor(offset=0, reverse=False, position=None)
+
+        # Порядок HabitPagination — по возрастанию уникального id, обратный курсор идет от позиции вниз
+        field = self.ordering[0]
+        queryset = queryset.order_by(f"-{field}" if cursor.reverse else field)
+        if cursor.position is not None:
+            lookup = "lt" if cursor.reverse else "gt"
+            queryset = queryset.filter(**{f"{field}__{lookup}": cursor.position})
+        start, stop = cursor.offset, cursor.offset + self.page_size + 1
+        rows = [row async for row in queryset[start:stop]]
+        self.page = rows[: self.page_size]
+
+        # Позиция строки после страницы — строкой, как ее сравнивает и кодирует CursorPagination
+        following = str(rows[-1][field]) if len(rows) > self.page_size else None
+        behind = cursor.position is not None or start > 0
+        if cursor.reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = behind, cursor.position
+            self.has_previous, self.previous_position = following is not None, following
+        else:
+            self.has_next, self.next_position = following is not None, following
+            self.has_previous, self.previous_position = behind, cursor.position
+        return self.page
+
+
+async def aauthenticate(request):
+    """
+    Асинхронно аутентифицирует запрос по JWT (как StatelessJWTAuthentication, но с асинхронным кэшем и ORM).
+
+    Returns:
+        StatelessUser | None: Пользователь или None, если токен не передан.
+
+    Raises:
+        AuthenticationFailed: Токен недействителен или пользователь не найден либо заблокирован.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    return await aget_user(authentication.get_validated_token(raw_token))
+
+
+def async_api_view(methods=("GET",), authenticated=True):
+    """
+    Декоратор асинхронного представления API: проверка метода, JWT-аутентификация и ошибки в формате DRF.
+
+    Args:
+        methods (tuple): Допустимые методы запроса.
+        authenticated (bool): Требуется ли аутентификация (иначе токен проверяется, только если передан).
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                user = await aauthenticate(request)
+                if authenticated and user is None:
+                    raise exceptions.NotAuthenticated()
+                drf_request = Request(request)
+                drf_request.user = user
+                return await view(drf_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+
+        # Аутентификация по заголовку Authorization, CSRF-токен не нужен (как у APIView)
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+def error_response(exc):
+    """
+    Возвращает ответ с ошибкой в том же виде, что и обработчик исключений DRF.
+    """
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+    response = HttpResponse(JSONRenderer().render(data), status=exc.status_code, content_type="application/json")
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response["WWW-Authenticate"] = JWTAuthentication().authenticate_header(None)
+    return response
+
+
+def json_response(content, status_code=status.HTTP_200_OK, headers=None):
+    return HttpResponse(content, status=status_code, content_type="application/json", headers=headers)
+
+
+async def render_page(request, queryset):
+    """
+    Возвращает JSON страницы привычек в той же форме, что и FastHabitListMixin.
+    """
+    paginator = AsyncHabitPagination()
+    page = await paginator.apaginate_queryset(encoders.habit_values(queryset), request)
+    return encoders.dumps(paginator.get_paginated_response([encoders.values_to_dict(row) for row in page]).data)
+
+
+@async_api_view()
+async def habit_list(request):
+    """
+    Возвращает страницу привычек текущего пользователя.
+    """
+    return json_response(await render_page(request, Habit.objects.filter(user_id=request.user.pk)))
+
+
+@async_api_view()
+async def habit_detail(request, pk):
+    """
+    Возвращает привычку текущего пользователя.
+    """
+    try:
+        values = await encoders.habit_values(Habit.objects.filter(user_id=request.user.pk)).aget(pk=pk)
+    except Habit.DoesNotExist:
+        raise exceptions.NotFound()
+    return json_response(encoders.dumps(encoders.values_to_dict(values)))
+
+
+@async_api_view(authenticated=False)
+async def public_habit_list(request):
+    """
+    Возвращает страницу ленты публичных привычек из кэша или формирует и кэширует ее.
+    """
+    started = time.perf_counter()
+    version, modified = await feed_cache.aget_state()
+    headers, last_modified = feed_cache.conditional_headers(version, modified, request)
+
+    not_modified = get_conditional_response(request, etag=headers["ETag"], last_modified=last_modified)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified.headers[header] = value
+        feed_cache.observe("not_modified", started)
+        return not_modified
+
+    key = feed_cache.page_key(version, request)
+    content = await cache.aget(key)
+    result = "hit"
+    if content is None:
+        result = "miss"
+        content = await render_page(request, Habit.objects.filter(is_public=True))
+        await cache.aset(key, content, feed_cache.timeout())
+    feed_cache.observe(result, started)
+    return json_response(content, headers=headers)
+
+
+@async_api_view(methods=("POST",))
+async def habit_remind(request, pk):
+    """
+    Ставит в очередь напоминание о привычке текущего пользователя в его Telegram.
+    """
+    try:
+        habit_id, telegram_id = await (
+            Habit.objects.filter(user_id=request.user.pk).values_list("id", "user__telegram_id").aget(pk=pk)
+        )
+    except Habit.DoesNotExist:
+        raise exceptions.NotFound()
+    if not telegram_id:
+        raise exceptions.ValidationError({"telegram_id": ["У пользователя не указан Telegram ID."]})
+    await sync_to_async(send_telegram_message.delay)(habit_id, telegram_id)
+    return json_response(
+        encoders.dumps({"status": "Напоминание поставлено в очередь."}), status_code=status.HTTP_202_ACCEPTED
+    )
@@ -0,0 +1,56 @@
+"""
+Пакетная запись журнала выполнений привычек.
+
+В PostgreSQL большие пакеты записываются одной командой COPY FROM STDIN: строки передаются
+потоком в текстовом формате, без разбора SQL и параметров для каждой строки. Небольшие
+пакеты и другие СУБД используют многострочный INSERT (bulk_create). В той же транзакции
+пакет учитывается в статистике привычек (см. habits.stats).
+
+Функции:
+    - record_completions: Записывает пакет выполнений привычек.
+"""
+
+import io
+
+from django.db import connection, transaction
+from habits import stats
+from habits.models import HabitCompletion
+
+COPY_THRESHOLD = 500  # Начиная с какого размера пакета в PostgreSQL используется COPY
+INSERT_BATCH_SIZE = 1000  # Сколько строк в одном многострочном INSERT
+
+
+def record_completions(rows):
+    """
+    Записывает пакет выполнений привычек в журнал.
+
+    Args:
+        rows (list): Пары (habit_id, completed_at); completed_at — datetime с часовым поясом.
+
+    Returns:
+        int: Количество записанных строк.
+    """
+    if not rows:
+        return 0
+    with transaction.atomic():
+        if connection.vendor == "postgresql" and len(rows) >= COPY_THRESHOLD:
+            _copy_rows(rows)
+        else:
+            HabitCompletion.objects.bulk_create(
+                [HabitCompletion(habit_id=habit_id, completed_at=completed_at) for habit_id, completed_at in rows],
+                batch_size=INSERT_BATCH_SIZE,
+            )
+        stats.apply_completions(rows)
+    return len(rows)
+
+
+def _copy_rows(rows):
+    buffer = io.StringIO()
+    for habit_id, completed_at in rows:
+        buffer.write(f"{int(habit_id)}\t{completed_at.isoformat()}\n")
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {HabitCompletion._meta.db_table} (habit_id, completed_at) FROM STDIN",
+            buffer,
+        )
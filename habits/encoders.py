@@ -0,0 +1,121 @@
+"""
+Легковесное кодирование привычек для чтения больших объемов.
+
+Привычки выбираются через values/values_list и превращаются в словари той же формы, что и
+HabitSerializer.to_representation, без создания моделей и полей сериализатора. JSON
+кодируется orjson; результат побайтно совпадает с выводом JSONRenderer DRF (компактные
+разделители, UTF-8 без экранирования, U+2028 и U+2029 экранированы).
+
+Функции:
+    - habit_rows: Кортежи значений привычек в порядке полей HabitSerializer.
+    - habit_values: Словари значений привычек (для курсорной пагинации).
+    - row_to_dict: Словарь привычки из кортежа значений.
+    - values_to_dict: Словарь привычки из словаря значений.
+    - dumps: Кодирует данные в JSON так же, как JSONRenderer.
+    - accepts_json: Проверяет, что ответ можно отдать быстрым путем.
+    - ndjson_lines: Генератор NDJSON (одна привычка на строку) пачками строк.
+"""
+
+import orjson
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+HABIT_FIELDS = [
+    "id",
+    "user",
+    "place",
+    "time",
+    "action",
+    "is_pleasant",
+    "linked_habit",
+    "periodicity",
+    "reward",
+    "execution_time",
+    "is_public",
+]
+# Столбцы для values_list: внешние ключи выбираются как *_id без JOIN
+HABIT_COLUMNS = [f"{name}_id" if name in ("user", "linked_habit") else name for name in HABIT_FIELDS]
+TIME_INDEX = HABIT_FIELDS.index("time")
+# JSONRenderer экранирует разделители строк: в JavaScript они недопустимы внутри строковых литералов
+LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+NDJSON_CHUNK_SIZE = 1000  # Сколько привычек читается с сервера и отдается клиенту за раз
+
+
+def habit_rows(queryset, chunk_size=None):
+    """
+    Возвращает кортежи значений привычек в порядке HABIT_FIELDS.
+
+    Args:
+        queryset (QuerySet): Привычки.
+        chunk_size (int, optional): Если задан — строки читаются потоком (серверный курсор).
+            Такой итератор нужно обходить внутри транзакции (см. ndjson_lines).
+    """
+    rows = queryset.values_list(*HABIT_COLUMNS)
+    return rows.iterator(chunk_size=chunk_size) if chunk_size else rows
+
+
+def habit_values(queryset):
+    """
+    Возвращает словари значений привычек (ключи — HABIT_COLUMNS).
+    """
+    return queryset.values(*HABIT_COLUMNS)
+
+
+def row_to_dict(row):
+    """
+    Возвращает словарь привычки той же формы, что и HabitSerializer (время — в формате ISO 8601).
+    """
+    data = dict(zip(HABIT_FIELDS, row))
+    data["time"] = row[TIME_INDEX].isoformat()
+    return data
+
+
+def values_to_dict(values):
+    """
+    Возвращает словарь привычки той же формы, что и HabitSerializer, из словаря значений (см. habit_values).
+    """
+    data = {name: values[column] for name, column in zip(HABIT_FIELDS, HABIT_COLUMNS)}
+    data["time"] = data["time"].isoformat()
+    return data
+
+
+def dumps(data):
+    """
+    Кодирует данные в JSON побайтно так же, как JSONRenderer с настройками по умолчанию.
+    """
+    content = orjson.dumps(data)
+    for separator, escaped in LINE_SEPARATORS:
+        if separator in content:
+            content = content.replace(separator, escaped)
+    return content
+
+
+def accepts_json(request):
+    """
+    Проверяет, что для запроса выбран JSONRenderer без отступов (иначе нужен обычный путь DRF).
+    """
+    return isinstance(getattr(request, "accepted_renderer", None), JSONRenderer) and (
+        "indent" not in (request.accepted_media_type or "")
+    )
+
+
+def ndjson_lines(queryset, chunk_size=NDJSON_CHUNK_SIZE):
+    """
+    Кодирует привычки в NDJSON по мере чтения из базы.
+
+    Серверный курсор читается внутри транзакции: так он работает и через pgbouncer в режиме
+    transaction, и не материализует результат в памяти клиента.
+
+    Yields:
+        bytes: Строки NDJSON для очередной пачки из chunk_size привычек.
+    """
+    with transaction.atomic(savepoint=False):
+        lines = []
+        for row in habit_rows(queryset, chunk_size):
+            lines.append(dumps(row_to_dict(row)))
+            if len(lines) == chunk_size:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
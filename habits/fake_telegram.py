@@ -0,0 +1,129 @@
+"""
+Локальный поддельный сервер Telegram Bot API для тестов и бенчмарков без выхода в сеть.
+
+Сервер принимает POST /bot<token>/sendMessage, соблюдает те же ограничения частоты,
+что и Telegram (глобальное и по каждому чату), и при их превышении отвечает 429
+с parameters.retry_after. Доставленные сообщения сохраняются в списке messages.
+
+Пример:
+    with FakeTelegramServer(global_rate=30, chat_rate=1) as server:
+        with override_settings(TELEGRAM_URL=server.url):
+            ...
+        server.messages  # [(chat_id, text), ...]
+"""
+
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Поддержка keep-alive, как у настоящего API
+    disable_nagle_algorithm = True  # Иначе заголовки и тело ответа расходятся с задержкой ~40 мс (delayed ACK)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.endswith("/sendMessage"):
+            return self._reply(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+        payload = json.loads(body or b"{}")
+        server = self.server.fake
+        if server.latency:
+            time.sleep(server.latency)
+        retry_after = server.take(str(payload.get("chat_id")))
+        if retry_after:
+            return self._reply(
+                429,
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after},
+                },
+            )
+        server.deliver(str(payload.get("chat_id")), payload.get("text"))
+        return self._reply(200, {"ok": True, "result": {"message_id": len(server.messages)}})
+
+    def _reply(self, status, data):
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    # Очередь listen() по умолчанию — 5 соединений: при одновременной отправке лишние SYN
+    # отбрасываются и повторяются клиентом только через секунду
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class FakeTelegramServer:
+    """
+    Поддельный сервер Telegram, запускаемый в отдельном потоке.
+
+    Атрибуты:
+        global_rate (float): Допустимое число сообщений в секунду на бота.
+        chat_rate (float): Допустимое число сообщений в секунду в один чат.
+        latency (float): Искусственная задержка ответа в секундах.
+        messages (list): Доставленные сообщения (chat_id, text).
+        rejected (int): Число ответов 429.
+        url (str): Значение для настройки TELEGRAM_URL.
+    """
+
+    def __init__(self, global_rate=30, chat_rate=1, latency=0.0):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.latency = latency
+        self.messages = []
+        self.rejected = 0
+        self.lock = threading.Lock()
+        self.last_sent = {}
+        self.window = []
+        self.httpd = _Server(("127.0.0.1", 0), _Handler)
+        self.httpd.fake = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}/bot"
+
+    def take(self, chat_id):
+        """
+        Проверяет лимиты. Возвращает 0, если сообщение можно принять, иначе retry_after в секундах.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.window = [ts for ts in self.window if now - ts < 1]
+            chat_wait = 1 / self.chat_rate - (now - self.last_sent.get(chat_id, -math.inf))
+            if len(self.window) >= self.global_rate or chat_wait > 0:
+                self.rejected += 1
+                return max(1, math.ceil(chat_wait))
+            self.window.append(now)
+            self.last_sent[chat_id] = now
+            return 0
+
+    def deliver(self, chat_id, text):
+        with self.lock:
+            self.messages.append((chat_id, text))
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,124 @@
+"""
+Кэш ленты публичных привычек.
+
+Страницы ленты кэшируются в Redis (общий кэш Django) в виде готового JSON под ключом, включающим номер
+поколения ленты. Любое изменение публичной привычки увеличивает поколение, после чего
+все ранее закэшированные страницы перестают использоваться и вытесняются по TTL.
+Поколение и время изменения ленты также задают ETag и Last-Modified, поэтому повторный
+запрос клиента с If-None-Match / If-Modified-Since получает 304 без обращения к базе.
+Last-Modified точен до секунды, поэтому отдается, только когда секунда последнего изменения
+уже прошла (см. conditional_headers).
+
+Функции:
+    - get_state: Возвращает текущее поколение ленты и время ее последнего изменения.
+    - aget_state: Асинхронный вариант get_state.
+    - invalidate: Начинает новое поколение ленты.
+    - page_key: Ключ кэша для страницы ленты.
+    - etag: ETag страницы ленты.
+    - conditional_headers: ETag и Last-Modified страницы ленты для условного запроса.
+    - observe: Учитывает обращение к ленте в метриках.
+"""
+
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import http_date
+from prometheus_client import Counter, Histogram
+
+VERSION_KEY = "habits:public-feed:version"
+MODIFIED_KEY = "habits:public-feed:modified"
+
+REQUESTS = Counter(
+    "habits_public_feed_requests_total",
+    "Обращения к ленте публичных привычек по результату кэша (hit, miss, not_modified).",
+    ["result"],
+)
+LATENCY = Histogram(
+    "habits_public_feed_latency_seconds",
+    "Время ответа ленты публичных привычек по результату кэша.",
+    ["result"],
+)
+
+
+def get_state():
+    """
+    Возвращает поколение ленты и время ее последнего изменения (unix time).
+    """
+    state = cache.get_many([VERSION_KEY, MODIFIED_KEY])
+    if len(state) < 2:
+        # Ключи вытеснены или еще не созданы: начинаем новое поколение,
+        # чтобы не отдать страницы, закэшированные до потери счетчика
+        invalidate()
+        state = cache.get_many([VERSION_KEY, MODIFIED_KEY])
+    return state.get(VERSION_KEY, 0), state.get(MODIFIED_KEY, int(time.time()))
+
+
+async def aget_state():
+    """
+    Асинхронно возвращает поколение ленты и время ее последнего изменения (см. get_state).
+    """
+    state = await cache.aget_many([VERSION_KEY, MODIFIED_KEY])
+    if len(state) < 2:
+        await sync_to_async(invalidate)()
+        state = await cache.aget_many([VERSION_KEY, MODIFIED_KEY])
+    return state.get(VERSION_KEY, 0), state.get(MODIFIED_KEY, int(time.time()))
+
+
+def invalidate():
+    """
+    Начинает новое поколение ленты публичных привычек.
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Начальное значение берется из часов, чтобы номера поколений не повторялись после вытеснения
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    cache.set(MODIFIED_KEY, int(time.time()), timeout=None)
+
+
+def page_key(version, request):
+    """
+    Ключ кэша страницы: поколение и полный URL запроса (курсор, размер страницы, хост для ссылок next/previous).
+    """
+    url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"habits:public-feed:json:{version}:{url_hash}"
+
+
+def etag(version, request):
+    """
+    ETag страницы ленты: содержимое однозначно определяется поколением и параметрами запроса.
+    """
+    url_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()[:16]
+    return f'W/"{version}-{url_hash}"'
+
+
+def conditional_headers(version, modified, request):
+    """
+    Возвращает заголовки условного запроса страницы ленты и время изменения для сравнения
+    с If-Modified-Since (None — сравнивать только ETag).
+
+    Last-Modified и If-Modified-Since точны до секунды, а лента может измениться дважды за одну
+    секунду. Пока секунда последнего изменения не прошла, Last-Modified не отдается: иначе клиент,
+    получивший ленту между двумя изменениями, получил бы 304 со старыми данными. После нее
+    любое новое изменение получит более позднюю секунду (часы процессов должны быть синхронизированы).
+    """
+    headers = {"ETag": etag(version, request)}
+    if modified >= int(time.time()):
+        return headers, None
+    headers["Last-Modified"] = http_date(modified)
+    return headers, modified
+
+
+def timeout():
+    return settings.PUBLIC_FEED_CACHE_TIMEOUT
+
+
+def observe(result, started):
+    """
+    Учитывает обращение к ленте в метриках: результат кэша и время ответа.
+    """
+    REQUESTS.labels(result).inc()
+    LATENCY.labels(result).observe(time.perf_counter() - started)
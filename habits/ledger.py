@@ -0,0 +1,236 @@
+"""
+Журнал доставки напоминаний: каждое напоминание о привычке отправляется в своем слоте один раз.
+
+Слот — запланированная отправка: срок next_due_at (due:<срок>), дата ежедневной рассылки
+(daily:<дата>) или задача ручного напоминания (task:<id задачи>). Перед отправкой задача
+занимает пары (привычка, слот): если пара уже занята другим отправителем или напоминание
+уже отправлено, оно пропускается. Поэтому повторная доставка задачи (acks_late), ее повтор
+и пересекающиеся запуски рассылки не отправляют напоминание второй раз.
+
+Пары занимаются в Redis одной командой SET NX на пару, все пары пачки — за один запрос
+(конвейер), без обращения к базе. Занятая пара сама освобождается через CLAIM_TIMEOUT
+секунд, если отправитель упал. Итоги отправки пачки записываются в базу (ReminderDelivery)
+одним запросом, а отправленные пары остаются занятыми в Redis еще SENT_TIMEOUT секунд.
+Если Redis не настроен или недоступен, пары занимаются в базе (INSERT ... ON CONFLICT) по
+тем же правилам. При переключении на базу пары, занятые в Redis, но еще не отправленные,
+в базе не видны.
+
+Неудачные отправки остаются в журнале со статусом failed и повторяются задачей
+retry_failed_reminders — без повторного обхода всех привычек.
+
+Функции:
+    - claim: Занимает пары (привычка, слот) для отправки.
+    - release: Освобождает пары, отправка которых отложена.
+    - record: Записывает итоги отправки.
+    - failed_deliveries: Неудачные отправки для повтора.
+    - purge: Удаляет старые записи журнала.
+    - get_backend: Возвращает хранилище занятых пар (Redis или база).
+"""
+
+import logging
+import operator
+from datetime import timedelta
+from functools import lru_cache, reduce
+
+import redis
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from habits.models import ReminderDelivery
+
+from config.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY = "reminders:delivery:{}:{}"
+CLAIM_TIMEOUT = 10 * 60  # Через сколько секунд освобождается пара упавшего отправителя
+SENT_TIMEOUT = 2 * 24 * 60 * 60  # Сколько секунд отправленная пара остается занятой в Redis
+MAX_ATTEMPTS = 3  # После скольких неудачных отправок напоминание больше не повторяется
+RETRY_DELAY = 5 * 60  # Через сколько секунд после неудачи напоминание можно повторить
+RETENTION_DAYS = 14  # Сколько дней хранятся записи журнала
+
+TABLE = ReminderDelivery._meta.db_table
+CLAIM_SQL = f"""
+INSERT INTO {TABLE} (habit_id, slot, chat_id, status, attempts, updated_at) VALUES {{values}}
+ON CONFLICT (habit_id, slot) DO UPDATE SET status = EXCLUDED.status, updated_at = EXCLUDED.updated_at
+WHERE {TABLE}.status = '{ReminderDelivery.FAILED}'
+    OR ({TABLE}.status = '{ReminderDelivery.PENDING}' AND {TABLE}.updated_at < %s)
+RETURNING habit_id, slot
+"""
+RECORD_SQL = f"""
+INSERT INTO {TABLE} (habit_id, slot, chat_id, status, attempts, updated_at) VALUES {{values}}
+ON CONFLICT (habit_id, slot) DO UPDATE SET
+    chat_id = EXCLUDED.chat_id,
+    status = EXCLUDED.status,
+    attempts = {TABLE}.attempts + 1,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def _rows_sql(sql, rows):
+    return sql.format(values=", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows)))
+
+
+def _unique(rows):
+    # ON CONFLICT DO UPDATE не может изменить одну строку дважды в одной команде
+    return list({row[:2]: row for row in rows}.values())
+
+
+def _params(rows):
+    return [value for row in rows for value in row]
+
+
+class DatabaseLedger:
+    """
+    Занятые пары в таблице журнала доставки.
+    """
+
+    def claim(self, deliveries):
+        now = timezone.now()
+        rows = _unique(
+            [(habit_id, slot, chat_id, ReminderDelivery.PENDING, 0, now) for habit_id, slot, chat_id in deliveries]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(_rows_sql(CLAIM_SQL, rows), _params(rows) + [now - timedelta(seconds=CLAIM_TIMEOUT)])
+            return set(cursor.fetchall())
+
+    def release(self, deliveries):
+        pairs = reduce(operator.or_, (Q(habit_id=habit_id, slot=slot) for habit_id, slot, _ in deliveries))
+        pending = ReminderDelivery.objects.filter(pairs, status=ReminderDelivery.PENDING)
+        # Повторно занятая неудачная отправка снова становится failed и сохраняет число попыток
+        pending.filter(attempts__gt=0).update(status=ReminderDelivery.FAILED, updated_at=timezone.now())
+        pending.filter(attempts=0).delete()
+
+    def record(self, sent, failed):
+        now = timezone.now()
+        rows = _unique(
+            [
+                (habit_id, slot, chat_id, status, 1, now)
+                for status, deliveries in ((ReminderDelivery.FAILED, failed), (ReminderDelivery.SENT, sent))
+                for habit_id, slot, chat_id in deliveries
+            ]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(_rows_sql(RECORD_SQL, rows), _params(rows))
+
+
+class RedisLedger:
+    """
+    Занятые пары в Redis; итоги отправки — в таблице журнала. При ошибке Redis используется база.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.database = DatabaseLedger()
+
+    def claim(self, deliveries):
+        pipeline = self.client.pipeline(transaction=False)
+        for habit_id, slot, _ in deliveries:
+            pipeline.set(KEY.format(habit_id, slot), ReminderDelivery.PENDING, nx=True, ex=CLAIM_TIMEOUT)
+        try:
+            results = pipeline.execute()
+        except redis.RedisError:
+            logger.warning("Redis недоступен, пары доставки занимаются в базе", exc_info=True)
+            return self.database.claim(deliveries)
+        return {(habit_id, slot) for (habit_id, slot, _), claimed in zip(deliveries, results) if claimed}
+
+    def release(self, deliveries):
+        try:
+            self.client.delete(*(KEY.format(habit_id, slot) for habit_id, slot, _ in deliveries))
+        except redis.RedisError:
+            self.database.release(deliveries)
+
+    def record(self, sent, failed):
+        self.database.record(sent, failed)
+        pipeline = self.client.pipeline(transaction=False)
+        for habit_id, slot, _ in sent:
+            pipeline.set(KEY.format(habit_id, slot), ReminderDelivery.SENT, ex=SENT_TIMEOUT)
+        for habit_id, slot, _ in failed:
+            pipeline.delete(KEY.format(habit_id, slot))
+        try:
+            pipeline.execute()
+        except redis.RedisError:
+            # Отправленные пары остаются в базе, и при переключении на нее повторной отправки не будет
+            logger.warning("Не удалось записать итоги доставки в Redis", exc_info=True)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """
+    Возвращает хранилище занятых пар: Redis, если он настроен, иначе база.
+    """
+    client = get_redis()
+    if client is None:
+        return DatabaseLedger()
+    return RedisLedger(client)
+
+
+def claim(deliveries):
+    """
+    Занимает пары (привычка, слот) для отправки.
+
+    Args:
+        deliveries (list): Тройки (habit_id, slot, chat_id).
+
+    Returns:
+        set: Занятые пары (habit_id, slot); остальные напоминания отправлять не нужно.
+    """
+    if not deliveries:
+        return set()
+    return get_backend().claim(deliveries)
+
+
+def release(deliveries):
+    """
+    Освобождает пары, отправка которых отложена, чтобы их могла занять отложенная задача.
+
+    Неудачные отправки, занятые для повтора, остаются в журнале как failed с прежним числом
+    попыток, поэтому откладывание не обходит MAX_ATTEMPTS.
+
+    Args:
+        deliveries (list): Тройки (habit_id, slot, chat_id).
+    """
+    if deliveries:
+        get_backend().release(deliveries)
+
+
+def record(sent, failed):
+    """
+    Записывает итоги отправки; отправленные пары остаются занятыми, неудачные освобождаются.
+
+    Args:
+        sent (list): Тройки (habit_id, slot, chat_id) отправленных напоминаний.
+        failed (list): Тройки (habit_id, slot, chat_id) напоминаний, которые отправить не удалось.
+    """
+    if sent or failed:
+        get_backend().record(sent, failed)
+
+
+def failed_deliveries(limit):
+    """
+    Возвращает неудачные отправки, которые пора повторить: тройки [habit_id, chat_id, slot].
+
+    Чат берется из профиля владельца, а не из журнала: пользователь мог сменить Telegram ID.
+    """
+    rows = (
+        ReminderDelivery.objects.filter(
+            status=ReminderDelivery.FAILED,
+            attempts__lt=MAX_ATTEMPTS,
+            updated_at__lte=timezone.now() - timedelta(seconds=RETRY_DELAY),
+        )
+        .exclude(habit__user__telegram_id="")
+        .order_by("updated_at")
+        .values_list("habit_id", "habit__user__telegram_id", "slot")[:limit]
+    )
+    return [list(row) for row in rows]
+
+
+def purge(days=RETENTION_DAYS):
+    """
+    Удаляет записи журнала, не изменявшиеся дольше days дней.
+
+    Returns:
+        int: Количество удаленных записей.
+    """
+    deleted, _ = ReminderDelivery.objects.filter(updated_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
@@ -0,0 +1,131 @@
+import statistics
+import time
+from datetime import time as dt_time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from habits.models import Habit
+from users.models import Users
+
+# Индекс внешнего ключа user_id, который Django создавал до миграции 0010 (ее заменили индексы Habit.Meta)
+USER_FK_INDEX = models.Index(fields=["user"], name="habits_habit_user_id_0cd069d6")
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения планов и времени основных запросов к привычкам с исходными и текущими индексами.
+
+    Для каждого запроса (список привычек пользователя, лента публичных привычек, выборка
+    для ежедневных напоминаний) выводится EXPLAIN ANALYZE и медианное время выполнения:
+    сначала на исходной схеме — без индексов из Habit.Meta.indexes, но с индексом внешнего
+    ключа user_id (схема меняется внутри транзакции, которая затем откатывается), затем с ними.
+
+    Работает только с PostgreSQL. Запускать на отдельной базе: удаление индексов
+    блокирует таблицу на время замера.
+
+    Пример:
+        python manage.py bench_habit_indexes --seed 3000000 --users 100000
+    """
+
+    help = "Сравнивает EXPLAIN и время основных запросов к привычкам с исходными и текущими индексами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Сколько привычек создать перед замером")
+        parser.add_argument("--users", type=int, default=100_000, help="Сколько пользователей создать при --seed")
+        parser.add_argument("--repeat", type=int, default=20, help="Сколько раз выполнять каждый запрос")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Бенчмарк индексов поддерживается только для PostgreSQL.")
+
+        if options["seed"]:
+            self.seed(options["seed"], options["users"])
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Habit._meta.db_table}")
+
+        queries = self.hot_queries()
+        with transaction.atomic():
+            with connection.schema_editor() as schema_editor:
+                for index in Habit._meta.indexes:
+                    schema_editor.remove_index(Habit, index)
+                schema_editor.add_index(Habit, USER_FK_INDEX)
+            self.stdout.write(self.style.MIGRATE_HEADING("Исходные индексы"))
+            before = self.measure(queries, options["repeat"])
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("С индексами"))
+        after = self.measure(queries, options["repeat"])
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Итог (медиана, мс)"))
+        for name in queries:
+            self.stdout.write(f"{name}: {before[name]:.2f} -> {after[name]:.2f} (x{before[name] / after[name]:.1f})")
+
+    def hot_queries(self):
+        """
+        Возвращает основные запросы к привычкам в том виде, в каком их выполняют представления и задачи.
+        """
+        user_id = Habit.objects.order_by("-id").values_list("user_id", flat=True).first()
+        middle_id = (Habit.objects.order_by("-id").values_list("id", flat=True).first() or 0) // 2
+        return {
+            "Список привычек пользователя": Habit.objects.filter(user_id=user_id).order_by("id")[:6],
+            "Лента публичных привычек (глубокая страница)": Habit.objects.filter(is_public=True, id__gt=middle_id)
+            .order_by("id")
+            .values("id", "user", "place", "time", "action", "periodicity", "execution_time")[:6],
+            "Публичные привычки для напоминаний": Habit.objects.filter(
+                is_public=True, time__lte=dt_time(0, 10)
+            ).values_list("id", "user_id"),
+        }
+
+    def measure(self, queries, repeat):
+        results = {}
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.SQL_KEYWORD(name))
+            self.stdout.write(queryset.explain(analyze=True, buffers=True))
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+            self.stdout.write(f"Медиана: {results[name]:.2f} мс\n")
+        return results
+
+    def seed(self, habits, users):
+        """
+        Быстро заполняет таблицы пользователей и привычек через INSERT ... SELECT generate_series.
+        """
+        self.stdout.write(f"Создание {users} пользователей и {habits} привычек...")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Users._meta.db_table}
+                    (password, is_superuser, first_name, last_name, is_staff, is_active, date_joined,
+                     email, telegram_id)
+                SELECT '!', false, '', '', false, true, now(), 'bench-' || g || '@example.com', (100000 + g)::text
+                FROM generate_series(1, %s) AS g
+                ON CONFLICT (email) DO NOTHING
+                """,
+                [users],
+            )
+            cursor.execute(
+                f"SELECT min(id), max(id) FROM {Users._meta.db_table} WHERE email LIKE 'bench-%@example.com'"
+            )
+            first_user, last_user = cursor.fetchone()
+            cursor.execute(
+                f"""
+                INSERT INTO {Habit._meta.db_table}
+                    (user_id, place, time, action, is_pleasant, periodicity, execution_time, is_public, next_due_at)
+                SELECT
+                    %s + mod(g, %s),
+                    'Место ' || mod(g, 100),
+                    make_time(mod(g, 24)::int, mod(g * 7, 60)::int, 0),
+                    'Действие ' || mod(g, 1000),
+                    mod(g, 10) = 0,
+                    7 + mod(g, 7),
+                    mod(g, 120) + 1,
+                    mod(g, 5) = 0,
+                    now() + mod(g, 10080) * interval '1 minute'
+                FROM generate_series(1, %s) AS g
+                """,
+                [first_user, last_user - first_user + 1, habits],
+            )
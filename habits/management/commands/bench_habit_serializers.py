@@ -0,0 +1,88 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand, CommandError
+from habits import encoders
+from habits.models import Habit
+from habits.serializers import HabitSerializer
+from rest_framework.renderers import JSONRenderer
+from users.models import Users
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения скорости сериализации списков привычек: HabitSerializer + JSONRenderer
+    против values() + orjson (быстрый путь списков, см. habits.encoders).
+
+    Для каждого пути выводится число строк в секунду (медиана по --repeat запускам) отдельно
+    для выборки с кодированием и для одного кодирования уже выбранных строк. Перед замером
+    проверяется, что оба пути дают побайтно одинаковый JSON.
+
+    Пример:
+        python manage.py bench_habit_serializers --seed 10000 --rows 10000
+    """
+
+    help = "Сравнивает скорость HabitSerializer и быстрого пути values() + orjson"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Сколько привычек создать перед замером")
+        parser.add_argument("--rows", type=int, default=10_000, help="Сколько привычек сериализовать за запуск")
+        parser.add_argument("--repeat", type=int, default=5, help="Сколько раз выполнять каждый замер")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["seed"])
+        queryset = Habit.objects.order_by("id")[: options["rows"]]
+        rows = queryset.count()
+        if not rows:
+            raise CommandError("Нет привычек для замера: запустите команду с --seed.")
+
+        instances = list(queryset)
+        values = list(encoders.habit_values(queryset))
+        if self.drf(instances) != self.fast(values):
+            raise CommandError("Быстрый путь дает JSON, отличный от HabitSerializer.")
+
+        cases = {
+            "HabitSerializer + JSONRenderer (выборка и кодирование)": lambda: self.drf(list(queryset)),
+            "values() + orjson (выборка и кодирование)": lambda: self.fast(list(encoders.habit_values(queryset))),
+            "HabitSerializer + JSONRenderer (только кодирование)": lambda: self.drf(instances),
+            "values() + orjson (только кодирование)": lambda: self.fast(values),
+        }
+        for name, run in cases.items():
+            timings = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(f"{name}: {rows / statistics.median(timings):,.0f} строк/с")
+
+    @staticmethod
+    def drf(instances):
+        return JSONRenderer().render(HabitSerializer(instances, many=True).data)
+
+    @staticmethod
+    def fast(values):
+        return encoders.dumps([encoders.values_to_dict(item) for item in values])
+
+    def seed(self, habits):
+        """
+        Создает пользователя с habits привычками.
+        """
+        self.stdout.write(f"Создание {habits} привычек...")
+        user, _ = Users.objects.get_or_create(email="bench-serializers@example.com", defaults={"telegram_id": ""})
+        Habit.objects.bulk_create(
+            [
+                Habit(
+                    user=user,
+                    place=f"Место {number % 100}",
+                    time=f"{number % 24:02d}:{number % 60:02d}:00",
+                    action=f"Действие {number % 1000}",
+                    periodicity=7 + number % 7,
+                    reward="Награда" if number % 2 else None,
+                    execution_time=number % 120 + 1,
+                    is_public=number % 5 == 0,
+                )
+                for number in range(habits)
+            ],
+            batch_size=1000,
+        )
@@ -0,0 +1,126 @@
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from habits.models import Habit, HabitCompletion, HabitStats
+from habits.scheduling import week_start
+from habits.stats import SUMMARY_WEEKS, habit_summary, rebuild_stats, user_stats
+from users.models import Users
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения статистики из агрегатов с расчетом по полной истории выполнений.
+
+    Создает пользователя с --habits привычками и --seed отметками о выполнении за последние
+    два года, пересчитывает агрегаты и сравнивает медианное время user_stats (два запроса
+    к агрегатам) с наивным расчетом, который читает всю историю пользователя и считает
+    серии и недельную сводку в Python.
+
+    Работает только с PostgreSQL.
+
+    Пример:
+        python manage.py bench_habit_stats --seed 5000000 --habits 50
+    """
+
+    help = "Сравнивает статистику из агрегатов с расчетом по полной истории выполнений"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Сколько отметок о выполнении создать перед замером")
+        parser.add_argument("--habits", type=int, default=50, help="Сколько привычек создать при --seed")
+        parser.add_argument("--repeat", type=int, default=5, help="Сколько раз выполнять каждый расчет")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Бенчмарк статистики поддерживается только для PostgreSQL.")
+
+        if options["seed"]:
+            user = self.seed(options["seed"], options["habits"])
+            started = time.perf_counter()
+            rebuild_stats()
+            self.stdout.write(f"Пересчет агрегатов: {time.perf_counter() - started:.1f} с")
+        else:
+            user = Users.objects.filter(email="bench-stats@example.com").first()
+            if user is None:
+                raise CommandError("Нет данных для замера: запустите команду с --seed.")
+
+        now = timezone.now()
+        timings = {}
+        for name, compute in (("Агрегаты", user_stats), ("Полная история", self.naive_user_stats)):
+            runs = []
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                result = compute(user, now)
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(runs)
+            self.stdout.write(f"{name}: {timings[name]:.2f} мс")
+        self.stdout.write(f"Ускорение: x{timings['Полная история'] / timings['Агрегаты']:.1f}")
+
+        if result != user_stats(user, now):
+            raise CommandError("Статистика из агрегатов не совпадает с расчетом по истории.")
+
+    def naive_user_stats(self, user, now):
+        """
+        Считает ту же статистику, что и user_stats, полным проходом по истории пользователя.
+        """
+        habits = list(Habit.objects.filter(user_id=user.pk).order_by("id"))
+        history = defaultdict(list)
+        weeks = Counter()
+        first_week = week_start(now) - timedelta(weeks=SUMMARY_WEEKS - 1)
+        for habit_id, completed_at in (
+            HabitCompletion.objects.filter(habit__user_id=user.pk)
+            .order_by("habit_id", "completed_at")
+            .values_list("habit_id", "completed_at")
+        ):
+            history[habit_id].append(completed_at)
+            week = week_start(completed_at)
+            if week >= first_week:
+                weeks[week] += 1
+
+        summaries = []
+        for habit in habits:
+            item = HabitStats(habit=habit, periodicity=habit.periodicity)
+            for completed_at in history[habit.id]:
+                item.add_completion(completed_at)
+            summaries.append(habit_summary(habit, item, now))
+        expected = round(sum(7 / habit.periodicity for habit in habits), 2)
+        summary = [
+            {"week": week, "completions": weeks[week], "expected": expected}
+            for week in (first_week + timedelta(weeks=number) for number in range(SUMMARY_WEEKS))
+        ]
+        return {"habits": summaries, "weeks": summary}
+
+    def seed(self, completions, habits):
+        """
+        Создает пользователя с привычками и заполняет журнал через INSERT ... SELECT generate_series.
+        """
+        self.stdout.write(f"Создание {habits} привычек и {completions} отметок о выполнении...")
+        user, _ = Users.objects.get_or_create(email="bench-stats@example.com", defaults={"telegram_id": "0"})
+        Habit.objects.bulk_create(
+            [
+                Habit(
+                    user=user,
+                    place="Дом",
+                    time="08:00",
+                    action=f"Привычка {number}",
+                    periodicity=7 + number % 7,
+                    execution_time=60,
+                )
+                for number in range(habits)
+            ]
+        )
+        habit_ids = list(Habit.objects.filter(user=user).values_list("id", flat=True))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {HabitCompletion._meta.db_table} (habit_id, completed_at)
+                SELECT (%s::bigint[])[1 + mod(g, %s)], now() - random() * interval '730 days'
+                FROM generate_series(1, %s) AS g
+                """,
+                [habit_ids, len(habit_ids), completions],
+            )
+        return user
@@ -0,0 +1,79 @@
+import time
+from functools import partial
+
+from django.core.management import BaseCommand, CommandError
+from django.test import override_settings
+from habits import ratelimit, telegram
+from habits.fake_telegram import FakeTelegramServer
+from habits.tasks import SENT, deliver_messages
+
+RATE_LIMIT = 1_000_000  # Лимиты частоты на время замера: сравнивается отправка, а не ограничение
+
+
+class Command(BaseCommand):
+    """
+    Команда для сравнения пропускной способности отправки сообщений в Telegram: синхронная
+    отправка по одному сообщению (requests, keep-alive сессия) против асинхронной одновременной
+    отправки (httpx, см. habits.tasks.deliver_messages).
+
+    Сообщения отправляются на локальный поддельный сервер Telegram (habits.fake_telegram)
+    с задержкой ответа --latency секунд, каждое — в свой чат. Лимиты частоты на время замера
+    сняты. Для каждого пути выводятся сообщения в секунду и время отправки.
+
+    Пример:
+        python manage.py bench_telegram_send --messages 2000 --latency 0.05 --concurrency 10 --concurrency 100
+    """
+
+    help = "Сравнивает синхронную и асинхронную отправку сообщений в Telegram на поддельном сервере"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1000, help="Сколько сообщений отправить каждым путем")
+        parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа сервера, секунды")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            action="append",
+            help="Одновременных запросов асинхронного пути (можно указать несколько раз). По умолчанию — 10 и 100",
+        )
+        parser.add_argument("--skip-sync", action="store_true", help="Не замерять синхронный путь")
+
+    def handle(self, *args, **options):
+        concurrencies = options["concurrency"] or [10, 100]
+        messages = [(str(number), f"Напоминание {number}") for number in range(options["messages"])]
+        if not messages:
+            raise CommandError("Нужно хотя бы одно сообщение.")
+
+        with FakeTelegramServer(global_rate=RATE_LIMIT, chat_rate=RATE_LIMIT, latency=options["latency"]) as server:
+            with override_settings(
+                TELEGRAM_URL=server.url,
+                TELEGRAM_GLOBAL_RATE_LIMIT=RATE_LIMIT,
+                TELEGRAM_CHAT_RATE_LIMIT=RATE_LIMIT,
+                TELEGRAM_SEND_CONCURRENCY=max(concurrencies),
+            ):
+                if not options["skip_sync"]:
+                    self.report("sync (requests, по одному)", len(messages), *self.measure(self.send_sync, messages))
+                for concurrency in concurrencies:
+                    elapsed, sent = self.measure(partial(self.send_async, concurrency=concurrency), messages)
+                    self.report(f"async (httpx, concurrency {concurrency})", len(messages), elapsed, sent)
+
+    @staticmethod
+    def measure(send, messages):
+        started = time.perf_counter()
+        sent = send(messages)
+        return time.perf_counter() - started, sent
+
+    @staticmethod
+    def send_sync(messages):
+        sent = 0
+        for chat_id, text in messages:
+            ratelimit.acquire(chat_id)
+            sent += telegram.send_message(chat_id, text).status_code == 200
+        return sent
+
+    @staticmethod
+    def send_async(messages, concurrency):
+        outcomes, _ = telegram.run(deliver_messages(messages, concurrency))
+        return outcomes.count(SENT)
+
+    def report(self, name, total, elapsed, sent):
+        self.stdout.write(f"{name}: {sent / elapsed:,.0f} сообщений/с, {elapsed:.2f} с, доставлено {sent} из {total}")
@@ -0,0 +1,191 @@
+import math
+import time
+from collections import defaultdict
+
+import httpx
+from django.core.management import BaseCommand, CommandError
+from prometheus_client.parser import text_string_to_metric_families
+
+HISTOGRAMS = {"celery_task_runtime_seconds": "runtime", "celery_task_queue_wait_seconds": "wait"}
+TARGET_UTILIZATION = 0.7  # Доля занятости процессов пула, при которой очередь еще не растет лавинообразно
+
+
+def parse_metrics(text):
+    """
+    Разбирает метрики воркера (config/celery_metrics.py) в снимок:
+    {"tasks": {задача: {результат: число}}, "runtime"/"wait": {задача: {"buckets": [(le, число)], "sum", "count"}},
+    "queues": {очередь: длина}}.
+    """
+    snapshot = {
+        "tasks": defaultdict(lambda: defaultdict(float)),
+        "runtime": defaultdict(lambda: {"buckets": [], "sum": 0.0, "count": 0.0}),
+        "wait": defaultdict(lambda: {"buckets": [], "sum": 0.0, "count": 0.0}),
+        "queues": {},
+    }
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == "celery_tasks_total":
+                snapshot["tasks"][sample.labels["task"]][sample.labels["result"]] += sample.value
+            elif sample.name == "celery_queue_length":
+                snapshot["queues"][sample.labels["queue"]] = sample.value
+            else:
+                # Гистограммы без строк TYPE разбираются как отдельные метрики, поэтому смотрим на имя образца
+                name, _, suffix = sample.name.rpartition("_")
+                if name not in HISTOGRAMS or suffix not in ("bucket", "sum", "count"):
+                    continue
+                histogram = snapshot[HISTOGRAMS[name]][sample.labels["task"]]
+                if suffix == "bucket":
+                    histogram["buckets"].append((float(sample.labels["le"]), sample.value))
+                else:
+                    histogram[suffix] = sample.value
+    return snapshot
+
+
+def histogram_delta(current, previous):
+    """
+    Возвращает гистограмму наблюдений между двумя снимками.
+    """
+    previous = previous or {"buckets": [], "sum": 0.0, "count": 0.0}
+    previous_buckets = dict(previous["buckets"])
+    return {
+        "buckets": [(le, count - previous_buckets.get(le, 0.0)) for le, count in sorted(current["buckets"])],
+        "sum": current["sum"] - previous["sum"],
+        "count": current["count"] - previous["count"],
+    }
+
+
+def histogram_quantile(quantile, histogram):
+    """
+    Оценивает квантиль по накопительным корзинам так же, как histogram_quantile в Prometheus.
+    """
+    buckets = histogram["buckets"]
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = quantile * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for upper_bound, count in buckets:
+        if count >= rank:
+            if math.isinf(upper_bound):
+                return lower_bound
+            if count == lower_count:
+                return upper_bound
+            return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = upper_bound, count
+    return lower_bound
+
+
+def summarize(previous, current, elapsed):
+    """
+    Возвращает сводку по задачам за интервал между снимками.
+
+    Поступление задач оценивается как завершения плюс прирост очередей, а нужное число
+    процессов пула — по закону Литтла: поступление × среднее время выполнения (среднее число
+    одновременно выполняемых задач) с запасом до TARGET_UTILIZATION.
+    """
+    rows = []
+    busy = 0.0
+    for task in sorted(set(current["tasks"]) | set(current["runtime"])):
+        results = current["tasks"].get(task, {})
+        previous_results = previous["tasks"].get(task, {})
+        completed = {result: count - previous_results.get(result, 0.0) for result, count in results.items()}
+        runtime = histogram_delta(current["runtime"][task], previous["runtime"].get(task))
+        wait = histogram_delta(current["wait"][task], previous["wait"].get(task)) if task in current["wait"] else None
+        mean_runtime = runtime["sum"] / runtime["count"] if runtime["count"] else None
+        rate = runtime["count"] / elapsed
+        if mean_runtime is not None:
+            busy += rate * mean_runtime
+        rows.append(
+            {
+                "task": task,
+                "rate": rate,
+                "succeeded": completed.get("succeeded", 0.0),
+                "failed": completed.get("failed", 0.0),
+                "retried": completed.get("retried", 0.0),
+                "mean": mean_runtime,
+                "p50": histogram_quantile(0.5, runtime),
+                "p95": histogram_quantile(0.95, runtime),
+                "wait_p95": histogram_quantile(0.95, wait) if wait else None,
+            }
+        )
+    backlog_growth = sum(
+        length - previous["queues"].get(queue, 0.0) for queue, length in current["queues"].items()
+    ) / max(elapsed, 1e-9)
+    completed_rate = sum(row["rate"] for row in rows)
+    arrival_rate = completed_rate + max(backlog_growth, 0.0)
+    # Пока очередь растет, задачи поступают быстрее, чем выполняются: масштабируем занятость до поступления
+    demand = busy * arrival_rate / completed_rate if completed_rate else 0.0
+    return {
+        "tasks": rows,
+        "queues": dict(current["queues"]),
+        "arrival_rate": arrival_rate,
+        "busy": demand,
+        "concurrency": math.ceil(demand / TARGET_UTILIZATION) if demand else None,
+    }
+
+
+def format_seconds(value):
+    return "—" if value is None else f"{value * 1000:.0f} мс"
+
+
+class Command(BaseCommand):
+    """
+    Команда для наблюдения за воркером Celery по его метрикам (config/celery_metrics.py).
+
+    Каждые --interval секунд читает метрики воркера по адресу --url и выводит за прошедший
+    интервал: выполнение задач в секунду, успешные, неуспешные и повторные запуски, медиану и
+    95-й процентиль времени выполнения, 95-й процентиль ожидания в очереди, длину очередей и
+    оценку нужного числа процессов пула (--concurrency воркера) по закону Литтла.
+
+    Воркер должен быть запущен с CELERY_METRICS_PORT, например:
+        CELERY_METRICS_PORT=9808 celery -A config worker -l INFO
+
+    Пример:
+        python manage.py celery_stats --url http://127.0.0.1:9808/metrics --interval 10
+    """
+
+    help = "Выводит сводку пропускной способности и задержек задач Celery по метрикам воркера"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:9808/metrics", help="Адрес метрик воркера")
+        parser.add_argument("--interval", type=float, default=10.0, help="Интервал между сводками, секунды")
+        parser.add_argument("--count", type=int, default=0, help="Сколько сводок вывести (0 — до прерывания)")
+
+    def handle(self, *args, **options):
+        if options["interval"] <= 0:
+            raise CommandError("Интервал должен быть больше нуля.")
+        previous, previous_at = self.scrape(options["url"]), time.monotonic()
+        printed = 0
+        try:
+            while not options["count"] or printed < options["count"]:
+                time.sleep(options["interval"])
+                current, current_at = self.scrape(options["url"]), time.monotonic()
+                self.write_summary(summarize(previous, current, current_at - previous_at))
+                previous, previous_at = current, current_at
+                printed += 1
+        except KeyboardInterrupt:
+            pass
+
+    @staticmethod
+    def scrape(url):
+        try:
+            response = httpx.get(url, timeout=5)
+            response.raise_for_status()
+        except httpx.HTTPError as error:
+            raise CommandError(f"Не удалось получить метрики воркера {url}: {error}")
+        return parse_metrics(response.text)
+
+    def write_summary(self, summary):
+        self.stdout.write(time.strftime("%H:%M:%S"))
+        for row in summary["tasks"]:
+            self.stdout.write(
+                f"  {row['task']}: {row['rate']:.2f}/с (успешно {row['succeeded']:.0f}, ошибок {row['failed']:.0f}, "
+                f"повторов {row['retried']:.0f}), p50 {format_seconds(row['p50'])}, p95 {format_seconds(row['p95'])}, "
+                f"ожидание p95 {format_seconds(row['wait_p95'])}"
+            )
+        for queue, length in sorted(summary["queues"].items()):
+            self.stdout.write(f"  очередь {queue}: {length:.0f}")
+        if summary["concurrency"]:
+            self.stdout.write(
+                f"  поступление {summary['arrival_rate']:.2f}/с, занято процессов в среднем {summary['busy']:.2f}, "
+                f"рекомендуемая --concurrency: {summary['concurrency']}"
+            )
@@ -0,0 +1,76 @@
+import json
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from habits import analytics
+
+
+class Command(BaseCommand):
+    """
+    Команда для выгрузки привычек с данными пользователей для продуктовой аналитики.
+
+    Привычки читаются потоком и записываются в файл пачками (Parquet, Arrow IPC или CSV),
+    поэтому память не растет с числом строк. Вместе с выгрузкой считается сводка:
+    распределения по времени суток, периодичности и длительности, доля публичных привычек.
+
+    Пример:
+        python manage.py export_habit_analytics habits.parquet --summary summary.json
+    """
+
+    help = "Выгружает привычки с данными пользователей в Parquet, Arrow IPC или CSV и считает сводку"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Путь к файлу выгрузки")
+        parser.add_argument(
+            "--format",
+            dest="output_format",
+            choices=list(analytics.CONTENT_TYPES),
+            help="Формат выгрузки (по умолчанию — по расширению файла, иначе parquet, без pyarrow — csv)",
+        )
+        parser.add_argument("--summary", help="Путь к JSON-файлу сводки (по умолчанию сводка выводится в консоль)")
+        parser.add_argument(
+            "--batch-size", type=int, default=analytics.EXPORT_BATCH_SIZE, help="Сколько строк читать и писать за раз"
+        )
+
+    def handle(self, *args, **options):
+        output_format = options["output_format"] or self.format_from_path(options["output"])
+        if output_format not in analytics.available_formats():
+            raise CommandError(f"Формат {output_format} требует pyarrow; доступно: csv.")
+
+        started = time.perf_counter()
+        summary = analytics.HabitSummary()
+        with open(options["output"], "wb") as output:
+            for chunk in analytics.export_chunks(output_format, summary, batch_size=options["batch_size"]):
+                output.write(chunk)
+
+        result = json.dumps(
+            {
+                **summary.as_dict(),
+                "top_actions": analytics.top_values("action"),
+                "top_places": analytics.top_values("place"),
+            },
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+            indent=2,
+        )
+        if options["summary"]:
+            with open(options["summary"], "w", encoding="utf-8") as summary_file:
+                summary_file.write(result)
+        else:
+            self.stdout.write(result)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Выгружено привычек: {summary.total} ({output_format}) за {time.perf_counter() - started:.1f} с."
+            )
+        )
+
+    @staticmethod
+    def format_from_path(path):
+        """
+        Определяет формат выгрузки по расширению файла.
+        """
+        for output_format, (_, extension) in analytics.CONTENT_TYPES.items():
+            if path.endswith(f".{extension}") or path.endswith(f".{output_format}"):
+                return output_format
+        return analytics.available_formats()[0]
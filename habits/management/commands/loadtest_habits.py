@@ -0,0 +1,105 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+from django.core.management import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+from users.models import Users
+
+DEFAULT_CASES = [
+    "wsgi-sync=http://127.0.0.1:8001/habits/habits/",
+    "asgi-async=http://127.0.0.1:8000/habits/async/",
+]
+
+
+class Command(BaseCommand):
+    """
+    Команда для нагрузочного сравнения синхронного (WSGI) и асинхронного (ASGI) путей API привычек.
+
+    Серверы запускаются отдельно, например:
+        python manage.py runserver --noreload 127.0.0.1:8001
+        uvicorn config.asgi:application --port 8000
+
+    На каждый адрес отправляется --requests запросов с --concurrency одновременными
+    соединениями и JWT пользователя --email. Для каждого адреса выводятся запросы в секунду,
+    медиана и 99-й процентиль задержки и число ошибок (ответы не 2xx и сбои соединения).
+
+    Пример:
+        python manage.py loadtest_habits --email user@example.com --concurrency 50 --requests 5000
+    """
+
+    help = "Сравнивает запросы в секунду и задержку p99 путей WSGI и ASGI"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--case",
+            action="append",
+            dest="cases",
+            metavar="NAME=URL",
+            help="Имя и адрес для замера (можно указать несколько раз). По умолчанию — WSGI :8001 и ASGI :8000",
+        )
+        parser.add_argument("--email", required=True, help="Пользователь, от имени которого выполняются запросы")
+        parser.add_argument("--concurrency", type=int, default=50, help="Сколько запросов выполняется одновременно")
+        parser.add_argument("--requests", type=int, default=2000, help="Сколько запросов отправить на каждый адрес")
+        parser.add_argument("--warmup", type=int, default=50, help="Сколько запросов отправить перед замером")
+        parser.add_argument("--timeout", type=float, default=30.0, help="Таймаут одного запроса, секунды")
+
+    def handle(self, *args, **options):
+        try:
+            user = Users.objects.get(email=options["email"])
+        except Users.DoesNotExist:
+            raise CommandError(f"Пользователь {options['email']} не найден.")
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+
+        for case in options["cases"] or DEFAULT_CASES:
+            name, separator, url = case.partition("=")
+            if not separator:
+                raise CommandError(f"Ожидается NAME=URL, получено {case}.")
+            result = asyncio.run(self.run_case(url, headers, options))
+            self.stdout.write(
+                f"{name}: {result['rps']:,.0f} запросов/с, p50 {result['p50']:.1f} мс, "
+                f"p99 {result['p99']:.1f} мс, ошибок {result['errors']} из {options['requests']}"
+            )
+
+    @staticmethod
+    async def run_case(url, headers, options):
+        """
+        Отправляет запросы на адрес и возвращает пропускную способность, задержки и число ошибок.
+        """
+        concurrency = options["concurrency"]
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(headers=headers, limits=limits, timeout=options["timeout"]) as client:
+            latencies, errors = [], 0
+
+            async def worker(count, record):
+                nonlocal errors
+                for _ in range(count):
+                    started = time.perf_counter()
+                    try:
+                        response = await client.get(url)
+                        failed = not response.is_success
+                    except httpx.HTTPError:
+                        failed = True
+                    if record:
+                        latencies.append(time.perf_counter() - started)
+                        errors += failed
+
+            async def run(total, record):
+                counts = [total // concurrency + (number < total % concurrency) for number in range(concurrency)]
+                await asyncio.gather(*(worker(count, record) for count in counts if count))
+
+            await run(options["warmup"], record=False)
+            started = time.perf_counter()
+            await run(options["requests"], record=True)
+            elapsed = time.perf_counter() - started
+
+        quantiles = (
+            statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+        )
+        return {
+            "rps": len(latencies) / elapsed,
+            "p50": quantiles[49] * 1000,
+            "p99": quantiles[98] * 1000,
+            "errors": errors,
+        }
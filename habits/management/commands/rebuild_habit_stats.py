@@ -0,0 +1,34 @@
+import time
+
+from django.core.management import BaseCommand
+from habits.stats import REBUILD_CHUNK_SIZE, rebuild_stats
+
+
+class Command(BaseCommand):
+    """
+    Команда для пересчета статистики привычек по журналу выполнений.
+
+    Журнал читается потоком (серверный курсор) порциями по --chunk-size строк, поэтому
+    память не растет с объемом истории. Нужна после загрузки истории в обход API
+    или для сверки агрегатов.
+
+    Пример:
+        python manage.py rebuild_habit_stats --habit 1 --habit 2
+    """
+
+    help = "Пересчитывает статистику привычек по журналу выполнений"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--habit", type=int, action="append", help="Пересчитать только указанные привычки")
+        parser.add_argument(
+            "--chunk-size", type=int, default=REBUILD_CHUNK_SIZE, help="Сколько строк журнала читать за раз"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_stats(options["habit"], chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Статистика пересчитана для {written} привычек за {time.perf_counter() - started:.1f} с."
+            )
+        )
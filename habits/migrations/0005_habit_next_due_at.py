@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-16 09:00
+
+from django.db import migrations, models
+from django.utils import timezone
+
+from habits.scheduling import next_occurrence
+
+
+def fill_next_due_at(apps, schema_editor):
+    Habit = apps.get_model("habits", "Habit")
+    now = timezone.now()
+    batch = []
+    for habit in Habit.objects.only("id", "time").iterator(chunk_size=2000):
+        habit.next_due_at = next_occurrence(habit.time, now)
+        batch.append(habit)
+        if len(batch) >= 2000:
+            Habit.objects.bulk_update(batch, ["next_due_at"])
+            batch = []
+    if batch:
+        Habit.objects.bulk_update(batch, ["next_due_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0004_alter_habit_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="next_due_at",
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_next_due_at, migrations.RunPython.noop),
+    ]
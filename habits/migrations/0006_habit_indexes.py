@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-16 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0005_habit_next_due_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(fields=["user", "id"], name="habit_user_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(condition=models.Q(("is_public", True)), fields=["time"], name="habit_public_time_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["id"],
+                include=(
+                    "user",
+                    "place",
+                    "time",
+                    "action",
+                    "is_pleasant",
+                    "linked_habit",
+                    "periodicity",
+                    "reward",
+                    "execution_time",
+                ),
+                name="habit_public_feed_idx",
+            ),
+        ),
+    ]
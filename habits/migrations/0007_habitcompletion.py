@@ -0,0 +1,67 @@
+# Generated by Django 4.2 on 2026-10-16 23:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from habits import partitions
+
+
+def create_completion_table(apps, schema_editor):
+    """
+    В PostgreSQL создает секционированную по месяцам таблицу, в остальных СУБД — обычную.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.create_model(apps.get_model("habits", "HabitCompletion"))
+        return
+    for sql in partitions.create_table_sql():
+        schema_editor.execute(sql)
+    partitions.ensure_partitions(schema_editor.connection)
+
+
+def drop_completion_table(apps, schema_editor):
+    """
+    Удаляет таблицу вместе с секциями.
+    """
+    schema_editor.delete_model(apps.get_model("habits", "HabitCompletion"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0006_habit_indexes"),
+    ]
+
+    # Сначала модель добавляется только в состояние, чтобы RunPython в обе стороны получал ее из apps
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="HabitCompletion",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                            ),
+                        ),
+                        ("completed_at", models.DateTimeField()),
+                        (
+                            "habit",
+                            models.ForeignKey(
+                                db_index=False,
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="completions",
+                                to="habits.habit",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "verbose_name": "Выполнение привычки",
+                        "verbose_name_plural": "Выполнения привычек",
+                        "indexes": [models.Index(fields=["habit", "completed_at"], name="completion_habit_time_idx")],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_completion_table, drop_completion_table),
+    ]
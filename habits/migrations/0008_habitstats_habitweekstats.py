@@ -0,0 +1,66 @@
+# Generated by Django 4.2 on 2026-10-16 23:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0007_habitcompletion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HabitStats",
+            fields=[
+                (
+                    "habit",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="habits.habit",
+                    ),
+                ),
+                ("periodicity", models.PositiveIntegerField()),
+                ("total_completions", models.PositiveIntegerField(default=0)),
+                ("completed_periods", models.PositiveIntegerField(default=0)),
+                ("first_period", models.IntegerField(blank=True, null=True)),
+                ("last_period", models.IntegerField(blank=True, null=True)),
+                ("current_streak", models.PositiveIntegerField(default=0)),
+                ("best_streak", models.PositiveIntegerField(default=0)),
+                ("last_completed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Статистика привычки",
+                "verbose_name_plural": "Статистика привычек",
+            },
+        ),
+        migrations.CreateModel(
+            name="HabitWeekStats",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("week", models.DateField()),
+                ("completions", models.PositiveIntegerField(default=0)),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="week_stats",
+                        to="habits.habit",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Недельная статистика привычки",
+                "verbose_name_plural": "Недельная статистика привычек",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="habitweekstats",
+            constraint=models.UniqueConstraint(fields=("habit", "week"), name="habit_week_stats_unique"),
+        ),
+    ]
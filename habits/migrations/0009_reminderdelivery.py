@@ -0,0 +1,59 @@
+# Generated by Django 4.2 on 2026-10-16 23:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0008_habitstats_habitweekstats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderDelivery",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("slot", models.CharField(max_length=64)),
+                ("chat_id", models.CharField(max_length=50)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("pending", "Отправляется"), ("sent", "Отправлено"), ("failed", "Ошибка")],
+                        max_length=7,
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("updated_at", models.DateTimeField()),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="habits.habit",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Доставка напоминания",
+                "verbose_name_plural": "Доставка напоминаний",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="reminderdelivery",
+            index=models.Index(
+                condition=models.Q(("status", "failed")), fields=["updated_at"], name="reminder_delivery_failed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reminderdelivery",
+            index=models.Index(fields=["updated_at"], name="reminder_delivery_updated_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="reminderdelivery",
+            constraint=models.UniqueConstraint(fields=("habit", "slot"), name="reminder_delivery_unique"),
+        ),
+    ]
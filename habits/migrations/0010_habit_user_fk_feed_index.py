@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-17 00:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("habits", "0009_reminderdelivery"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="habit",
+            name="habit_public_feed_idx",
+        ),
+        migrations.AlterField(
+            model_name="habit",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="habits",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(condition=models.Q(("is_public", True)), fields=["id"], name="habit_public_feed_idx"),
+        ),
+    ]
@@ -12,26 +12,34 @@
     reward (CharField): Вознаграждение за выполнение привычки (может быть пустым).
     execution_time (PositiveIntegerField): Время выполнения привычки в секундах.
     is_public (BooleanField): Признак того, является ли привычка публичной.
+    next_due_at (DateTimeField): Ближайший срок напоминания о привычке (рассчитывается автоматически).
 
 Методы:
     clean(): Проверяет корректность данных перед сохранением модели.
-    save(*args, **kwargs): Переопределяет метод сохранения для выполнения валидации.
+    update_schedule(): Пересчитывает срок напоминания при изменении времени или периодичности.
+    save(*args, **kwargs): Переопределяет метод сохранения для выполнения валидации
+        и пересчета срока напоминания при изменении времени или периодичности.
 
 Meta:
     verbose_name: "Привычка"
     verbose_name_plural: "Привычки"
+    indexes: Составные и частичные индексы под основные запросы (список пользователя,
+        лента публичных привычек, выборка для напоминаний).
 """
 
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from users.models import Users
+from habits.scheduling import next_occurrence, period_index
 
 NULLABLE = {"blank": True, "null": True}
+SCHEDULE_FIELDS = ("time", "periodicity")  # Поля, от которых зависит срок напоминания
 
 
 class Habit(models.Model):
-    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name="habits")
+    # Отдельный индекс не нужен: user_id — первая колонка habit_user_id_idx
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name="habits", db_index=False)
     place = models.CharField(max_length=255)
     time = models.TimeField()
     action = models.CharField(max_length=255)
@@ -43,24 +51,266 @@ class Habit(models.Model):
     reward = models.CharField(max_length=255, **NULLABLE)
     execution_time = models.PositiveIntegerField(help_text="Время в секундах")
     is_public = models.BooleanField(default=False)
+    next_due_at = models.DateTimeField(db_index=True, editable=False, **NULLABLE)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженное расписание, чтобы пересчитывать срок только при его изменении
+        instance._loaded_schedule = (instance.__dict__.get("time"), instance.__dict__.get("periodicity"))
+        # Признак публичности нужен для сброса кэша ленты, если привычку сделали приватной
+        instance._loaded_is_public = instance.__dict__.get("is_public", False)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        # Догруженные отложенные поля (.only/.defer) считаются загруженными, а не измененными
+        loaded = dict(zip(SCHEDULE_FIELDS, getattr(self, "_loaded_schedule", (None, None))))
+        for name in SCHEDULE_FIELDS:
+            if fields is None or name in fields:
+                loaded[name] = self.__dict__.get(name)
+        self._loaded_schedule = tuple(loaded.values())
+        if fields is None or "is_public" in fields:
+            self._loaded_is_public = self.__dict__.get("is_public", False)
 
     def clean(self):
         if self.execution_time > 120:
             raise ValidationError(_("Время выполнения не может превышать 120 секунд."))
-        if self.reward and self.linked_habit:
+        if self.reward and self.linked_habit_id:
             raise ValidationError(_("Можно установить только одно вознаграждение или связанную привычку."))
         if self.periodicity < 7:
             raise ValidationError(_("Привычку нельзя выполнять реже, чем раз в 7 дней."))
-        if self.is_pleasant and (self.reward or self.linked_habit):
+        if self.is_pleasant and (self.reward or self.linked_habit_id):
             raise ValidationError(_("Приятная привычка не может иметь награды или связанной привычки."))
 
+    def update_schedule(self):
+        """
+        Пересчитывает срок напоминания, если он не задан или изменились время или периодичность.
+
+        Возвращает True, если срок изменился. Используется в save() и при массовой записи
+        (bulk_create/bulk_update), которая не вызывает save(). Если время или периодичность
+        не загружались (.only/.defer) и не присваивались, срок не пересчитывается.
+        """
+        deferred = self.get_deferred_fields()
+        if "time" not in deferred:
+            self.time = self._meta.get_field("time").to_python(self.time)
+        loaded = getattr(self, "_loaded_schedule", None)
+        # Незагруженные поля (.only/.defer) не менялись: их не догружаем и не сравниваем
+        unchanged = loaded is not None and all(
+            name in deferred or getattr(self, name) == value for name, value in zip(SCHEDULE_FIELDS, loaded)
+        )
+        if unchanged and ("next_due_at" in deferred or self.next_due_at is not None):
+            return False
+        self.next_due_at = next_occurrence(self.time)
+        self._loaded_schedule = (self.time, self.periodicity)
+        return True
+
     def save(self, *args, **kwargs):
         self.clean()
+        if self.update_schedule() and kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "next_due_at"}
         super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = "Привычка"
         verbose_name_plural = "Привычки"
+        indexes = [
+            # Список привычек пользователя в порядке id
+            models.Index(fields=["user", "id"], name="habit_user_id_idx"),
+            # Выборка публичных привычек по времени для ежедневных напоминаний
+            models.Index(fields=["time"], condition=models.Q(is_public=True), name="habit_public_time_idx"),
+            # Лента публичных привычек: курсорная пагинация по id среди публичных. Страницы ленты
+            # кэшируются, поэтому колонки берутся из таблицы, а узкий индекс не удорожает запись привычек
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_public=True),
+                name="habit_public_feed_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Habit: {self.action} at {self.time} in {self.place}"
+
+
+class HabitCompletion(models.Model):
+    """
+    Событие выполнения привычки.
+
+    Журнал только для добавления: записи не изменяются и не удаляются по одной (удаляются
+    только вместе с привычкой). В PostgreSQL таблица секционирована по месяцам поля
+    completed_at (см. habits.partitions), в других СУБД — обычная таблица.
+
+    Атрибуты:
+        habit (ForeignKey): Выполненная привычка.
+        completed_at (DateTimeField): Момент выполнения.
+    """
+
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name="completions", db_index=False)
+    completed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Выполнение привычки"
+        verbose_name_plural = "Выполнения привычек"
+        indexes = [models.Index(fields=["habit", "completed_at"], name="completion_habit_time_idx")]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError("Записи о выполнении привычек нельзя изменять.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("Записи о выполнении привычек нельзя удалять.")
+
+    def __str__(self):
+        return f"Completion: habit {self.habit_id} at {self.completed_at}"
+
+
+class HabitStats(models.Model):
+    """
+    Агрегированная статистика выполнения привычки.
+
+    Обновляется при записи каждого пакета выполнений (см. habits.stats), поэтому серии
+    и доля выполненных периодов не пересчитываются по истории при чтении. Период —
+    отрезок длиной periodicity дней (см. habits.scheduling.period_index).
+
+    Атрибуты:
+        habit (OneToOneField): Привычка.
+        periodicity (PositiveIntegerField): Периодичность, по которой посчитаны периоды.
+        total_completions (PositiveIntegerField): Всего отметок о выполнении.
+        completed_periods (PositiveIntegerField): Периодов хотя бы с одним выполнением.
+        first_period (IntegerField): Номер первого выполненного периода.
+        last_period (IntegerField): Номер последнего выполненного периода.
+        current_streak (PositiveIntegerField): Серия подряд выполненных периодов, заканчивающаяся last_period.
+        best_streak (PositiveIntegerField): Самая длинная серия.
+        last_completed_at (DateTimeField): Момент последнего выполнения.
+    """
+
+    habit = models.OneToOneField(Habit, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    periodicity = models.PositiveIntegerField()
+    total_completions = models.PositiveIntegerField(default=0)
+    completed_periods = models.PositiveIntegerField(default=0)
+    first_period = models.IntegerField(**NULLABLE)
+    last_period = models.IntegerField(**NULLABLE)
+    current_streak = models.PositiveIntegerField(default=0)
+    best_streak = models.PositiveIntegerField(default=0)
+    last_completed_at = models.DateTimeField(**NULLABLE)
+
+    class Meta:
+        verbose_name = "Статистика привычки"
+        verbose_name_plural = "Статистика привычек"
+
+    def add_completion(self, completed_at):
+        """
+        Учитывает выполнение привычки.
+
+        Возвращает False, если выполнение относится к периоду раньше последнего учтенного:
+        такое событие может заполнить пропуск в серии, и статистику нужно пересчитать по истории.
+        """
+        period = period_index(completed_at, self.periodicity)
+        if self.last_period is not None and period < self.last_period:
+            return False
+        self.total_completions += 1
+        if self.last_completed_at is None or completed_at > self.last_completed_at:
+            self.last_completed_at = completed_at
+        if period == self.last_period:
+            return True
+        if self.first_period is None:
+            self.first_period = period
+        self.current_streak = self.current_streak + 1 if self.last_period == period - 1 else 1
+        self.best_streak = max(self.best_streak, self.current_streak)
+        self.completed_periods += 1
+        self.last_period = period
+        return True
+
+    def streak(self, now):
+        """
+        Текущая серия на момент now: серия прервана, если не выполнен ни текущий, ни предыдущий период.
+        """
+        if self.last_period is None or self.last_period < period_index(now, self.periodicity) - 1:
+            return 0
+        return self.current_streak
+
+    def completion_rate(self, now):
+        """
+        Доля выполненных периодов с первого выполнения до текущего периода включительно.
+        """
+        if self.first_period is None:
+            return 0.0
+        periods = period_index(now, self.periodicity) - self.first_period + 1
+        return round(self.completed_periods / max(periods, self.completed_periods), 4)
+
+    def __str__(self):
+        return f"Stats: habit {self.habit_id}"
+
+
+class HabitWeekStats(models.Model):
+    """
+    Количество выполнений привычки за неделю.
+
+    Атрибуты:
+        habit (ForeignKey): Привычка.
+        week (DateField): Понедельник недели (по локальной дате проекта).
+        completions (PositiveIntegerField): Количество выполнений за неделю.
+    """
+
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name="week_stats", db_index=False)
+    week = models.DateField()
+    completions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Недельная статистика привычки"
+        verbose_name_plural = "Недельная статистика привычек"
+        constraints = [models.UniqueConstraint(fields=["habit", "week"], name="habit_week_stats_unique")]
+
+    def __str__(self):
+        return f"Week stats: habit {self.habit_id}, {self.week}"
+
+
+class ReminderDelivery(models.Model):
+    """
+    Запись журнала доставки напоминания: одно напоминание о привычке в одном слоте.
+
+    Слот — запланированная отправка: срок next_due_at, дата ежедневной рассылки или задача
+    ручного напоминания (см. habits.ledger). Уникальность (habit, slot) не дает отправить одно
+    напоминание дважды, а неудачные отправки повторяются по этому журналу. Связь с привычкой
+    без внешнего ключа в базе: запись о доставке не должна мешать удалению привычки,
+    а старые записи удаляются по updated_at.
+
+    Атрибуты:
+        habit (ForeignKey): Привычка.
+        slot (CharField): Запланированная отправка.
+        chat_id (CharField): Чат, в который отправлялось напоминание.
+        status (CharField): Состояние: pending (занято отправителем), sent или failed.
+        attempts (PositiveSmallIntegerField): Сколько раз отправка завершалась.
+        updated_at (DateTimeField): Момент последнего изменения.
+    """
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Отправляется"), (SENT, "Отправлено"), (FAILED, "Ошибка")]
+
+    habit = models.ForeignKey(
+        Habit, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+"
+    )
+    slot = models.CharField(max_length=64)
+    chat_id = models.CharField(max_length=50)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Доставка напоминания"
+        verbose_name_plural = "Доставка напоминаний"
+        constraints = [models.UniqueConstraint(fields=["habit", "slot"], name="reminder_delivery_unique")]
+        indexes = [
+            # Выборка неудачных отправок для повтора
+            models.Index(
+                fields=["updated_at"], condition=models.Q(status="failed"), name="reminder_delivery_failed_idx"
+            ),
+            # Удаление старых записей
+            models.Index(fields=["updated_at"], name="reminder_delivery_updated_idx"),
+        ]
+
+    def __str__(self):
+        return f"Delivery: habit {self.habit_id}, {self.slot}: {self.status}"
@@ -0,0 +1,77 @@
+"""
+Помесячное секционирование таблицы выполнений привычек в PostgreSQL.
+
+Таблица habits_habitcompletion создается как PARTITION BY RANGE (completed_at) с секцией
+по умолчанию. Секции на текущий и следующие месяцы создаются заранее ежедневной задачей
+create_completion_partitions: если строки будущего месяца успеют попасть в секцию
+по умолчанию, создать для него секцию будет нельзя.
+
+Функции:
+    - create_table_sql: SQL создания секционированной таблицы с индексами.
+    - ensure_partitions: Создает недостающие секции на текущий и следующие месяцы.
+"""
+
+from datetime import date
+
+from django.db import connection as default_connection
+from django.utils import timezone
+
+TABLE = "habits_habitcompletion"
+PARTITIONS_AHEAD = 2  # На сколько месяцев вперед создаются секции
+
+
+def create_table_sql():
+    """
+    Возвращает SQL создания секционированной таблицы выполнений, ее индексов и секции по умолчанию.
+
+    Первичный ключ секционированной таблицы обязан включать ключ секционирования,
+    поэтому он составной: (id, completed_at).
+    """
+    return [
+        f"""
+        CREATE TABLE {TABLE} (
+            id bigserial NOT NULL,
+            habit_id bigint NOT NULL REFERENCES habits_habit (id) DEFERRABLE INITIALLY DEFERRED,
+            completed_at timestamp with time zone NOT NULL,
+            PRIMARY KEY (id, completed_at)
+        ) PARTITION BY RANGE (completed_at)
+        """,
+        f"CREATE INDEX completion_habit_time_idx ON {TABLE} (habit_id, completed_at)",
+        f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT",
+    ]
+
+
+def _add_months(month, months):
+    years, month_index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+
+def ensure_partitions(connection=None, months_ahead=PARTITIONS_AHEAD, today=None):
+    """
+    Создает секции на текущий и months_ahead следующих месяцев, если их еще нет.
+
+    Args:
+        connection: Подключение к базе. По умолчанию — основное.
+        months_ahead (int): Сколько следующих месяцев подготовить.
+        today (date, optional): Текущая дата (по умолчанию — сегодня по UTC).
+
+    Returns:
+        list[str]: Имена секций, которые должны существовать (для не-PostgreSQL — пустой список).
+    """
+    connection = connection or default_connection
+    if connection.vendor != "postgresql":
+        return []
+
+    today = today or timezone.now().date()
+    first_month = today.replace(day=1)
+    names = []
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            month = _add_months(first_month, offset)
+            name = f"{TABLE}_y{month.year}m{month.month:02d}"
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00+00') TO ('{_add_months(month, 1).isoformat()} 00:00+00')"
+            )
+            names.append(name)
+    return names
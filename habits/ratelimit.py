@@ -0,0 +1,205 @@
+"""
+Ограничение частоты отправки сообщений в Telegram.
+
+Telegram ограничивает бота глобально (около 30 сообщений в секунду) и по каждому чату
+(около одного сообщения в секунду). Перед каждой отправкой воркер занимает токен сразу
+в двух корзинах (token bucket): глобальной и корзине чата. Состояние корзин хранится в Redis,
+поэтому лимит общий для всех воркеров. Если Redis не настроен, используются корзины
+в памяти процесса с той же логикой.
+
+После ответа 429 отправка приостанавливается для всех воркеров на retry_after секунд.
+
+Асинхронные варианты (aacquire, apause) не блокируют цикл событий: запросы к Redis
+выполняются в потоке (asyncio.to_thread), а корзины в памяти проверяются на месте.
+
+Функции:
+    - acquire: Занимает слот на отправку сообщения в чат или возвращает время ожидания.
+    - aacquire: Асинхронный вариант acquire.
+    - pause: Приостанавливает отправку для всех воркеров.
+    - apause: Асинхронный вариант pause.
+    - get_backend: Возвращает хранилище корзин (Redis или память процесса).
+"""
+
+import asyncio
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+from config.redis_client import get_redis
+
+GLOBAL_BUCKET_KEY = "telegram:bucket:global"
+CHAT_BUCKET_KEY = "telegram:bucket:chat:{}"
+PAUSE_KEY = "telegram:pause"
+MAX_INLINE_WAIT = 1.0  # Более долгое ожидание выполняется отложенным повтором задачи, а не сном воркера
+
+# KEYS: ключ паузы, затем ключи корзин; ARGV: пары (скорость, емкость) для каждой корзины.
+# Возвращает строкой время ожидания в секундах ("0" — токены заняты во всех корзинах).
+ACQUIRE_SCRIPT = """
+local pause = redis.call('PTTL', KEYS[1])
+if pause > 0 then
+    return tostring(pause / 1000)
+end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local wait = 0
+local levels = {}
+for i = 2, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 3])
+    local capacity = tonumber(ARGV[2 * i - 2])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i = 2, #KEYS do
+    local rate = tonumber(ARGV[2 * i - 3])
+    local capacity = tonumber(ARGV[2 * i - 2])
+    redis.call('HSET', KEYS[i], 'tokens', levels[i] - 1, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+end
+return '0'
+"""
+
+
+class RedisTokenBuckets:
+    """
+    Корзины токенов в Redis. Проверка и списание выполняются атомарно одним Lua-скриптом.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.script = client.register_script(ACQUIRE_SCRIPT)
+
+    def try_acquire(self, buckets):
+        keys = [PAUSE_KEY] + [key for key, _, _ in buckets]
+        args = [value for _, rate, capacity in buckets for value in (rate, capacity)]
+        return float(self.script(keys=keys, args=args))
+
+    async def atry_acquire(self, buckets):
+        # Синхронный клиент в потоке: цикл событий продолжает отправку, пока ждем ответа Redis
+        return await asyncio.to_thread(self.try_acquire, buckets)
+
+    def pause(self, seconds):
+        self.client.set(PAUSE_KEY, 1, px=int(seconds * 1000))
+
+    async def apause(self, seconds):
+        await asyncio.to_thread(self.pause, seconds)
+
+
+class LocalTokenBuckets:
+    """
+    Корзины токенов в памяти процесса (если Redis не настроен).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.levels = {}
+        self.paused_until = 0.0
+
+    def try_acquire(self, buckets):
+        with self.lock:
+            now = time.monotonic()
+            if self.paused_until > now:
+                return self.paused_until - now
+            wait = 0.0
+            levels = {}
+            for key, rate, capacity in buckets:
+                tokens, ts = self.levels.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - ts) * rate)
+                levels[key] = tokens
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            if wait > 0:
+                return wait
+            for key, tokens in levels.items():
+                self.levels[key] = (tokens - 1, now)
+            return 0.0
+
+    async def atry_acquire(self, buckets):
+        return self.try_acquire(buckets)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def apause(self, seconds):
+        self.pause(seconds)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """
+    Возвращает хранилище корзин: Redis, если он настроен, иначе память процесса.
+    """
+    client = get_redis()
+    if client is None:
+        return LocalTokenBuckets()
+    return RedisTokenBuckets(client)
+
+
+def acquire(chat_id, max_wait=MAX_INLINE_WAIT):
+    """
+    Занимает слот на отправку одного сообщения в чат.
+
+    Короткие ожидания (до max_wait секунд) выдерживаются на месте, более долгие возвращаются
+    вызывающему коду, чтобы задача была повторена отложенно и не занимала воркер.
+
+    Args:
+        chat_id (str): Идентификатор чата получателя.
+        max_wait (float): Максимальное ожидание на месте в секундах.
+
+    Returns:
+        float: 0, если слот занят, иначе время в секундах, через которое стоит повторить попытку.
+    """
+    buckets = _buckets(chat_id)
+    while True:
+        wait = get_backend().try_acquire(buckets)
+        if wait <= 0:
+            return 0
+        if wait > max_wait:
+            return wait
+        time.sleep(wait)
+
+
+async def aacquire(chat_id, max_wait=MAX_INLINE_WAIT):
+    """
+    Асинхронный вариант acquire: ни ожидания, ни запросы к Redis не блокируют цикл событий.
+    """
+    buckets = _buckets(chat_id)
+    while True:
+        wait = await get_backend().atry_acquire(buckets)
+        if wait <= 0:
+            return 0
+        if wait > max_wait:
+            return wait
+        await asyncio.sleep(wait)
+
+
+def _buckets(chat_id):
+    return [
+        (GLOBAL_BUCKET_KEY, settings.TELEGRAM_GLOBAL_RATE_LIMIT, settings.TELEGRAM_GLOBAL_RATE_LIMIT),
+        (CHAT_BUCKET_KEY.format(chat_id), settings.TELEGRAM_CHAT_RATE_LIMIT, 1),
+    ]
+
+
+def pause(seconds):
+    """
+    Приостанавливает отправку сообщений для всех воркеров (после ответа 429).
+    """
+    get_backend().pause(seconds)
+
+
+async def apause(seconds):
+    """
+    Асинхронный вариант pause.
+    """
+    await get_backend().apause(seconds)
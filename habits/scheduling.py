@@ -0,0 +1,71 @@
+"""
+Расчет расписания напоминаний о привычках.
+
+Функции:
+    - next_occurrence: Ближайший момент времени привычки (в часовом поясе проекта), не раньше заданного.
+    - advance: Следующий срок напоминания после отправки с учетом периодичности привычки.
+    - period_index: Номер периода привычки, в который попадает момент времени.
+    - week_start: Понедельник недели, в которую попадает момент времени.
+"""
+
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+
+def next_occurrence(habit_time, now=None):
+    """
+    Возвращает ближайший момент, когда наступает время привычки.
+
+    Args:
+        habit_time (datetime.time): Время выполнения привычки (локальное время проекта).
+        now (datetime, optional): Точка отсчета. По умолчанию — текущий момент.
+
+    Returns:
+        datetime: Осведомленный о часовом поясе момент не раньше now.
+    """
+    now = now or timezone.now()
+    local_now = timezone.localtime(now)
+    due = timezone.make_aware(datetime.combine(local_now.date(), habit_time))
+    if due < now:
+        due = timezone.make_aware(datetime.combine(local_now.date() + timedelta(days=1), habit_time))
+    return due
+
+
+def advance(due, periodicity, now=None):
+    """
+    Сдвигает срок напоминания на периодичность привычки.
+
+    Если напоминания были пропущены (например, воркер не работал), пропущенные
+    периоды не догоняются: возвращается первый срок позже now.
+
+    Args:
+        due (datetime): Срок, по которому только что отправлено напоминание.
+        periodicity (int): Периодичность привычки в днях.
+        now (datetime, optional): Текущий момент. По умолчанию — timezone.now().
+
+    Returns:
+        datetime: Следующий срок напоминания.
+    """
+    now = now or timezone.now()
+    period = timedelta(days=periodicity)
+    missed = (now - due) // period if due <= now else 0
+    return due + period * (missed + 1)
+
+
+def period_index(moment, periodicity):
+    """
+    Возвращает номер периода привычки (по локальной дате проекта), в который попадает момент.
+
+    Периоды длиной periodicity дней отсчитываются от начала летоисчисления, поэтому
+    соседние периоды имеют соседние номера, а выполнение раз в период образует серию.
+    """
+    return timezone.localtime(moment).date().toordinal() // periodicity
+
+
+def week_start(moment):
+    """
+    Возвращает дату понедельника недели (по локальной дате проекта), в которую попадает момент.
+    """
+    day = timezone.localtime(moment).date()
+    return day - timedelta(days=day.weekday())
@@ -1,6 +1,68 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Habit
 
+COMPLETION_CLOCK_SKEW = timedelta(minutes=5)  # Допустимое расхождение часов клиента и сервера
+
+
+def linked_habits_for(user):
+    """
+    Возвращает привычки, которые пользователь может указать как связанные: только свои приятные привычки.
+    """
+    return Habit.objects.filter(is_pleasant=True, user_id=user.pk)
+
+
+class LinkedHabitField(serializers.PrimaryKeyRelatedField):
+    """
+    Поле связанной привычки.
+
+    Выбор ограничен приятными привычками пользователя из запроса (см. linked_habits_for).
+    Если в контексте сериализатора передан словарь заранее загруженных привычек
+    (linked_habits, см. load_linked_habits), ссылки разрешаются по нему, и список
+    привычек проверяется без отдельного запроса на каждый элемент.
+    """
+
+    def get_queryset(self):
+        request = self.context.get("request")
+        if request is None:
+            return super().get_queryset()
+        return linked_habits_for(request.user)
+
+    def to_internal_value(self, data):
+        linked_habits = self.context.get("linked_habits")
+        if linked_habits is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in linked_habits:
+            self.fail("does_not_exist", pk_value=data)
+        return linked_habits[pk]
+
+
+def load_linked_habits(items, queryset):
+    """
+    Загружает одним запросом все связанные привычки, на которые ссылаются элементы списка.
+
+    Args:
+        items (list): Данные привычек из запроса.
+        queryset (QuerySet): Привычки, на которые допустимо ссылаться.
+
+    Returns:
+        dict: Привычки по id для контекста сериализатора (linked_habits).
+    """
+    ids = set()
+    for item in items:
+        value = item.get("linked_habit") if isinstance(item, dict) else None
+        if isinstance(value, (int, str)) and not isinstance(value, bool) and str(value).isdigit():
+            ids.add(int(value))
+    return queryset.in_bulk(ids) if ids else {}
+
 
 class HabitSerializer(serializers.ModelSerializer):
     """
@@ -13,7 +75,7 @@ class HabitSerializer(serializers.ModelSerializer):
         - time (TimeField): Время выполнения привычки.
         - action (str): Действие, описывающее привычку.
         - is_pleasant (bool): Флаг, указывающий, является ли привычка приятной.
-        - linked_habit (ForeignKey): Другая привычка, связанная с текущей.
+        - linked_habit (ForeignKey): Другая привычка, связанная с текущей (только своя приятная привычка).
         - periodicity (int): Периодичность выполнения привычки (в днях).
         - reward (str): Вознаграждение за выполнение привычки.
         - execution_time (int): Время выполнения привычки (в секундах).
@@ -31,6 +93,8 @@ class HabitSerializer(serializers.ModelSerializer):
         - serializers.ValidationError: Возникает в случае, если данные не проходят валидацию.
     """
 
+    linked_habit = LinkedHabitField(queryset=Habit.objects.filter(is_pleasant=True), allow_null=True, required=False)
+
     class Meta:
         model = Habit
         fields = [
@@ -107,3 +171,28 @@ class HabitSerializer(serializers.ModelSerializer):
                 "Приятная привычка не может иметь вознаграждения или связанную привычку."
             )
         return data
+
+
+class HabitCompletionSerializer(serializers.Serializer):
+    """
+    Сериализатор элемента пакета выполнений привычек.
+
+    Поля:
+        - habit (int): Идентификатор выполненной привычки.
+        - completed_at (datetime): Момент выполнения (по умолчанию — момент запроса).
+
+    Принадлежность привычек пользователю проверяется для всего пакета одним запросом
+    в представлении, поэтому здесь привычка не загружается.
+    """
+
+    habit = serializers.IntegerField(min_value=1)
+    completed_at = serializers.DateTimeField(required=False)
+
+    def validate_completed_at(self, value):
+        """
+        Запрещает отметки о выполнении в будущем: такие строки попали бы в секцию по умолчанию
+        и помешали бы создать секцию их месяца.
+        """
+        if value > timezone.now() + COMPLETION_CLOCK_SKEW:
+            raise serializers.ValidationError("Момент выполнения не может быть в будущем.")
+        return value
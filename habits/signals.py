@@ -0,0 +1,26 @@
+"""
+Обработчики сигналов модели Habit.
+
+Изменение или удаление публичной привычки (а также снятие признака публичности)
+сбрасывает кэш ленты публичных привычек после фиксации транзакции.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from habits import feed_cache
+from habits.models import Habit
+
+
+@receiver(post_save, sender=Habit)
+def invalidate_public_feed_on_save(sender, instance, **kwargs):
+    if instance.is_public or getattr(instance, "_loaded_is_public", False):
+        transaction.on_commit(feed_cache.invalidate)
+    instance._loaded_is_public = instance.is_public
+
+
+@receiver(post_delete, sender=Habit)
+def invalidate_public_feed_on_delete(sender, instance, **kwargs):
+    if instance.is_public:
+        transaction.on_commit(feed_cache.invalidate)
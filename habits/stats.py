@@ -0,0 +1,215 @@
+"""
+Статистика выполнения привычек: серии, доля выполненных периодов и недельные сводки.
+
+Агрегаты (HabitStats, HabitWeekStats) обновляются при записи каждого пакета выполнений:
+строки статистики затронутых привычек блокируются, события применяются к ним в памяти
+и записываются обратно одним UPDATE. Событие из периода раньше последнего учтенного
+(запоздавшая отметка) или смена периодичности привычки приводят к пересчету статистики
+этой привычки по истории. Полный пересчет читает журнал выполнений потоком.
+
+Функции:
+    - apply_completions: Учитывает пакет выполнений в агрегатах.
+    - rebuild_stats: Пересчитывает агрегаты по журналу выполнений.
+    - habit_summary: Статистика одной привычки для ответа API.
+    - user_stats: Статистика всех привычек пользователя и недельная сводка.
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from habits.models import Habit, HabitCompletion, HabitStats, HabitWeekStats
+from habits.scheduling import week_start
+
+STATS_FIELDS = [
+    "periodicity",
+    "total_completions",
+    "completed_periods",
+    "first_period",
+    "last_period",
+    "current_streak",
+    "best_streak",
+    "last_completed_at",
+]
+REBUILD_CHUNK_SIZE = 5000  # Сколько строк журнала читается с сервера за раз
+REBUILD_HABITS_BATCH = 1000  # Для скольких привычек статистика записывается за раз
+SUMMARY_WEEKS = 4  # Сколько последних недель входит в недельную сводку
+
+
+def apply_completions(rows):
+    """
+    Учитывает пакет выполнений в статистике привычек.
+
+    Вызывается в той же транзакции, что и запись выполнений в журнал.
+
+    Args:
+        rows (list): Пары (habit_id, completed_at).
+    """
+    moments = defaultdict(list)
+    for habit_id, completed_at in rows:
+        moments[habit_id].append(completed_at)
+
+    with transaction.atomic():
+        periodicities = dict(Habit.objects.filter(id__in=moments).values_list("id", "periodicity"))
+        HabitStats.objects.bulk_create(
+            [
+                HabitStats(habit_id=habit_id, periodicity=periodicity)
+                for habit_id, periodicity in periodicities.items()
+            ],
+            ignore_conflicts=True,
+        )
+        stats = HabitStats.objects.select_for_update().in_bulk(list(periodicities))
+
+        updated, replay, weeks = [], [], Counter()
+        for habit_id, item in stats.items():
+            if item.periodicity != periodicities[habit_id] or not all(
+                item.add_completion(completed_at) for completed_at in sorted(moments[habit_id])
+            ):
+                replay.append(habit_id)
+                continue
+            updated.append(item)
+            weeks.update((habit_id, week_start(completed_at)) for completed_at in moments[habit_id])
+
+        HabitStats.objects.bulk_update(updated, STATS_FIELDS)
+        _add_weeks(weeks)
+        if replay:
+            rebuild_stats(replay)
+
+
+def _add_weeks(weeks):
+    """
+    Прибавляет количества выполнений к недельной статистике (строки привычек уже заблокированы).
+    """
+    if not weeks:
+        return
+    existing = HabitWeekStats.objects.filter(
+        habit_id__in={habit_id for habit_id, _ in weeks}, week__in={week for _, week in weeks}
+    ).values_list("habit_id", "week", "completions")
+    for habit_id, week, completions in existing:
+        if (habit_id, week) in weeks:
+            weeks[habit_id, week] += completions
+    HabitWeekStats.objects.bulk_create(
+        [HabitWeekStats(habit_id=habit_id, week=week, completions=count) for (habit_id, week), count in weeks.items()],
+        update_conflicts=True,
+        unique_fields=["habit", "week"],
+        update_fields=["completions"],
+    )
+
+
+def rebuild_stats(habit_ids=None, chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    Пересчитывает статистику по журналу выполнений.
+
+    Журнал читается потоком в порядке (habit_id, completed_at) по индексу журнала; в памяти
+    одновременно находится история не более REBUILD_HABITS_BATCH привычек.
+
+    Args:
+        habit_ids (list, optional): Привычки для пересчета. По умолчанию — все.
+        chunk_size (int): Сколько строк журнала читается с сервера за раз.
+
+    Returns:
+        int: Количество привычек, для которых записана статистика.
+    """
+    completions = HabitCompletion.objects.order_by("habit_id", "completed_at")
+    stats, weeks = HabitStats.objects.all(), HabitWeekStats.objects.all()
+    if habit_ids is not None:
+        completions = completions.filter(habit_id__in=habit_ids)
+        stats, weeks = stats.filter(habit_id__in=habit_ids), weeks.filter(habit_id__in=habit_ids)
+
+    written = 0
+    with transaction.atomic():
+        stats.delete()
+        weeks.delete()
+        history = defaultdict(list)
+        for habit_id, completed_at in completions.values_list("habit_id", "completed_at").iterator(chunk_size):
+            if habit_id not in history and len(history) == REBUILD_HABITS_BATCH:
+                written += _write_history(history)
+                history.clear()
+            history[habit_id].append(completed_at)
+        written += _write_history(history)
+    return written
+
+
+def _write_history(history):
+    """
+    Считает и записывает статистику для истории выполнений группы привычек.
+    """
+    periodicities = dict(Habit.objects.filter(id__in=history).values_list("id", "periodicity"))
+    stats, weeks = [], Counter()
+    for habit_id, moments in history.items():
+        if habit_id not in periodicities:
+            continue
+        item = HabitStats(habit_id=habit_id, periodicity=periodicities[habit_id])
+        for completed_at in moments:
+            item.add_completion(completed_at)
+        stats.append(item)
+        weeks.update((habit_id, week_start(completed_at)) for completed_at in moments)
+    HabitStats.objects.bulk_create(stats)
+    HabitWeekStats.objects.bulk_create(
+        [HabitWeekStats(habit_id=habit_id, week=week, completions=count) for (habit_id, week), count in weeks.items()]
+    )
+    return len(stats)
+
+
+def habit_summary(habit, stats=None, now=None):
+    """
+    Возвращает статистику привычки для ответа API.
+
+    Args:
+        habit (Habit): Привычка.
+        stats (HabitStats, optional): Ее статистика (если привычка еще не выполнялась — None).
+        now (datetime, optional): Момент, на который считается текущая серия.
+
+    Returns:
+        dict: Статистика привычки.
+    """
+    now = now or timezone.now()
+    stats = stats or HabitStats(habit=habit, periodicity=habit.periodicity)
+    return {
+        "habit": habit.id,
+        "action": habit.action,
+        "periodicity": habit.periodicity,
+        "total_completions": stats.total_completions,
+        "completed_periods": stats.completed_periods,
+        "current_streak": stats.streak(now),
+        "best_streak": stats.best_streak,
+        "completion_rate": stats.completion_rate(now),
+        "last_completed_at": stats.last_completed_at,
+    }
+
+
+def user_stats(user, now=None, weeks=SUMMARY_WEEKS):
+    """
+    Возвращает статистику всех привычек пользователя и сводку за последние недели.
+
+    Выполняет два запроса независимо от объема истории: привычки вместе со статистикой
+    и сумму недельных выполнений.
+
+    Args:
+        user (Users): Пользователь.
+        now (datetime, optional): Текущий момент.
+        weeks (int): Сколько последних недель включить в сводку.
+
+    Returns:
+        dict: {"habits": [...], "weeks": [{"week", "completions", "expected"}, ...]}.
+    """
+    now = now or timezone.now()
+    habits = list(Habit.objects.filter(user_id=user.pk).select_related("stats").order_by("id"))
+    summaries = [habit_summary(habit, getattr(habit, "stats", None), now) for habit in habits]
+
+    first_week = week_start(now) - timedelta(weeks=weeks - 1)
+    completions = dict(
+        HabitWeekStats.objects.filter(habit__user_id=user.pk, week__gte=first_week)
+        .values("week")
+        .annotate(total=Sum("completions"))
+        .values_list("week", "total")
+    )
+    # Ожидаемое число выполнений за неделю с учетом периодичности каждой привычки
+    expected = round(sum(7 / habit.periodicity for habit in habits), 2)
+    summary = []
+    for number in range(weeks):
+        week = first_week + timedelta(weeks=number)
+        summary.append({"week": week, "completions": completions.get(week, 0), "expected": expected})
+    return {"habits": summaries, "weeks": summary}
@@ -1,42 +1,358 @@
-import os
+import asyncio
+from collections import defaultdict
+
+import httpx
 import requests
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
+from habits import ledger, partitions, ratelimit, telegram
 from habits.models import Habit
-from datetime import datetime
+from habits.scheduling import advance
 
-TELEGRAM_URL = os.getenv("TELEGRAM_URL")
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+REMINDER_BATCH_SIZE = 1000  # Сколько привычек обрабатывается за одну транзакцию
+REMINDER_CHUNK_SIZE = 100  # Сколько напоминаний отправляет одна задача send_telegram_batch
+REMINDER_RETRY_LIMIT = 10_000  # Сколько неудачных напоминаний повторяет один запуск retry_failed_reminders
+TELEGRAM_MAX_RETRIES = 5  # Повторы при сетевых ошибках и ошибках сервера Telegram
 
+# Итоги отправки сообщения (см. deliver_messages)
+SENT = "sent"
+FAILED = "failed"
+RETRY = "retry"
+POSTPONED = "postponed"
 
-@shared_task
-def send_telegram_message(habit_id, chat_id):
+
+@shared_task(bind=True, max_retries=TELEGRAM_MAX_RETRIES)
+def send_telegram_message(self, habit_id, chat_id):
     """
     Асинхронная задача для отправки сообщения в Telegram.
+
+    Соблюдает ограничения частоты Telegram: при нехватке токенов или ответе 429 задача
+    ставится в очередь заново с тем же id и задержкой retry_after (см. _postpone_message),
+    поэтому такие ожидания не ограничены и не расходуют повторы TELEGRAM_MAX_RETRIES.
+    Сетевые ошибки и ошибки сервера повторяются с экспоненциальной задержкой.
+    Отправка учитывается в журнале доставки со слотом task:<id задачи>, поэтому повторная
+    доставка той же задачи не отправит напоминание дважды (см. habits.ledger).
     """
     habit = Habit.objects.get(id=habit_id)
-    message = f"Напоминание: {habit.action} в {habit.time} в {habit.place}."
+    delivery = [(habit_id, f"task:{self.request.id}", chat_id)] if self.request.id else []
+    if delivery and not ledger.claim(delivery):
+        return f"Напоминание для привычки {habit.action} уже отправлено."
+    wait = ratelimit.acquire(chat_id)
+    if wait:
+        ledger.release(delivery)
+        return _postpone_message(self, habit, chat_id, wait)
+    try:
+        response = telegram.send_message(chat_id, telegram.format_reminder(habit))
+    except requests.RequestException as exc:
+        _settle_before_retry(self, [], [], delivery)
+        raise self.retry(exc=exc, countdown=2**self.request.retries)
 
-    url = f"{TELEGRAM_URL}{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {"chat_id": chat_id, "text": message}
-    response = requests.post(url, json=payload)
+    wait = telegram.retry_after(response)
+    if wait:
+        ratelimit.pause(wait)
+        ledger.release(delivery)
+        return _postpone_message(self, habit, chat_id, wait)
+    if telegram.is_retryable(response):
+        _settle_before_retry(self, [], [], delivery)
+        raise self.retry(countdown=2**self.request.retries)
 
     if response.status_code == 200:
+        ledger.record(delivery, [])
         return f"Напоминание отправлено для привычки {habit.action}."
     else:
+        ledger.record([], delivery)
         return f"Ошибка при отправке напоминания для привычки {habit.action}."
 
 
+@shared_task(bind=True, max_retries=TELEGRAM_MAX_RETRIES)
+def send_telegram_batch(self, pairs):
+    """
+    Асинхронная задача для отправки пачки напоминаний в Telegram.
+
+    Привычки загружаются одним запросом, а напоминания для одного чата объединяются
+    в одно сообщение. Сообщения отправляются одновременно (см. deliver_messages); если ждать
+    токен в корзинах ограничения частоты долго или Telegram ответил 429, неотправленный
+    остаток пачки ставится в очередь с задержкой и ни одно напоминание не теряется.
+    Сетевые ошибки и ошибки сервера повторяются для остатка пачки с экспоненциальной задержкой.
+
+    Напоминания со слотом сначала занимаются в журнале доставки (одним запросом к Redis):
+    уже отправленные или отправляемые другой задачей пропускаются. Итоги отправки пачки
+    записываются в журнал одним запросом (см. habits.ledger).
+
+    Args:
+        pairs (list): Пары [habit_id, chat_id] или тройки [habit_id, chat_id, slot].
+    """
+    items = {}
+    for habit_id, chat_id, *slot in pairs:
+        items.setdefault((habit_id, slot[0] if slot else None), chat_id)
+    habits = Habit.objects.only("id", "action", "time", "place").in_bulk({habit_id for habit_id, _ in items})
+    deliveries = [(habit_id, slot, chat_id) for (habit_id, slot), chat_id in items.items() if habit_id in habits]
+    claimed = ledger.claim([delivery for delivery in deliveries if delivery[1] is not None])
+    by_chat = defaultdict(lambda: defaultdict(list))
+    for habit_id, slot, chat_id in deliveries:
+        if slot is None or (habit_id, slot) in claimed:
+            by_chat[chat_id][habit_id].append((habit_id, slot, chat_id))
+    # Привычка с несколькими слотами упоминается в сообщении один раз, а в журнал попадают все ее слоты
+    messages = [
+        (chat_id, group, [delivery for habit in group for delivery in chat_deliveries[habit.id]])
+        for chat_id, chat_deliveries in by_chat.items()
+        for group in telegram.group_reminders([habits[habit_id] for habit_id in chat_deliveries])
+    ]
+
+    outcomes, countdown = telegram.run(
+        deliver_messages([(chat_id, telegram.format_reminders(group)) for chat_id, group, _ in messages])
+    )
+    results = defaultdict(list)
+    for message, outcome in zip(messages, outcomes):
+        results[outcome].append(message)
+    delivered, failed = len(results[SENT]), len(results[FAILED])
+    sent, undelivered = _deliveries(results[SENT]), _deliveries(results[FAILED])
+    rest = results[POSTPONED] + results[RETRY]
+    if countdown:
+        _settle(sent, undelivered, released=_deliveries(rest))
+        return _postpone_batch(rest, countdown, delivered, failed)
+    if rest:
+        _settle_before_retry(self, sent, undelivered, _deliveries(rest))
+        raise self.retry(args=[_batch_pairs(rest)], countdown=2**self.request.retries)
+
+    _settle(sent, undelivered)
+    return f"Отправлено сообщений: {delivered}, ошибок: {failed}."
+
+
+async def deliver_messages(messages, concurrency=None):
+    """
+    Отправляет сообщения в Telegram одновременно, не больше concurrency запросов сразу.
+
+    Перед каждым сообщением занимается токен в корзинах ограничения частоты (короткие ожидания
+    выдерживаются на месте). Если ждать долго или Telegram ответил 429, сообщения, которые
+    еще не начали отправляться, откладываются; уже отправляемые дожидаются ответа.
+
+    Args:
+        messages (list): Пары (chat_id, text).
+        concurrency (int, optional): Сколько запросов выполняется одновременно. По умолчанию —
+            настройка TELEGRAM_SEND_CONCURRENCY.
+
+    Returns:
+        tuple: Итоги по сообщениям (SENT, FAILED, RETRY — сетевая ошибка или ошибка сервера,
+            POSTPONED) и задержка в секундах для отложенных сообщений (0, если их нет).
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.TELEGRAM_SEND_CONCURRENCY)
+    outcomes = [POSTPONED] * len(messages)
+    countdown = 0
+
+    async def deliver(index, chat_id, text):
+        nonlocal countdown
+        async with semaphore:
+            if countdown:
+                return
+            wait = await ratelimit.aacquire(chat_id)
+            if wait:
+                countdown = max(countdown, wait)
+                return
+            try:
+                response = await telegram.asend_message(chat_id, text)
+            except httpx.HTTPError:
+                outcomes[index] = RETRY
+                return
+            wait = telegram.retry_after(response)
+            if wait:
+                countdown = max(countdown, wait)
+                await ratelimit.apause(wait)
+            elif telegram.is_retryable(response):
+                outcomes[index] = RETRY
+            else:
+                outcomes[index] = SENT if response.status_code == 200 else FAILED
+
+    await asyncio.gather(*(deliver(index, chat_id, text) for index, (chat_id, text) in enumerate(messages)))
+    return outcomes, countdown
+
+
+def _batch_pairs(messages):
+    """
+    Аргументы send_telegram_batch для повторной отправки сообщений пачки.
+    """
+    return [
+        [habit_id, chat_id, slot] if slot is not None else [habit_id, chat_id]
+        for _, _, deliveries in messages
+        for habit_id, slot, chat_id in deliveries
+    ]
+
+
+def _deliveries(messages):
+    """
+    Тройки (habit_id, slot, chat_id) журнала доставки для напоминаний со слотом.
+    """
+    return [delivery for _, _, deliveries in messages for delivery in deliveries if delivery[1] is not None]
+
+
+def _settle(sent, failed, released=()):
+    """
+    Записывает итоги отправки в журнал доставки и освобождает отложенные напоминания.
+    """
+    ledger.record(sent, failed)
+    ledger.release(list(released))
+
+
+def _settle_before_retry(task, sent, failed, rest):
+    """
+    Записывает итоги перед повтором задачи. Неотправленный остаток освобождается для повтора,
+    а если повторов больше не будет — записывается как неудачный и повторяется по журналу.
+    """
+    if task.request.retries >= task.max_retries:
+        _settle(sent, [*failed, *rest])
+    else:
+        _settle(sent, failed, released=rest)
+
+
+def _postpone_message(task, habit, chat_id, countdown):
+    """
+    Откладывает отправку сообщения на countdown секунд. Задача ставится заново с тем же id,
+    чтобы слот журнала доставки не изменился, а счетчик повторов не расходовался (self.retry
+    с max_retries=None все равно ограничен max_retries задачи).
+    """
+    send_telegram_message.apply_async(args=[habit.id, chat_id], countdown=countdown, task_id=task.request.id)
+    return f"Напоминание для привычки {habit.action} отложено на {countdown} с."
+
+
+def _postpone_batch(messages, countdown, delivered, failed):
+    """
+    Откладывает отправку оставшихся сообщений пачки на countdown секунд.
+    """
+    send_telegram_batch.apply_async(args=[_batch_pairs(messages)], countdown=countdown)
+    return f"Отправлено сообщений: {delivered}, ошибок: {failed}, отложено: {len(messages)}."
+
+
+def dispatch_reminders(pairs):
+    """
+    Ставит в очередь отправку напоминаний пачками по REMINDER_CHUNK_SIZE.
+
+    Пары сортируются по чату, чтобы напоминания одному пользователю попадали в одну пачку
+    и объединялись в одно сообщение.
+
+    Args:
+        pairs (list): Пары (habit_id, chat_id) или тройки (habit_id, chat_id, slot).
+    """
+    pairs = sorted(pairs, key=lambda pair: pair[1])
+    for start in range(0, len(pairs), REMINDER_CHUNK_SIZE):
+        end = start + REMINDER_CHUNK_SIZE
+        send_telegram_batch.delay(pairs[start:end])
+
+
 @shared_task
 def send_daily_reminders():
     """
     Периодическая задача для отправки ежедневных напоминаний о привычках.
+
+    Привычки читаются одним потоковым запросом (серверный курсор внутри транзакции), из которого
+    берутся только id привычки и Telegram ID владельца; пользователи без Telegram ID отсекаются в SQL.
+    Напоминания ставятся в очередь пачками по мере чтения, а их число считается на лету.
+    Слот напоминания — текущая дата, поэтому повторный запуск в тот же день не отправит
+    уже отправленные напоминания (см. habits.ledger).
     """
-    current_time = timezone.now().time()
-    habits = Habit.objects.filter(time__lte=current_time, is_public=True)
+    now = timezone.localtime()
+    current_time = now.time()
+    slot = f"daily:{now.date().isoformat()}"
+    rows = (
+        Habit.objects.filter(time__lte=current_time, is_public=True)
+        .exclude(user__telegram_id="")
+        .order_by("user_id", "id")
+        .values_list("id", "user__telegram_id")
+        .iterator(chunk_size=REMINDER_BATCH_SIZE)
+    )
 
-    for habit in habits:
-        chat_id = habit.user.profile.telegram_chat_id  # Предполагаем, что у пользователя есть профиль с chat_id
-        send_telegram_message.delay(habit.id, chat_id)
+    total = 0
+    chunk = []
+    # Только чтение: во вложенной транзакции точка сохранения не нужна
+    with transaction.atomic(savepoint=False):
+        for habit_id, chat_id in rows:
+            chunk.append((habit_id, chat_id, slot))
+            if len(chunk) == REMINDER_CHUNK_SIZE:
+                send_telegram_batch.delay(chunk)
+                total += len(chunk)
+                chunk = []
+    if chunk:
+        send_telegram_batch.delay(chunk)
+        total += len(chunk)
+
+    return f"Напоминания отправлены для {total} привычек."
+
+
+@shared_task
+def send_due_reminders():
+    """
+    Периодическая задача (раз в минуту) для отправки напоминаний о привычках, срок которых наступил.
 
-    return f"Напоминания отправлены для {habits.count()} привычек."
+    Выбирает по индексу next_due_at только привычки, у которых наступил срок, ставит в очередь
+    отправку напоминаний и сдвигает срок на периодичность привычки. Строки блокируются
+    с SKIP LOCKED, поэтому пересекающиеся запуски не отправят одно напоминание дважды.
+    Слот напоминания — наступивший срок: повторная доставка задачи отправки не отправит
+    напоминание второй раз (см. habits.ledger).
+
+    Как и ежедневная рассылка, напоминания отправляются только по публичным привычкам.
+    Срок приватных привычек тоже сдвигается, чтобы они не накапливались среди наступивших.
+    """
+    now = timezone.now()
+    sent = 0
+    while True:
+        with transaction.atomic():
+            due = list(
+                Habit.objects.select_for_update(skip_locked=True, of=("self",))
+                .filter(next_due_at__lte=now)
+                .order_by("next_due_at")
+                .values_list("id", "next_due_at", "periodicity", "is_public", "user__telegram_id")[
+                    :REMINDER_BATCH_SIZE
+                ]
+            )
+            if not due:
+                break
+            Habit.objects.bulk_update(
+                [
+                    Habit(id=habit_id, next_due_at=advance(due_at, periodicity, now))
+                    for habit_id, due_at, periodicity, *_ in due
+                ],
+                ["next_due_at"],
+            )
+            pairs = [
+                (habit_id, chat_id, f"due:{due_at.isoformat()}")
+                for habit_id, due_at, _, is_public, chat_id in due
+                if is_public and chat_id
+            ]
+            transaction.on_commit(lambda pairs=pairs: dispatch_reminders(pairs))
+            sent += len(pairs)
+        if len(due) < REMINDER_BATCH_SIZE:
+            break
+
+    return f"Напоминания отправлены для {sent} привычек."
+
+
+@shared_task
+def create_completion_partitions():
+    """
+    Периодическая задача (раз в день) для создания секций журнала выполнений на следующие месяцы.
+    """
+    names = partitions.ensure_partitions()
+    return f"Секций журнала выполнений: {len(names)}."
+
+
+@shared_task
+def retry_failed_reminders():
+    """
+    Периодическая задача для повторной отправки напоминаний, которые отправить не удалось.
+
+    Неудачные отправки берутся из журнала доставки по частичному индексу, без обхода привычек,
+    и ставятся в очередь с прежними слотами (см. habits.ledger.failed_deliveries).
+    """
+    deliveries = ledger.failed_deliveries(REMINDER_RETRY_LIMIT)
+    dispatch_reminders(deliveries)
+    return f"Повторно поставлено напоминаний: {len(deliveries)}."
+
+
+@shared_task
+def purge_reminder_deliveries():
+    """
+    Периодическая задача (раз в день) для удаления старых записей журнала доставки напоминаний.
+    """
+    deleted = ledger.purge()
+    return f"Удалено записей журнала доставки: {deleted}."
@@ -0,0 +1,174 @@
+"""
+Клиент Telegram Bot API для отправки напоминаний о привычках.
+
+Все запросы идут через одну requests.Session на процесс воркера: соединения с Telegram
+переиспользуются (HTTP keep-alive), и TLS-рукопожатие не повторяется для каждого сообщения.
+В воркере с пулом потоков сессию делят потоки, поэтому пул соединений (TELEGRAM_POOL_SIZE)
+должен быть не меньше их числа.
+
+Для массовой отправки есть асинхронный клиент httpx: у каждого потока воркера свой цикл
+событий (run) и свой клиент (get_async_client), которые живут, пока жив поток, поэтому
+соединения переиспользуются и между задачами. Одновременных соединений не больше
+TELEGRAM_SEND_CONCURRENCY.
+
+Функции:
+    - get_session: Возвращает общую для процесса HTTP-сессию с пулом соединений.
+    - send_message: Отправляет текстовое сообщение в чат.
+    - run: Выполняет корутину в цикле событий потока.
+    - get_async_client: Возвращает асинхронный HTTP-клиент цикла событий потока.
+    - asend_message: Асинхронно отправляет текстовое сообщение в чат.
+    - format_reminder: Формирует текст напоминания об одной привычке.
+    - group_reminders: Разбивает напоминания для одного чата на группы по одному сообщению.
+    - format_reminders: Формирует текст сообщения для группы напоминаний.
+    - retry_after: Извлекает время ожидания из ответа 429.
+    - is_retryable: Проверяет, стоит ли повторить запрос после ошибки.
+"""
+
+import asyncio
+import threading
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+TELEGRAM_TIMEOUT = (3.05, 10)  # Таймауты (соединение, чтение) в секундах
+MESSAGE_MAX_LENGTH = 4096  # Ограничение Telegram на длину текста сообщения
+REMINDERS_HEADER = "Напоминания:"
+
+_session = None
+_local = threading.local()  # Цикл событий и асинхронный клиент потока
+
+
+def get_session():
+    """
+    Возвращает HTTP-сессию процесса, создавая ее при первом обращении.
+
+    Сессия создается лениво, чтобы каждый дочерний процесс prefork-воркера получил свой пул соединений.
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.TELEGRAM_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
+
+
+def send_message(chat_id, text):
+    """
+    Отправляет сообщение в Telegram.
+
+    Args:
+        chat_id (str): Идентификатор чата получателя.
+        text (str): Текст сообщения.
+
+    Returns:
+        requests.Response: Ответ Telegram Bot API.
+    """
+    url = f"{settings.TELEGRAM_URL}{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
+    return get_session().post(url, json={"chat_id": chat_id, "text": text}, timeout=TELEGRAM_TIMEOUT)
+
+
+def run(coroutine):
+    """
+    Выполняет корутину в цикле событий текущего потока, создавая его при первом обращении.
+    """
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+        _local.client = None
+    return loop.run_until_complete(coroutine)
+
+
+def get_async_client():
+    """
+    Возвращает асинхронный HTTP-клиент цикла событий потока (вызывается из корутины, запущенной run).
+    """
+    client = getattr(_local, "client", None)
+    if client is None:
+        connections = settings.TELEGRAM_SEND_CONCURRENCY
+        client = _local.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            timeout=httpx.Timeout(TELEGRAM_TIMEOUT[1], connect=TELEGRAM_TIMEOUT[0]),
+        )
+    return client
+
+
+async def asend_message(chat_id, text):
+    """
+    Асинхронно отправляет сообщение в Telegram (см. send_message).
+
+    Returns:
+        httpx.Response: Ответ Telegram Bot API.
+    """
+    url = f"{settings.TELEGRAM_URL}{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
+    return await get_async_client().post(url, json={"chat_id": chat_id, "text": text})
+
+
+def format_reminder(habit):
+    """
+    Формирует текст напоминания об одной привычке.
+    """
+    return f"Напоминание: {habit.action} в {habit.time} в {habit.place}."
+
+
+def group_reminders(habits):
+    """
+    Разбивает напоминания для одного чата на группы, каждая из которых помещается в одно сообщение.
+
+    Args:
+        habits (list[Habit]): Привычки, по которым нужно напомнить.
+
+    Returns:
+        list[list[Habit]]: Группы привычек.
+    """
+    groups = [[]]
+    length = len(REMINDERS_HEADER)
+    for habit in habits:
+        line_length = len(_reminder_line(habit))
+        if groups[-1] and length + line_length > MESSAGE_MAX_LENGTH:
+            groups.append([])
+            length = len(REMINDERS_HEADER)
+        groups[-1].append(habit)
+        length += line_length
+    return groups
+
+
+def format_reminders(habits):
+    """
+    Объединяет напоминания о нескольких привычках одного пользователя в одно сообщение.
+
+    Args:
+        habits (list[Habit]): Привычки одной группы (см. group_reminders).
+
+    Returns:
+        str: Текст сообщения.
+    """
+    if len(habits) == 1:
+        return format_reminder(habits[0])
+    return REMINDERS_HEADER + "".join(_reminder_line(habit) for habit in habits)
+
+
+def _reminder_line(habit):
+    return f"\n— {habit.action} в {habit.time} в {habit.place}"
+
+
+def retry_after(response):
+    """
+    Возвращает время ожидания из ответа 429 (parameters.retry_after) или None для других ответов.
+    """
+    if response.status_code != 429:
+        return None
+    try:
+        return int(response.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return 1
+
+
+def is_retryable(response):
+    """
+    Проверяет, имеет ли смысл повторить запрос (ошибки сервера Telegram).
+    """
+    return response.status_code >= 500
@@ -1,8 +1,42 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+from unittest import mock
+
+import httpx
+import numpy as np
+import psycopg2
+from asgiref.sync import sync_to_async
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
 from rest_framework import status
 from users.models import Users
-from .models import Habit
+from celery import Celery
+from config import celery_app, celery_metrics, pgbouncer
+from users.tasks import block_inactive_users
+from . import analytics, completions, encoders, feed_cache, ledger, partitions, ratelimit, stats, tasks, telegram
+from .fake_telegram import FakeTelegramServer
+from .management.commands import celery_stats
+from .models import Habit, HabitCompletion, HabitStats, HabitWeekStats, ReminderDelivery
+from .serializers import HabitSerializer
+from .views import HabitPagination
+from .tasks import (
+    create_completion_partitions,
+    retry_failed_reminders,
+    send_daily_reminders,
+    send_due_reminders,
+    send_telegram_batch,
+    send_telegram_message,
+)
 
 
 class HabitAPITestCase(APITestCase):
@@ -120,6 +154,34 @@ class HabitAPITestCase(APITestCase):
         # Проверяем, что привычка была удалена
         self.assertEqual(Habit.objects.filter(user=self.user).count(), 0)
 
+    def test_retrieve_habit_single_query(self):
+        """
+        Привычка владельца читается одним SELECT по (pk, user_id), чужая привычка не находится.
+        """
+        url = reverse("habits:habit-detail", args=[self.habit.id])
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user"], self.user.id)
+
+        # С настоящим токеном состояние пользователя берется из кэша, запрос тот же один
+        cache.clear()
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"habits_habit"."user_id" =', queries[0]["sql"])
+
+        stranger = Users.objects.create(email="detail-stranger@example.com")
+        foreign = Habit.objects.create(
+            user=stranger, place="Дом", time="08:00", action="Чужая", periodicity=7, execution_time=60
+        )
+        response = self.client.get(reverse("habits:habit-detail", args=[foreign.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_create_habit_invalid_data(self):
         """
         Тестирует создание привычки с некорректными данными.
@@ -168,3 +230,1533 @@ class HabitAPITestCase(APITestCase):
         # Проверяем, что данные в списке совпадают с ожидаемыми
         self.assertEqual(response.json()["results"][0]["place"], "Park")
         self.assertEqual(response.json()["results"][0]["action"], "Running")
+
+
+class ReminderSchedulerTestCase(TestCase):
+    """
+    Тесты планировщика напоминаний по сроку next_due_at.
+    """
+
+    def setUp(self):
+        self.user = Users.objects.create(email="scheduler@example.com", telegram_id="777")
+        self.habit = Habit.objects.create(
+            user=self.user,
+            place="Home",
+            time="09:30:00",
+            action="Reading",
+            periodicity=7,
+            execution_time=60,
+        )
+
+    def test_next_due_at_is_calculated_on_save(self):
+        """
+        Срок напоминания рассчитывается при создании и пересчитывается при изменении времени.
+        """
+        self.assertGreaterEqual(self.habit.next_due_at, timezone.now())
+        self.assertEqual(timezone.localtime(self.habit.next_due_at).time().isoformat(), "09:30:00")
+
+        self.habit.time = "10:15:00"
+        self.habit.save()
+        self.assertEqual(timezone.localtime(self.habit.next_due_at).time().isoformat(), "10:15:00")
+
+    def test_deferred_save_keeps_next_due_at(self):
+        """
+        Сохранение привычки, загруженной без времени или периодичности, не сбрасывает сдвинутый срок.
+        """
+        due_at = timezone.now() + timedelta(days=3)
+        Habit.objects.filter(pk=self.habit.pk).update(next_due_at=due_at)
+
+        for fields in (("id", "action"), ("id", "action", "time"), ("id", "action", "periodicity")):
+            with self.subTest(fields=fields):
+                habit = Habit.objects.only(*fields).get(pk=self.habit.pk)
+                habit.action = "Writing"
+                habit.save()
+                self.habit.refresh_from_db()
+                self.assertEqual(self.habit.next_due_at, due_at)
+
+        habit = Habit.objects.only("id", "action").get(pk=self.habit.pk)
+        habit.time = "10:15:00"
+        habit.save()
+        self.habit.refresh_from_db()
+        self.assertEqual(timezone.localtime(self.habit.next_due_at).time().isoformat(), "10:15:00")
+
+    def test_due_habits_are_dispatched_and_advanced(self):
+        """
+        Задача отправляет напоминания только по наступившим срокам публичных привычек и сдвигает срок
+        на периодичность; срок приватных привычек сдвигается без напоминания.
+        """
+        due_at = timezone.now() - timedelta(minutes=1)
+        Habit.objects.filter(pk=self.habit.pk).update(next_due_at=due_at, is_public=True)
+        not_due = Habit.objects.create(
+            user=self.user, place="Gym", time="10:00:00", action="Workout", periodicity=7, execution_time=60
+        )
+        Habit.objects.filter(pk=not_due.pk).update(next_due_at=timezone.now() + timedelta(hours=1), is_public=True)
+        private = Habit.objects.create(
+            user=self.user, place="Desk", time="11:00:00", action="Journal", periodicity=7, execution_time=60
+        )
+        Habit.objects.filter(pk=private.pk).update(next_due_at=due_at)
+
+        with mock.patch("habits.tasks.send_telegram_batch.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                result = send_due_reminders()
+
+        delay.assert_called_once_with([(self.habit.id, "777", f"due:{due_at.isoformat()}")])
+        self.assertIn("1", result)
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.next_due_at, due_at + timedelta(days=7))
+        private.refresh_from_db()
+        self.assertEqual(private.next_due_at, due_at + timedelta(days=7))
+
+
+class TelegramBatchTestCase(TestCase):
+    """
+    Тесты пакетной отправки напоминаний в Telegram.
+    """
+
+    def setUp(self):
+        self.user = Users.objects.create(email="batch@example.com", telegram_id="100")
+        self.other = Users.objects.create(email="batch-other@example.com", telegram_id="200")
+        habit_data = {"place": "Home", "time": "08:00:00", "periodicity": 7, "execution_time": 60}
+        self.habits = [
+            Habit.objects.create(user=self.user, action="Reading", **habit_data),
+            Habit.objects.create(user=self.user, action="Stretching", **habit_data),
+            Habit.objects.create(user=self.other, action="Walking", **habit_data),
+        ]
+
+    def test_reminders_for_one_chat_are_merged(self):
+        """
+        Привычки загружаются одним запросом, а напоминания одному чату уходят одним сообщением.
+        """
+        pairs = [[self.habits[0].id, "100"], [self.habits[2].id, "200"], [self.habits[1].id, "100"]]
+        with mock.patch("habits.telegram.asend_message") as send_message:
+            send_message.return_value.status_code = 200
+            with self.assertNumQueries(1):
+                result = send_telegram_batch(pairs)
+
+        self.assertEqual(send_message.call_count, 2)
+        texts = {call.args[0]: call.args[1] for call in send_message.call_args_list}
+        self.assertIn("Reading", texts["100"])
+        self.assertIn("Stretching", texts["100"])
+        self.assertIn("Walking", texts["200"])
+        self.assertIn("2", result)
+
+
+class TelegramRateLimitTestCase(TestCase):
+    """
+    Тесты соблюдения ограничений частоты Telegram на поддельном сервере.
+    """
+
+    def setUp(self):
+        ratelimit.get_backend.cache_clear()
+        self.server = FakeTelegramServer(global_rate=30, chat_rate=1).start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(ratelimit.get_backend.cache_clear)
+        habit_data = {"place": "Home", "time": "08:00:00", "periodicity": 7, "execution_time": 60}
+        self.pairs = []
+        for number in range(5):
+            user = Users.objects.create(email=f"limit{number}@example.com", telegram_id=f"50{number}")
+            habit = Habit.objects.create(user=user, action=f"Habit {number}", **habit_data)
+            self.pairs.append([habit.id, user.telegram_id])
+
+    def test_batch_is_delivered_without_throttling(self):
+        """
+        Все напоминания доставляются, и сервер ни разу не отвечает 429.
+        """
+        with override_settings(TELEGRAM_URL=self.server.url):
+            result = send_telegram_batch.apply(args=[self.pairs]).get()
+
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.rejected, 0)
+        self.assertIn("ошибок: 0", result)
+
+    @override_settings(TELEGRAM_CHAT_RATE_LIMIT=1000)
+    def test_429_postpones_rest_of_batch(self):
+        """
+        После ответа 429 неотправленные сообщения пачки откладываются на retry_after, а отправка приостанавливается.
+        """
+        with override_settings(TELEGRAM_URL=self.server.url):
+            telegram.send_message("502", "Занимаем лимит чата")
+            with mock.patch("habits.tasks.send_telegram_batch.apply_async") as apply_async:
+                result = send_telegram_batch.apply(args=[self.pairs]).get()
+
+        # Сообщения отправляются одновременно: откладывается только отклоненное, остальные доставлены
+        self.assertEqual(self.server.rejected, 1)
+        self.assertIn("Отправлено сообщений: 4, ошибок: 0, отложено: 1", result)
+        apply_async.assert_called_once_with(args=[[self.pairs[2]]], countdown=1)
+        self.assertGreater(ratelimit.acquire("999", max_wait=0), 0)
+
+    @override_settings(TELEGRAM_GLOBAL_RATE_LIMIT=1000, TELEGRAM_CHAT_RATE_LIMIT=1000)
+    def test_messages_are_sent_concurrently(self):
+        """
+        Сообщения отправляются одновременно: 20 ответов по 0.1 с при concurrency 10 занимают около 0.2 с.
+        """
+        server = FakeTelegramServer(global_rate=1000, chat_rate=1000, latency=0.1).start()
+        self.addCleanup(server.stop)
+        messages = [(str(700 + number), "Напоминание") for number in range(20)]
+        started = time.perf_counter()
+        with override_settings(TELEGRAM_URL=server.url):
+            outcomes, countdown = telegram.run(tasks.deliver_messages(messages, concurrency=10))
+
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual((outcomes, countdown), ([tasks.SENT] * 20, 0))
+        self.assertEqual(len(server.messages), 20)
+
+    def test_timeout_is_retried(self):
+        """
+        Зависший запрос прерывается таймаутом, и сообщение повторяется.
+        """
+        with mock.patch("habits.telegram.asend_message", side_effect=httpx.ReadTimeout("timed out")):
+            outcomes, countdown = telegram.run(tasks.deliver_messages([("800", "Напоминание")]))
+        self.assertEqual((outcomes, countdown), ([tasks.RETRY], 0))
+
+    def test_token_bucket_limits_chat_rate(self):
+        """
+        Второе сообщение в тот же чат требует ожидания, сообщение в другой чат — нет.
+        """
+        self.assertEqual(ratelimit.acquire("600", max_wait=0), 0)
+        self.assertGreater(ratelimit.acquire("600", max_wait=0), 0)
+        self.assertEqual(ratelimit.acquire("601", max_wait=0), 0)
+
+    def test_redis_calls_do_not_block_event_loop(self):
+        """
+        Запросы к Redis из aacquire и apause выполняются в потоках: четыре запроса по 0.2 с идут одновременно.
+        """
+        client = mock.Mock()
+        client.register_script.return_value.side_effect = lambda **kwargs: time.sleep(0.2) or "0"
+        client.set.side_effect = lambda *args, **kwargs: time.sleep(0.2)
+        backend = ratelimit.RedisTokenBuckets(client)
+
+        async def send():
+            waits = await asyncio.gather(*(ratelimit.aacquire(str(900 + number)) for number in range(4)))
+            await asyncio.gather(*(ratelimit.apause(1) for _ in range(4)))
+            return waits
+
+        with mock.patch("habits.ratelimit.get_backend", return_value=backend):
+            started = time.perf_counter()
+            self.assertEqual(telegram.run(send()), [0] * 4)
+
+        self.assertLess(time.perf_counter() - started, 0.6)
+        self.assertEqual(client.set.call_count, 4)
+
+
+class ReminderLedgerTestCase(TestCase):
+    """
+    Тесты журнала доставки напоминаний.
+    """
+
+    def setUp(self):
+        ledger.get_backend.cache_clear()
+        self.addCleanup(ledger.get_backend.cache_clear)
+        for name in ("acquire", "aacquire"):
+            patcher = mock.patch(f"habits.ratelimit.{name}", return_value=0)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = Users.objects.create(email="ledger@example.com", telegram_id="400")
+        self.other = Users.objects.create(email="ledger-other@example.com", telegram_id="401")
+        habit_data = {"place": "Home", "time": "08:00:00", "periodicity": 7, "execution_time": 60}
+        self.habit = Habit.objects.create(user=self.user, action="Reading", **habit_data)
+        self.other_habit = Habit.objects.create(user=self.other, action="Walking", **habit_data)
+        self.triples = [[self.habit.id, "400", "daily:2026-10-16"], [self.other_habit.id, "401", "daily:2026-10-16"]]
+
+    def send(self, triples, status_code=200):
+        with mock.patch("habits.telegram.asend_message") as send_message:
+            send_message.return_value.status_code = status_code
+            result = send_telegram_batch(triples)
+        return send_message, result
+
+    def test_repeated_batch_is_not_resent(self):
+        """
+        Повторная пачка с теми же слотами ничего не отправляет; учет пачки — два запроса к базе.
+        """
+        with self.assertNumQueries(3):
+            send_message, _ = self.send(self.triples)
+        self.assertEqual(send_message.call_count, 2)
+        self.assertEqual(ReminderDelivery.objects.filter(status=ReminderDelivery.SENT).count(), 2)
+
+        send_message, result = self.send(self.triples)
+        send_message.assert_not_called()
+        self.assertIn("Отправлено сообщений: 0", result)
+
+        send_message, _ = self.send([[self.habit.id, "400", "daily:2026-10-17"]])
+        self.assertEqual(send_message.call_count, 1)
+
+    def test_only_failed_reminders_are_retried(self):
+        """
+        Неудачная отправка повторяется по журналу, отправленные напоминания — нет.
+        """
+        with mock.patch("habits.telegram.asend_message") as send_message:
+            send_message.side_effect = lambda chat_id, text: mock.Mock(status_code=200 if chat_id == "400" else 403)
+            send_telegram_batch(self.triples)
+        ReminderDelivery.objects.update(updated_at=timezone.now() - timedelta(seconds=ledger.RETRY_DELAY + 1))
+
+        with mock.patch("habits.tasks.send_telegram_batch.delay") as delay, self.assertNumQueries(1):
+            result = retry_failed_reminders()
+        delay.assert_called_once_with([[self.other_habit.id, "401", "daily:2026-10-16"]])
+        self.assertIn("1", result)
+
+        send_message, _ = self.send(delay.call_args.args[0])
+        self.assertEqual(send_message.call_count, 1)
+        delivery = ReminderDelivery.objects.get(habit=self.other_habit)
+        self.assertEqual((delivery.status, delivery.attempts), (ReminderDelivery.SENT, 2))
+
+    def test_habit_with_two_slots_in_one_batch(self):
+        """
+        Привычка с двумя слотами в одной пачке упоминается в сообщении один раз, а оба слота записываются.
+        """
+        triples = [
+            [self.habit.id, "400", "daily:2026-10-16"],
+            [self.habit.id, "400", "due:2026-10-16T08:00:00+07:00"],
+            [self.habit.id, "400", "daily:2026-10-16"],
+        ]
+        send_message, _ = self.send(triples)
+
+        send_message.assert_called_once()
+        self.assertEqual(send_message.call_args.args[1].count("Reading"), 1)
+        self.assertEqual(
+            set(ReminderDelivery.objects.values_list("slot", "status")),
+            {("daily:2026-10-16", ReminderDelivery.SENT), ("due:2026-10-16T08:00:00+07:00", ReminderDelivery.SENT)},
+        )
+
+        with mock.patch("habits.ratelimit.aacquire", return_value=5), mock.patch(
+            "habits.tasks.send_telegram_batch.apply_async"
+        ) as apply_async:
+            self.send([[self.habit.id, "400", "daily:2026-10-17"], [self.habit.id, "400", "task:1"]])
+        (postponed,) = apply_async.call_args.kwargs["args"]
+        self.assertEqual(
+            sorted(postponed), [[self.habit.id, "400", "daily:2026-10-17"], [self.habit.id, "400", "task:1"]]
+        )
+
+    def test_postponed_reminders_are_released(self):
+        """
+        Отложенный из-за ограничения частоты остаток пачки освобождается, и отложенная задача его отправит.
+        """
+        with mock.patch("habits.ratelimit.aacquire", return_value=5), mock.patch(
+            "habits.tasks.send_telegram_batch.apply_async"
+        ) as apply_async:
+            self.send(self.triples)
+        self.assertFalse(ReminderDelivery.objects.exists())
+        (postponed,) = apply_async.call_args.kwargs["args"]
+        self.assertEqual(sorted(postponed), sorted(self.triples))
+
+        send_message, _ = self.send(postponed)
+        self.assertEqual(send_message.call_count, 2)
+
+    def test_postponed_retry_keeps_attempts(self):
+        """
+        Отложенный повтор неудачной отправки остается failed с прежним числом попыток.
+        """
+        self.send(self.triples[:1], status_code=403)
+        ReminderDelivery.objects.update(updated_at=timezone.now() - timedelta(seconds=ledger.RETRY_DELAY + 1))
+        with mock.patch("habits.ratelimit.aacquire", return_value=5), mock.patch(
+            "habits.tasks.send_telegram_batch.apply_async"
+        ):
+            self.send(self.triples)
+
+        delivery = ReminderDelivery.objects.get()
+        self.assertEqual(
+            (delivery.habit_id, delivery.status, delivery.attempts), (self.habit.id, ReminderDelivery.FAILED, 1)
+        )
+
+    def test_redelivered_message_task_is_not_resent(self):
+        """
+        Повторная доставка задачи send_telegram_message с тем же id не отправляет напоминание второй раз.
+        """
+        with mock.patch("habits.telegram.send_message") as send_message:
+            send_message.return_value.status_code = 200
+            send_telegram_message.apply(args=[self.habit.id, "400"], task_id="reminder-1")
+            result = send_telegram_message.apply(args=[self.habit.id, "400"], task_id="reminder-1").get()
+        self.assertEqual(send_message.call_count, 1)
+        self.assertIn("уже отправлено", result)
+
+    def test_rate_limited_message_is_postponed_past_retry_limit(self):
+        """
+        Ожидание лимитов и ответ 429 откладывают задачу без расхода повторов: и после
+        TELEGRAM_MAX_RETRIES повторов сообщение ставится в очередь заново с тем же id.
+        """
+        retries = tasks.TELEGRAM_MAX_RETRIES + 1
+        with mock.patch("habits.ratelimit.acquire", return_value=5), mock.patch(
+            "habits.tasks.send_telegram_message.apply_async"
+        ) as apply_async:
+            result = send_telegram_message.apply(args=[self.habit.id, "400"], task_id="reminder-2", retries=retries)
+        self.assertTrue(result.successful())
+        apply_async.assert_called_once_with(args=[self.habit.id, "400"], countdown=5, task_id="reminder-2")
+
+        response = mock.Mock(status_code=429)
+        response.json.return_value = {"ok": False, "parameters": {"retry_after": 3}}
+        with mock.patch("habits.telegram.send_message", return_value=response), mock.patch(
+            "habits.ratelimit.pause"
+        ), mock.patch("habits.tasks.send_telegram_message.apply_async") as apply_async:
+            result = send_telegram_message.apply(args=[self.habit.id, "400"], task_id="reminder-2", retries=retries)
+        self.assertTrue(result.successful())
+        apply_async.assert_called_once_with(args=[self.habit.id, "400"], countdown=3, task_id="reminder-2")
+        self.assertFalse(ReminderDelivery.objects.exists())
+
+    def test_redis_claims_in_one_round_trip(self):
+        """
+        В Redis пары занимаются одним конвейером SET NX без запросов к базе; при ошибке Redis — в базе.
+        """
+        client = mock.Mock()
+        pipeline = client.pipeline.return_value
+        pipeline.execute.return_value = [True, None]
+        backend = ledger.RedisLedger(client)
+        deliveries = [(self.habit.id, "due:1", "400"), (self.other_habit.id, "due:1", "401")]
+
+        with self.assertNumQueries(0):
+            self.assertEqual(backend.claim(deliveries), {(self.habit.id, "due:1")})
+        pipeline.set.assert_any_call(f"reminders:delivery:{self.habit.id}:due:1", "pending", nx=True, ex=600)
+
+        pipeline.execute.side_effect = ledger.redis.ConnectionError
+        with self.assertLogs("habits.ledger", "WARNING"):
+            self.assertEqual(len(backend.claim(deliveries)), 2)
+        self.assertEqual(ReminderDelivery.objects.filter(status=ReminderDelivery.PENDING).count(), 2)
+
+
+class DailyRemindersFanOutTestCase(TestCase):
+    """
+    Тесты рассылки ежедневных напоминаний одним потоковым запросом.
+    """
+
+    def create_habits(self, count, telegram_id):
+        user = Users.objects.create(email=f"fanout{Users.objects.count()}@example.com", telegram_id=telegram_id)
+        for _ in range(count):
+            Habit.objects.create(
+                user=user,
+                place="Park",
+                time="00:00:00",
+                action="Walk",
+                periodicity=7,
+                execution_time=60,
+                is_public=True,
+            )
+        return user
+
+    def test_query_count_does_not_depend_on_habit_count(self):
+        """
+        Рассылка выполняет один запрос к базе независимо от числа привычек.
+        """
+        self.create_habits(3, "300")
+        with mock.patch("habits.tasks.send_telegram_batch.delay"), self.assertNumQueries(1):
+            send_daily_reminders()
+
+        self.create_habits(150, "301")
+        with mock.patch("habits.tasks.send_telegram_batch.delay") as delay, self.assertNumQueries(1):
+            result = send_daily_reminders()
+
+        self.assertEqual(delay.call_count, 2)
+        self.assertIn("153", result)
+
+    def test_users_without_telegram_id_are_skipped(self):
+        """
+        Привычки пользователей без Telegram ID не попадают в рассылку.
+        """
+        self.create_habits(1, "")
+        user = self.create_habits(1, "302")
+        with mock.patch("habits.tasks.send_telegram_batch.delay") as delay:
+            send_daily_reminders()
+
+        (pairs,), _ = delay.call_args
+        self.assertEqual(pairs, [(user.habits.get().id, "302", f"daily:{timezone.localdate().isoformat()}")])
+
+
+class HabitPaginationTestCase(APITestCase):
+    """
+    Тесты курсорной пагинации списков привычек.
+    """
+
+    def setUp(self):
+        self.user = Users.objects.create(email="pages@example.com", telegram_id="900")
+        self.habits = [
+            Habit.objects.create(
+                user=self.user,
+                place="Park",
+                time="12:00:00",
+                action=f"Habit {number}",
+                periodicity=7,
+                execution_time=60,
+                is_public=number % 2 == 0,
+            )
+            for number in range(7)
+        ]
+        self.client.force_authenticate(user=self.user)
+
+    def test_pages_follow_id_order(self):
+        """
+        Страницы отдаются по курсору в порядке id без подсчета общего количества.
+        """
+        response = self.client.get(reverse("habits:habit-list-create"), {"page_size": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertEqual([habit["id"] for habit in response.data["results"]], [h.id for h in self.habits[:3]])
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual([habit["id"] for habit in response.data["results"]], [h.id for h in self.habits[3:6]])
+
+    def test_page_size_is_capped(self):
+        """
+        Размер страницы ограничен max_page_size.
+        """
+        with mock.patch.object(HabitPagination, "max_page_size", 2):
+            response = self.client.get(reverse("habits:public-habit-list"), {"page_size": 1000})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([habit["id"] for habit in response.data["results"]], [h.id for h in self.habits[0:4:2]])
+        self.assertIsNotNone(response.data["next"])
+
+
+class PublicFeedCacheTestCase(APITestCase):
+    """
+    Тесты кэширования ленты публичных привычек.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = Users.objects.create(email="feed@example.com", telegram_id="950")
+        self.habit_data = {
+            "user": self.user,
+            "place": "Park",
+            "time": "12:00:00",
+            "periodicity": 7,
+            "execution_time": 60,
+        }
+        Habit.objects.create(action="Running", is_public=True, **self.habit_data)
+        self.url = reverse("habits:public-habit-list")
+
+    @override_settings(METRICS_TOKEN="metrics-token")
+    def test_second_request_is_served_from_cache(self):
+        """
+        Повторный запрос той же страницы не обращается к базе.
+        """
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertIn("ETag", second.headers)
+        metrics = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer metrics-token").content.decode()
+        self.assertIn('habits_public_feed_requests_total{result="hit"}', metrics)
+
+    def test_public_habit_change_invalidates_cache(self):
+        """
+        Создание публичной привычки сбрасывает кэш и меняет ETag.
+        """
+        first = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.create(action="Swimming", is_public=True, **self.habit_data)
+        second = self.client.get(self.url)
+
+        self.assertNotEqual(first.headers["ETag"], second.headers["ETag"])
+        self.assertEqual(len(second.data["results"]), 2)
+
+    def test_private_habit_change_keeps_cache(self):
+        """
+        Изменение приватной привычки не сбрасывает кэш ленты.
+        """
+        first = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.create(action="Reading", is_public=False, **self.habit_data)
+        second = self.client.get(self.url)
+
+        self.assertEqual(first.headers["ETag"], second.headers["ETag"])
+
+    def test_conditional_request_returns_304(self):
+        """
+        Запрос с актуальным ETag получает 304 без тела.
+        """
+        etag = self.client.get(self.url).headers["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_if_modified_since_within_one_second(self):
+        """
+        Пока секунда последнего изменения не прошла, Last-Modified не отдается, и второе изменение
+        в ту же секунду не дает 304 по If-Modified-Since; после нее If-Modified-Since работает.
+        """
+        with mock.patch("habits.feed_cache.time.time", return_value=1_000_000.2):
+            feed_cache.invalidate()
+            first = self.client.get(self.url)
+            with self.captureOnCommitCallbacks(execute=True):
+                Habit.objects.create(action="Swimming", is_public=True, **self.habit_data)
+            second = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE="Mon, 12 Jan 1970 13:46:40 GMT")
+        self.assertNotIn("Last-Modified", first.headers)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(second.data["results"]), 2)
+
+        with mock.patch("habits.feed_cache.time.time", return_value=1_000_001.5):
+            last_modified = self.client.get(self.url).headers["Last-Modified"]
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(last_modified, "Mon, 12 Jan 1970 13:46:40 GMT")
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class HabitBulkAPITestCase(APITestCase):
+    """
+    Тесты массового создания, обновления и удаления привычек.
+    """
+
+    def setUp(self):
+        self.user = Users.objects.create(email="bulk@example.com", telegram_id="960")
+        self.pleasant = Habit.objects.create(
+            user=self.user,
+            place="Sofa",
+            time="20:00:00",
+            action="Tea",
+            is_pleasant=True,
+            periodicity=7,
+            execution_time=60,
+        )
+        self.url = reverse("habits:habit-bulk")
+        self.client.force_authenticate(user=self.user)
+
+    def habit_payload(self, number, **extra):
+        return {
+            "place": "Park",
+            "time": "07:00",
+            "action": f"Run {number}",
+            "periodicity": 7,
+            "execution_time": 60,
+            **extra,
+        }
+
+    def test_bulk_create(self):
+        """
+        Привычки из списка создаются, ссылки на связанные привычки разрешаются.
+        """
+        payload = [self.habit_payload(1, linked_habit=self.pleasant.id), self.habit_payload(2, is_public=True)]
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]["linked_habit"], self.pleasant.id)
+        created = Habit.objects.get(action="Run 1")
+        self.assertEqual(created.user, self.user)
+        self.assertIsNotNone(created.next_due_at)
+
+    def test_bulk_create_query_count_is_constant(self):
+        """
+        Число запросов не зависит от количества привычек в списке.
+        """
+        counts = []
+        for size in (2, 20):
+            payload = [self.habit_payload(number, linked_habit=self.pleasant.id) for number in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """
+        При ошибке в одном элементе ничего не создается, а ошибки возвращаются по каждому элементу.
+        """
+        payload = [self.habit_payload(1), self.habit_payload(2, execution_time=500)]
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("execution_time", response.data[1])
+        self.assertFalse(Habit.objects.filter(action__startswith="Run").exists())
+
+    def test_bulk_create_applies_model_rules(self):
+        """
+        Созданные привычки проверяются правилами модели: без periodicity действует значение по умолчанию 1.
+        """
+        payload = [
+            self.habit_payload(1),
+            {key: value for key, value in self.habit_payload(2).items() if key != "periodicity"},
+        ]
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("non_field_errors", response.data[1])
+        self.assertFalse(Habit.objects.filter(action__startswith="Run").exists())
+
+    def test_bulk_update_rejects_malformed_ids(self):
+        """
+        id, который не является целым числом, дает ошибку элемента, а не ошибку сервера.
+        """
+        habit = Habit.objects.create(user=self.user, **self.habit_payload(1))
+        payload = [{"id": habit.id, "place": "Gym"}, {"id": [habit.id]}, {"id": {}}, {"id": True}, "id"]
+        response = self.client.patch(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        for error in response.data[1:]:
+            self.assertIn("id", error)
+        habit.refresh_from_db()
+        self.assertEqual(habit.place, "Park")
+
+    def test_bulk_update(self):
+        """
+        Привычки обновляются списком; чужие и несуществующие id дают ошибку элемента.
+        """
+        habit = Habit.objects.create(user=self.user, **self.habit_payload(1))
+        response = self.client.patch(self.url, [{"id": habit.id, "place": "Gym", "time": "09:00"}], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        habit.refresh_from_db()
+        self.assertEqual(habit.place, "Gym")
+        self.assertEqual(timezone.localtime(habit.next_due_at).time().isoformat(), "09:00:00")
+
+        response = self.client.patch(self.url, [{"id": habit.id, "place": "Home"}, {"id": 0}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("id", response.data[1])
+        habit.refresh_from_db()
+        self.assertEqual(habit.place, "Gym")
+
+    def test_bulk_delete(self):
+        """
+        Привычки удаляются по списку id, отсутствующие id возвращаются отдельно.
+        """
+        habit = Habit.objects.create(user=self.user, **self.habit_payload(1))
+        response = self.client.delete(self.url, {"ids": [habit.id, 0]}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"deleted": [habit.id], "not_found": [0]})
+        self.assertFalse(Habit.objects.filter(id=habit.id).exists())
+
+
+class LinkedHabitScopeTestCase(APITestCase):
+    """
+    Тесты ограничения связанных привычек привычками текущего пользователя.
+    """
+
+    def setUp(self):
+        self.user = Users.objects.create(email="linked@example.com", telegram_id="970")
+        self.stranger = Users.objects.create(email="stranger@example.com", telegram_id="971")
+        self.habit_data = {"place": "Home", "time": "21:00:00", "periodicity": 7, "execution_time": 60}
+        self.own_pleasant = Habit.objects.create(user=self.user, action="Bath", is_pleasant=True, **self.habit_data)
+        self.foreign_pleasant = Habit.objects.create(
+            user=self.stranger, action="Cake", is_pleasant=True, **self.habit_data
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_foreign_linked_habit_is_rejected(self):
+        """
+        Нельзя указать связанной привычкой привычку другого пользователя.
+        """
+        url = reverse("habits:habit-list-create")
+        data = {"action": "Run", "place": "Park", "time": "07:00", "periodicity": 7, "execution_time": 60}
+
+        response = self.client.post(url, {**data, "linked_habit": self.foreign_pleasant.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("linked_habit", response.data)
+
+        response = self.client.post(url, {**data, "linked_habit": self.own_pleasant.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        """
+        Связанные привычки и владелец выводятся без дополнительных запросов на каждую привычку.
+        """
+        url = reverse("habits:habit-list-create")
+        counts = []
+        for _ in range(2):
+            for number in range(5):
+                Habit.objects.create(
+                    user=self.user, action=f"Walk {number}", linked_habit=self.own_pleasant, **self.habit_data
+                )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {"page_size": 100})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+
+class HabitCompletionTestCase(APITestCase):
+    """
+    Тесты журнала выполнений привычек и пакетной записи в него.
+    """
+
+    def setUp(self):
+        self.user = Users.objects.create(email="completions@example.com", telegram_id="980")
+        self.stranger = Users.objects.create(email="stranger-completions@example.com", telegram_id="981")
+        habit_data = {"place": "Home", "time": "08:00:00", "action": "Read", "periodicity": 7, "execution_time": 60}
+        self.habit = Habit.objects.create(user=self.user, **habit_data)
+        self.foreign_habit = Habit.objects.create(user=self.stranger, **habit_data)
+        self.url = reverse("habits:habit-completions")
+        self.client.force_authenticate(user=self.user)
+
+    def test_batch_is_recorded(self):
+        """
+        Пакет выполнений записывается целиком; без completed_at используется момент запроса.
+        """
+        completed_at = timezone.now() - timedelta(days=40)
+        response = self.client.post(
+            self.url,
+            [{"habit": self.habit.id, "completed_at": completed_at.isoformat()}, {"habit": self.habit.id}],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {"created": 2})
+        self.assertEqual(HabitCompletion.objects.filter(habit=self.habit).count(), 2)
+        self.assertTrue(HabitCompletion.objects.filter(habit=self.habit, completed_at=completed_at).exists())
+
+    def test_large_batch_uses_copy(self):
+        """
+        Большой пакет в PostgreSQL записывается одной командой COPY.
+        """
+        if connection.vendor != "postgresql":
+            self.skipTest("COPY поддерживается только в PostgreSQL.")
+        now = timezone.now()
+        rows = [(self.habit.id, now - timedelta(minutes=number)) for number in range(completions.COPY_THRESHOLD)]
+
+        with CaptureQueriesContext(connection) as queries:
+            created = completions.record_completions(rows)
+
+        self.assertEqual(created, len(rows))
+        self.assertEqual(HabitCompletion.objects.filter(habit=self.habit).count(), len(rows))
+        table = HabitCompletion._meta.db_table
+        self.assertFalse(any(f'INSERT INTO "{table}"' in query["sql"] for query in queries))
+
+    def test_batch_with_foreign_habit_is_rejected(self):
+        """
+        Пакет с чужой привычкой или моментом в будущем не записывается, ошибки возвращаются по элементам.
+        """
+        response = self.client.post(
+            self.url,
+            [
+                {"habit": self.habit.id},
+                {"habit": self.foreign_habit.id},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("habit", response.data[1])
+
+        future = (timezone.now() + timedelta(days=1)).isoformat()
+        response = self.client.post(self.url, [{"habit": self.habit.id, "completed_at": future}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(HabitCompletion.objects.exists())
+
+    def test_completions_are_append_only(self):
+        """
+        Записи журнала нельзя изменять и удалять по одной.
+        """
+        completion = HabitCompletion.objects.create(habit=self.habit, completed_at=timezone.now())
+        with self.assertRaises(TypeError):
+            completion.save()
+        with self.assertRaises(TypeError):
+            completion.delete()
+
+    def test_ensure_partitions_is_idempotent(self):
+        """
+        Секции на текущий и следующие месяцы создаются повторно без ошибок, строки попадают в секцию месяца.
+        """
+        if connection.vendor != "postgresql":
+            self.skipTest("Секционирование поддерживается только в PostgreSQL.")
+        names = partitions.ensure_partitions(today=timezone.now().date())
+        self.assertEqual(partitions.ensure_partitions(today=timezone.now().date()), names)
+        self.assertEqual(len(names), partitions.PARTITIONS_AHEAD + 1)
+
+        now = timezone.now()
+        HabitCompletion.objects.create(habit=self.habit, completed_at=now)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT tableoid::regclass::text FROM {HabitCompletion._meta.db_table}")
+            self.assertEqual(cursor.fetchone()[0], f"{partitions.TABLE}_y{now.year}m{now.month:02d}")
+
+
+class HabitCompletionMigrationTestCase(TransactionTestCase):
+    """
+    Тест обратимости миграции журнала выполнений.
+    """
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+
+    def tables(self):
+        with connection.cursor() as cursor:
+            return connection.introspection.table_names(cursor)
+
+    def test_migration_is_reversible(self):
+        """
+        Миграция 0007 откатывается и применяется заново: таблица журнала удаляется и создается секционированной.
+        """
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes("habits")[0]
+        try:
+            self.migrate(("habits", "0006_habit_indexes"))
+            self.assertNotIn(partitions.TABLE, self.tables())
+        finally:
+            self.migrate(latest)
+
+        self.assertIn(partitions.TABLE, self.tables())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s", [partitions.TABLE])
+            self.assertEqual(cursor.fetchone(), ("p",))
+
+
+class HabitStatsTestCase(APITestCase):
+    """
+    Тесты отметок о выполнении и статистики привычек.
+    """
+
+    def setUp(self):
+        self.user = Users.objects.create(email="stats@example.com", telegram_id="990")
+        self.habit = Habit.objects.create(
+            user=self.user, place="Home", time="08:00:00", action="Read", periodicity=7, execution_time=60
+        )
+        self.client.force_authenticate(user=self.user)
+        self.now = timezone.now()
+
+    def weeks_ago(self, weeks):
+        return (self.now - timedelta(weeks=weeks)).isoformat()
+
+    def test_mark_done_updates_streak(self):
+        """
+        Отметки в соседних периодах продлевают серию, пропуск периода начинает новую.
+        """
+        url = reverse("habits:habit-done", args=[self.habit.id])
+        for weeks in (5, 3, 2, 1):
+            response = self.client.post(url, {"completed_at": self.weeks_ago(weeks)}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(url, format="json")
+
+        self.assertEqual(response.data["total_completions"], 5)
+        self.assertEqual(response.data["current_streak"], 4)
+        self.assertEqual(response.data["best_streak"], 4)
+        self.assertEqual(response.data["completed_periods"], 5)
+
+    def test_late_completion_replays_history(self):
+        """
+        Запоздавшая отметка, заполнившая пропуск, учитывается пересчетом по истории.
+        """
+        url = reverse("habits:habit-done", args=[self.habit.id])
+        for weeks in (2, 0):
+            self.client.post(url, {"completed_at": self.weeks_ago(weeks)}, format="json")
+        self.assertEqual(HabitStats.objects.get(habit=self.habit).current_streak, 1)
+
+        response = self.client.post(url, {"completed_at": self.weeks_ago(1)}, format="json")
+        self.assertEqual(response.data["current_streak"], 3)
+        self.assertEqual(HabitWeekStats.objects.filter(habit=self.habit).count(), 3)
+
+    def test_foreign_habit_cannot_be_marked(self):
+        """
+        Отметить чужую привычку нельзя.
+        """
+        stranger = Users.objects.create(email="stats-stranger@example.com", telegram_id="991")
+        self.client.force_authenticate(user=stranger)
+        response = self.client.post(reverse("habits:habit-done", args=[self.habit.id]), format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rebuild_matches_incremental_stats(self):
+        """
+        Пересчет по журналу дает те же агрегаты, что и инкрементальное обновление.
+        """
+        rows = [(self.habit.id, self.now - timedelta(days=days)) for days in (40, 30, 12, 10, 3)]
+        completions.record_completions(rows)
+        incremental = stats.user_stats(self.user, self.now)
+
+        stats.rebuild_stats()
+        self.assertEqual(stats.user_stats(self.user, self.now), incremental)
+        self.assertEqual(sum(week["completions"] for week in incremental["weeks"]), 3)
+
+    def test_user_stats_query_count_does_not_depend_on_history(self):
+        """
+        Статистика пользователя читается фиксированным числом запросов.
+        """
+        url = reverse("habits:habit-stats")
+        counts = []
+        for days in (1, 200):
+            completions.record_completions([(self.habit.id, self.now - timedelta(days=day)) for day in range(days)])
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(len(response.data["weeks"]), stats.SUMMARY_WEEKS)
+        self.assertEqual(response.data["habits"][0]["total_completions"], 201)
+
+
+class HabitAnalyticsTestCase(APITestCase):
+    """
+    Тесты выгрузки и сводки привычек для аналитики.
+    """
+
+    def setUp(self):
+        self.staff = Users.objects.create(email="analyst@example.com", telegram_id="1000", is_staff=True)
+        self.user = Users.objects.create(email="analytics-user@example.com", telegram_id="1001", city="Omsk")
+        for number in range(12):
+            Habit.objects.create(
+                user=self.user,
+                place=f"Place {number % 3}",
+                time=f"{number:02d}:30:00",
+                action="Run" if number % 2 else "Read",
+                periodicity=7 + number % 3,
+                execution_time=10 * (number % 5) + 5,
+                is_public=number % 4 == 0,
+            )
+        self.client.force_authenticate(user=self.staff)
+
+    def test_percentiles_match_numpy(self):
+        """
+        Процентили по счетчикам совпадают с numpy.percentile по исходным значениям.
+        """
+        values = np.array([5, 5, 7, 9, 14, 14, 14, 30, 120, 1])
+        expected = np.percentile(values, analytics.PERCENTILES)
+        result = analytics.percentiles(np.bincount(values))
+        self.assertEqual(list(result.values()), [round(float(value), 2) for value in expected])
+
+    def test_summary_is_independent_of_batch_size(self):
+        """
+        Сводка, накопленная по маленьким пачкам, совпадает со сводкой по одной пачке.
+        """
+        self.assertEqual(analytics.summarize(batch_size=5), analytics.summarize(batch_size=1000))
+
+        response = self.client.get(reverse("habits:habit-analytics-summary"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], 12)
+        self.assertEqual(response.data["public"], 3)
+        self.assertEqual(sum(response.data["time_of_day_histogram"]), 12)
+        self.assertEqual(response.data["periodicity_distribution"], {7: 4, 8: 4, 9: 4})
+        self.assertEqual(response.data["top_actions"][0]["count"], 6)
+
+    def test_csv_export(self):
+        """
+        Выгрузка в CSV отдается потоком и содержит все привычки с данными пользователя.
+        """
+        response = self.client.get(reverse("habits:habit-analytics-export"), {"output": "csv"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(len(lines), 13)
+        self.assertIn("user_city", lines[0])
+        self.assertIn("Omsk", lines[1])
+        self.assertIn("00:30:00", lines[1])
+
+    def test_parquet_export(self):
+        """
+        Выгрузка в Parquet читается pyarrow с исходными типами столбцов.
+        """
+        if "parquet" not in analytics.available_formats():
+            self.skipTest("pyarrow не установлен.")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        response = self.client.get(reverse("habits:habit-analytics-export"), {"output": "parquet"})
+        table = pq.read_table(pa.BufferReader(b"".join(response.streaming_content)))
+
+        self.assertEqual(table.num_rows, 12)
+        self.assertEqual(table.column("periodicity").to_pylist()[:3], [7, 8, 9])
+
+    def test_export_is_staff_only(self):
+        """
+        Выгрузка и сводка недоступны обычным пользователям.
+        """
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(
+            self.client.get(reverse("habits:habit-analytics-export")).status_code, status.HTTP_403_FORBIDDEN
+        )
+        self.assertEqual(
+            self.client.get(reverse("habits:habit-analytics-summary")).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+
+class HabitExportTestCase(APITestCase):
+    """
+    Тесты потоковой выгрузки привычек пользователя в NDJSON.
+    """
+
+    def setUp(self):
+        self.user = Users.objects.create(email="export@example.com", telegram_id="1010")
+        self.stranger = Users.objects.create(email="export-stranger@example.com", telegram_id="1011")
+        habit_data = {"place": "Дом", "periodicity": 7, "execution_time": 60}
+        self.pleasant = Habit.objects.create(
+            user=self.user, time="21:00", action="Ванна", is_pleasant=True, **habit_data
+        )
+        for number in range(6):
+            Habit.objects.create(
+                user=self.user,
+                time=f"07:{number:02d}:15",
+                action=f"Бег {number}",
+                linked_habit=self.pleasant,
+                **habit_data,
+            )
+        Habit.objects.create(user=self.stranger, time="09:00", action="Чужая", **habit_data)
+        self.client.force_authenticate(user=self.user)
+
+    def test_export_matches_serializer(self):
+        """
+        Каждая строка выгрузки совпадает с представлением HabitSerializer, чужие привычки не выгружаются.
+        """
+        response = self.client.get(reverse("habits:habit-export"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        expected = HabitSerializer(Habit.objects.filter(user=self.user).order_by("id"), many=True).data
+        self.assertEqual([json.loads(line) for line in lines], [dict(item) for item in expected])
+
+    def test_export_is_streamed_in_chunks(self):
+        """
+        Выгрузка отдается пачками по мере чтения из базы.
+        """
+        chunks = list(encoders.ndjson_lines(Habit.objects.filter(user=self.user).order_by("id"), chunk_size=3))
+        self.assertEqual([chunk.count(b"\n") for chunk in chunks], [3, 3, 1])
+
+
+class StreamingCursorTestCase(TransactionTestCase):
+    """
+    Потоковое чтение идет серверным курсором внутри транзакции (так он работает и через pgbouncer).
+    """
+
+    def setUp(self):
+        user = Users.objects.create(email="stream@example.com", telegram_id="1020")
+        for number in range(3):
+            Habit.objects.create(
+                user=user, place="Дом", time="00:00", action=f"Бег {number}", periodicity=7, execution_time=60
+            )
+        Habit.objects.update(is_public=True)
+
+    def test_iterators_run_in_transaction(self):
+        """
+        Выгрузка NDJSON, пачки аналитики и ежедневная рассылка читают строки внутри transaction.atomic().
+        """
+        self.assertFalse(connection.settings_dict.get("DISABLE_SERVER_SIDE_CURSORS"))
+        for stream in (
+            encoders.ndjson_lines(Habit.objects.all(), chunk_size=2),
+            analytics.habit_batches(batch_size=2),
+        ):
+            next(stream)
+            self.assertTrue(connection.in_atomic_block)
+            list(stream)
+            self.assertFalse(connection.in_atomic_block)
+
+        with mock.patch("habits.tasks.REMINDER_CHUNK_SIZE", 2), mock.patch(
+            "habits.tasks.send_telegram_batch.delay"
+        ) as delay:
+            in_transaction = []
+            delay.side_effect = lambda chunk: in_transaction.append(connection.in_atomic_block)
+            send_daily_reminders()
+        # Полная пачка ставится в очередь по ходу чтения курсора, остаток — после него
+        self.assertEqual(in_transaction, [True, False])
+
+
+class FastHabitListTestCase(APITestCase):
+    """
+    Тесты быстрого пути списков привычек (values() + orjson).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = Users.objects.create(email="fast@example.com", telegram_id="1020")
+        habit_data = {"periodicity": 7, "execution_time": 60, "is_public": True}
+        pleasant = Habit.objects.create(
+            user=self.user, place="Дом", time="21:00", action="Ванна 🛁", is_pleasant=True, **habit_data
+        )
+        tricky = ['Кавычки "и" \\ слэш', "Строка\u2028и\u2029абзац", "Управляющие \x01\t\n символы", "</script>"]
+        for number, text in enumerate(tricky):
+            Habit.objects.create(
+                user=self.user,
+                place=text,
+                time=f"07:{number:02d}:15.250000",
+                action=f"Бег {number}",
+                linked_habit=pleasant if number % 2 else None,
+                reward=None if number % 2 else text,
+                **habit_data,
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def assert_same_as_serializer(self, url, params):
+        fast = self.client.get(url, params)
+        cache.clear()
+        with mock.patch("habits.views.encoders.accepts_json", return_value=False):
+            regular = self.client.get(url, params)
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast["Content-Type"], regular["Content-Type"])
+        self.assertEqual(fast.content, regular.content)
+        return fast
+
+    def test_list_is_byte_identical(self):
+        """
+        Быстрый путь списка привычек пользователя побайтно совпадает с HabitSerializer + JSONRenderer.
+        """
+        response = self.assert_same_as_serializer(reverse("habits:habit-list-create"), {"page_size": 100})
+        self.assertIn(b"\\u2028", response.content)
+        self.assertEqual(len(response.data["results"]), 5)
+
+        next_page = self.assert_same_as_serializer(reverse("habits:habit-list-create"), {"page_size": 2})
+        self.assertIsNotNone(next_page.data["next"])
+
+    def test_public_feed_is_byte_identical(self):
+        """
+        Быстрый путь ленты публичных привычек побайтно совпадает с HabitSerializer + JSONRenderer.
+        """
+        self.assert_same_as_serializer(reverse("habits:public-habit-list"), {"page_size": 100})
+
+    def test_browsable_api_uses_serializer(self):
+        """
+        Для Browsable API используется обычный путь DRF.
+        """
+        response = self.client.get(reverse("habits:habit-list-create"), HTTP_ACCEPT="text/html")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("text/html", response["Content-Type"])
+
+
+class AsyncHabitViewsTestCase(APITestCase):
+    """
+    Тесты асинхронных представлений привычек.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = Users.objects.create(email="async@example.com", telegram_id="1030")
+        self.stranger = Users.objects.create(email="async-stranger@example.com")
+        habit_data = {"place": "Дом", "time": "08:00", "periodicity": 7, "execution_time": 60, "is_public": True}
+        self.habits = [
+            Habit.objects.create(user=self.user, action=f"Зарядка {number}", **habit_data) for number in range(5)
+        ]
+        self.foreign = Habit.objects.create(user=self.stranger, action="Чужая", **habit_data)
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.client.force_authenticate(user=self.user)
+
+    async def test_list_matches_sync_view(self):
+        """
+        Страницы асинхронного списка совпадают с синхронным, включая курсоры next и previous.
+        """
+        url, params = reverse("habits:habit-list-async"), {"page_size": 2}
+        response = await self.async_client.get(url, params, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        regular = await sync_to_async(self.client.get)(reverse("habits:habit-list-create"), params)
+        self.assertEqual(response.content, regular.content.replace(b"/habits/habits/", url.encode()))
+
+        ids = []
+        while url:
+            page = json.loads((await self.async_client.get(url, params, headers=self.headers)).content)
+            ids += [item["id"] for item in page["results"]]
+            url, params = page["next"], None
+        self.assertEqual(ids, [habit.id for habit in self.habits])
+
+    async def test_previous_pages_match_sync_view(self):
+        """
+        Обратные курсоры (ссылки previous) дают те же страницы и ссылки, что и синхронный список.
+        """
+        url, params = reverse("habits:habit-list-async"), {"page_size": 2}
+        sync_url = reverse("habits:habit-list-create")
+        while url:
+            page = json.loads((await self.async_client.get(url, params, headers=self.headers)).content)
+            url, params = page["next"], None
+
+        ids, url = [], page["previous"]
+        while url:
+            response = await self.async_client.get(url, headers=self.headers)
+            regular = await sync_to_async(self.client.get)(url.replace("/habits/async/", sync_url))
+            self.assertEqual(response.content, regular.content.replace(sync_url.encode(), b"/habits/async/"))
+            page = json.loads(response.content)
+            ids = [item["id"] for item in page["results"]] + ids
+            url = page["previous"]
+        self.assertEqual(ids, [habit.id for habit in self.habits[:4]])
+
+    async def test_requires_token(self):
+        """
+        Без токена или с недействительным токеном возвращается 401, как у синхронных представлений.
+        """
+        response = await self.async_client.get(reverse("habits:habit-list-async"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("detail", json.loads(response.content))
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+
+        response = await self.async_client.get(
+            reverse("habits:habit-list-async"), headers={"Authorization": "Bearer invalid"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_detail(self):
+        """
+        Привычка текущего пользователя возвращается, чужая — 404.
+        """
+        habit = self.habits[0]
+        response = await self.async_client.get(
+            reverse("habits:habit-detail-async", args=[habit.id]), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), json.loads(encoders.dumps(HabitSerializer(habit).data)))
+
+        response = await self.async_client.get(
+            reverse("habits:habit-detail-async", args=[self.foreign.id]), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.async_client.post(
+            reverse("habits:habit-detail-async", args=[habit.id]), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_public_feed_is_cached(self):
+        """
+        Лента публичных привычек доступна без токена, кэшируется и поддерживает условные запросы.
+        """
+        url = reverse("habits:public-habit-list-async")
+        first = await self.async_client.get(url, {"page_size": 100})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(first.content)["results"]), 6)
+
+        with mock.patch("habits.async_views.render_page") as render_page:
+            second = await self.async_client.get(url, {"page_size": 100})
+        self.assertEqual(second.content, first.content)
+        render_page.assert_not_called()
+
+        not_modified = await self.async_client.get(url, {"page_size": 100}, headers={"If-None-Match": first["ETag"]})
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @mock.patch("habits.async_views.send_telegram_message.delay")
+    async def test_remind(self, delay):
+        """
+        Напоминание ставится в очередь только для своей привычки.
+        """
+        response = await self.async_client.post(
+            reverse("habits:habit-remind-async", args=[self.habits[0].id]), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        delay.assert_called_once_with(self.habits[0].id, "1030")
+
+        response = await self.async_client.post(
+            reverse("habits:habit-remind-async", args=[self.foreign.id]), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        delay.assert_called_once()
+
+
+class DatabaseConnectionMetricsTestCase(TestCase):
+    """
+    Тесты метрик соединений с базой и пулов pgbouncer.
+    """
+
+    def test_connect_is_measured(self):
+        """
+        Открытие соединения учитывается в гистограмме времени и счетчике открытых соединений.
+        """
+        before = REGISTRY.get_sample_value("db_connect_seconds_count", {"alias": "other"}) or 0
+        other = connection.copy(alias="other")
+        other.ensure_connection()
+        self.assertEqual(REGISTRY.get_sample_value("db_connect_seconds_count", {"alias": "other"}), before + 1)
+        self.assertEqual(REGISTRY.get_sample_value("db_connections_open", {"alias": "other"}), 1)
+        other.close()
+        self.assertEqual(REGISTRY.get_sample_value("db_connections_open", {"alias": "other"}), 0)
+
+    @override_settings(METRICS_TOKEN="metrics-token")
+    def test_metrics_require_token_or_staff(self):
+        """
+        Метрики отдаются сборщику с токеном и сотрудникам, остальным — 404.
+        """
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 404)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer metrics-token").status_code, 200)
+
+        self.client.force_login(Users.objects.create(email="user@example.com"))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(Users.objects.create(email="staff@example.com", is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(METRICS_TOKEN="metrics-token", PGBOUNCER_STATS_DSN="host=pgbouncer port=6432 dbname=pgbouncer")
+    def test_pgbouncer_pools_in_metrics(self):
+        """
+        Строки SHOW POOLS отдаются как метрики пулов; недоступный pgbouncer дает pgbouncer_up 0.
+        """
+        pools = [
+            {
+                "database": "habits",
+                "user": "app",
+                "cl_active": 12,
+                "cl_waiting": 3,
+                "sv_active": 10,
+                "sv_idle": 2,
+                "maxwait": 1,
+                "maxwait_us": 500000,
+            },
+        ]
+        with mock.patch.object(pgbouncer.PgbouncerCollector, "fetch_pools", return_value=pools):
+            metrics = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer metrics-token").content.decode()
+        self.assertIn("pgbouncer_up 1.0", metrics)
+        self.assertIn('pgbouncer_pool_client_waiting{database="habits",user="app"} 3.0', metrics)
+        self.assertIn('pgbouncer_pool_max_wait_seconds{database="habits",user="app"} 1.5', metrics)
+
+        with mock.patch.object(pgbouncer.psycopg2, "connect", side_effect=psycopg2.OperationalError):
+            metrics = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer metrics-token").content.decode()
+        self.assertIn("pgbouncer_up 0.0", metrics)
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_SLOW_MS=10_000)
+class RequestMetricsTestCase(APITestCase):
+    """
+    Тесты middleware метрик запросов.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = Users.objects.create(email="metrics@example.com")
+        self.habit = Habit.objects.create(
+            user=self.user, place="Дом", time="08:00", action="Зарядка", periodicity=7, execution_time=60
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_and_histograms(self):
+        """
+        Число SQL-запросов и время попадают в Server-Timing и гистограммы по имени маршрута.
+        """
+        labels = {"view": "habits:habit-detail"}
+        before = REGISTRY.get_sample_value("http_request_db_queries_count", labels) or 0
+        response = self.client.get(reverse("habits:habit-detail", args=[self.habit.id]))
+
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="1 queries", total;dur=[\d.]+$')
+        self.assertEqual(REGISTRY.get_sample_value("http_request_db_queries_count", labels), before + 1)
+        self.assertGreater(REGISTRY.get_sample_value("http_response_size_bytes_sum", labels), 0)
+
+    async def test_async_view_queries_are_counted(self):
+        """
+        Запросы асинхронного ORM учитываются так же, как синхронные.
+        """
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        response = await self.async_client.get(reverse("habits:habit-list-async"), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('desc="2 queries"', response["Server-Timing"])
+
+    @override_settings(REQUEST_METRICS_SLOW_MS=0)
+    def test_slow_request_is_logged_with_sql(self):
+        """
+        Медленный запрос записывается в журнал с самыми долгими SQL-запросами.
+        """
+        with self.assertLogs("config.request_metrics", "WARNING") as logs:
+            self.client.get(reverse("habits:habit-list-create"))
+        self.assertIn("habits:habit-list-create", logs.output[0])
+        self.assertIn('SELECT "habits_habit"."id"', logs.output[0])
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_disabled(self):
+        """
+        Без REQUEST_METRICS_ENABLED middleware не подключается.
+        """
+        response = self.client.get(reverse("habits:habit-detail", args=[self.habit.id]))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+
+class CeleryMetricsTestCase(TestCase):
+    """
+    Тесты метрик задач Celery и сводки celery_stats.
+    """
+
+    def setUp(self):
+        self.app = Celery("metrics-test", set_as_current=False)
+
+        @self.app.task(name="metrics.ok")
+        def ok():
+            return "ok"
+
+        @self.app.task(name="metrics.boom")
+        def boom():
+            raise ValueError("boom")
+
+        self.ok, self.boom = ok, boom
+
+    def test_tasks_routed_to_queues(self):
+        """
+        Отправка, постановка и обслуживание идут в свои очереди; после выполнения подтверждаются
+        только задачи, которые безопасно повторить.
+        """
+        queues = {
+            send_telegram_message: ("telegram", True),
+            send_telegram_batch: ("telegram", True),
+            send_daily_reminders: ("scheduling", False),
+            send_due_reminders: ("scheduling", True),
+            retry_failed_reminders: ("scheduling", False),
+            block_inactive_users: ("maintenance", True),
+            create_completion_partitions: ("maintenance", True),
+        }
+        for task, (queue, acks_late) in queues.items():
+            with self.subTest(task=task.name):
+                self.assertEqual(celery_app.amqp.router.route({}, task.name)["queue"].name, queue)
+                self.assertIs(task.acks_late, acks_late)
+
+        collector = mock.Mock(app=celery_app)
+        queues = celery_metrics.QueueLengthCollector.queue_names(collector)
+        self.assertEqual(queues, ["celery", "maintenance", "scheduling", "telegram"])
+
+    @staticmethod
+    def sample(name, task, **labels):
+        return REGISTRY.get_sample_value(name, {"task": task, **labels}) or 0
+
+    def test_publish_headers_inherit_origin(self):
+        """
+        Задача, поставленная из другой задачи, наследует время постановки исходной задачи.
+        """
+        headers = {}
+        celery_metrics.add_enqueue_headers(headers=headers)
+        self.assertEqual(headers["origin_enqueued_at"], headers["enqueued_at"])
+
+        parent = mock.Mock(request=mock.Mock(origin_enqueued_at=100.0))
+        with mock.patch.object(celery_metrics, "current_task", parent):
+            celery_metrics.add_enqueue_headers(headers=headers)
+        self.assertEqual(headers["origin_enqueued_at"], 100.0)
+        self.assertGreater(headers["enqueued_at"], 100.0)
+
+    def test_task_signals_record_metrics(self):
+        """
+        Выполнение задачи учитывается в счетчиках, времени выполнения, ожидании и времени от постановки цепочки.
+        """
+        succeeded = self.sample("celery_tasks_total", "metrics.ok", result="succeeded")
+        failed = self.sample("celery_tasks_total", "metrics.boom", result="failed")
+        now = timezone.now().timestamp()
+
+        self.ok.apply(headers={"enqueued_at": now - 2, "origin_enqueued_at": now - 60})
+        self.boom.apply()
+
+        self.assertEqual(self.sample("celery_tasks_total", "metrics.ok", result="succeeded"), succeeded + 1)
+        self.assertEqual(self.sample("celery_tasks_total", "metrics.boom", result="failed"), failed + 1)
+        self.assertGreater(self.sample("celery_task_runtime_seconds_count", "metrics.boom"), 0)
+        self.assertGreaterEqual(self.sample("celery_task_queue_wait_seconds_sum", "metrics.ok"), 2)
+        self.assertGreaterEqual(self.sample("celery_task_end_to_end_seconds_sum", "metrics.ok"), 60)
+        self.assertEqual(celery_metrics._started, {})
+
+    def test_queue_length_sums_priorities(self):
+        """
+        Длина очереди складывается из списков всех уровней приоритета; недоступный Redis не ломает сбор метрик.
+        """
+        self.app.conf.broker_url = "redis://localhost:6379/0"
+        collector = celery_metrics.QueueLengthCollector(self.app)
+        pipeline = mock.Mock()
+        pipeline.execute.return_value = [4, 1, 0, 2]
+        with mock.patch.object(collector.client, "pipeline", return_value=pipeline):
+            (family,) = list(collector.collect())
+            pipeline.llen.assert_any_call("celery\x06\x163")
+            pipeline.execute.side_effect = celery_metrics.redis.ConnectionError
+            self.assertEqual(list(collector.collect()), [])
+        self.assertEqual([(sample.labels, sample.value) for sample in family.samples], [({"queue": "celery"}, 7)])
+
+    def test_stats_summary(self):
+        """
+        Сводка считает пропускную способность и квантили за интервал и предлагает concurrency по закону Литтла.
+        """
+
+        def metrics(succeeded, buckets, total, queued):
+            lines = [f'celery_tasks_total{{task="send",result="succeeded"}} {succeeded}']
+            for le, count in zip(("0.1", "0.5", "1.0", "+Inf"), buckets):
+                lines.append(f'celery_task_runtime_seconds_bucket{{task="send",le="{le}"}} {count}')
+            lines.append(f'celery_task_runtime_seconds_sum{{task="send"}} {total}')
+            lines.append(f'celery_task_runtime_seconds_count{{task="send"}} {buckets[-1]}')
+            lines.append(f'celery_queue_length{{queue="celery"}} {queued}')
+            return "\n".join(lines) + "\n"
+
+        previous = celery_stats.parse_metrics(metrics(100, (50, 100, 100, 100), 10, 0))
+        current = celery_stats.parse_metrics(metrics(300, (50, 200, 300, 300), 110, 100))
+        summary = celery_stats.summarize(previous, current, elapsed=10)
+
+        (row,) = summary["tasks"]
+        self.assertEqual(row["succeeded"], 200)
+        self.assertEqual(row["rate"], 20)
+        self.assertAlmostEqual(row["p50"], 0.5)
+        self.assertAlmostEqual(row["p95"], 0.95)
+        self.assertEqual(row["mean"], 0.5)
+        # Поступление: 20 завершений/с + 10/с прироста очереди; занято 30/с × 0.5 с = 15 процессов
+        self.assertEqual(summary["arrival_rate"], 30)
+        self.assertEqual(summary["busy"], 15)
+        self.assertEqual(summary["concurrency"], 22)
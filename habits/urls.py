@@ -1,11 +1,44 @@
 from django.urls import path
-from .views import HabitListCreateView, HabitDetailView
+
+from . import async_views
+from .views import (
+    HabitAnalyticsExportView,
+    HabitAnalyticsSummaryView,
+    HabitListCreateView,
+    HabitBulkView,
+    HabitCompletionView,
+    HabitDetailView,
+    HabitDoneView,
+    HabitExportView,
+    HabitStatsView,
+    PublicHabitListView,
+)
 
 app_name = "habits"
 
 urlpatterns = [
     # Маршрут для списка привычек и создания новой
     path("habits/", HabitListCreateView.as_view(), name="habit-list-create"),
+    # Маршрут для выгрузки всех привычек пользователя в NDJSON
+    path("habits/export/", HabitExportView.as_view(), name="habit-export"),
+    # Маршрут для массового создания, обновления и удаления привычек
+    path("habits/bulk/", HabitBulkView.as_view(), name="habit-bulk"),
+    # Маршрут для пакетной записи выполнений привычек
+    path("habits/completions/", HabitCompletionView.as_view(), name="habit-completions"),
+    # Маршрут для статистики привычек пользователя
+    path("habits/stats/", HabitStatsView.as_view(), name="habit-stats"),
+    # Маршруты для выгрузки и сводки привычек для аналитики (только для сотрудников)
+    path("habits/analytics/export/", HabitAnalyticsExportView.as_view(), name="habit-analytics-export"),
+    path("habits/analytics/summary/", HabitAnalyticsSummaryView.as_view(), name="habit-analytics-summary"),
     # Маршрут для просмотра, обновления или удаления конкретной привычки
     path("habits/<int:pk>/", HabitDetailView.as_view(), name="habit-detail"),
+    # Маршрут для отметки о выполнении привычки
+    path("habits/<int:pk>/done/", HabitDoneView.as_view(), name="habit-done"),
+    # Маршрут для ленты публичных привычек
+    path("habits/public/", PublicHabitListView.as_view(), name="public-habit-list"),
+    # Асинхронные варианты чтения привычек и напоминания (для запуска под ASGI)
+    path("async/", async_views.habit_list, name="habit-list-async"),
+    path("async/<int:pk>/", async_views.habit_detail, name="habit-detail-async"),
+    path("async/<int:pk>/remind/", async_views.habit_remind, name="habit-remind-async"),
+    path("async/public/", async_views.public_habit_list, name="public-habit-list-async"),
 ]
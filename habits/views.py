@@ -1,10 +1,21 @@
+import time
+
+import orjson
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from requests import Response
-from rest_framework import generics, viewsets, permissions, status
-from .models import Habit
-from .serializers import HabitSerializer
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.pagination import PageNumberPagination
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.functional import cached_property
+from django.utils import timezone
+from rest_framework import generics, viewsets, permissions, serializers, status
+from rest_framework.response import Response
+from . import analytics, encoders, feed_cache, stats
+from .completions import record_completions
+from .models import Habit, HabitStats
+from .serializers import HabitCompletionSerializer, HabitSerializer, linked_habits_for, load_linked_habits
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
+from rest_framework.pagination import CursorPagination
 from .tasks import send_telegram_message
 
 
@@ -15,21 +26,80 @@ class IsOwner(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         # Разрешение предоставляется только если пользователь является владельцем объекта
-        return obj.user == request.user
+        return obj.user_id == request.user.pk
 
 
-class HabitPagination(PageNumberPagination):
+class HabitPagination(CursorPagination):
     """
-    Класс пагинации для привычек.
+    Курсорная (keyset) пагинация для привычек.
+
+    Страница выбирается условием id > курсора по индексу, поэтому глубокие страницы
+    стоят столько же, сколько первая, а запрос COUNT(*) не выполняется.
 
     Параметры:
         - page_size (int): Количество привычек на одной странице (по умолчанию 5).
+        - page_size_query_param (str): Параметр запроса для выбора размера страницы.
+        - max_page_size (int): Максимальный размер страницы (100).
+        - ordering (str): Стабильный порядок выдачи — по id.
     """
 
     page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = "id"
+
+
+class JSONContentResponse(Response):
+    """
+    Ответ DRF с заранее закодированным JSON (см. encoders.dumps).
+
+    Рендерер не вызывается; data разбирается из готового JSON только при обращении (например, в тестах).
+    """
+
+    def __init__(self, content, **kwargs):
+        self.content_bytes = content
+        super().__init__(**kwargs)
+
+    @property
+    def data(self):
+        return orjson.loads(self.content_bytes)
+
+    @data.setter
+    def data(self, value):
+        pass
+
+    @property
+    def rendered_content(self):
+        self["Content-Type"] = self.content_type or self.accepted_renderer.media_type
+        return self.content_bytes
 
 
-class HabitListCreateView(generics.ListCreateAPIView):
+class FastHabitListMixin:
+    """
+    Быстрый путь чтения списка привычек.
+
+    Если клиенту отдается JSON, страница выбирается через values() и кодируется orjson
+    без HabitSerializer (см. encoders); ответ побайтно совпадает с обычным ответом DRF.
+    Для других форматов (например, Browsable API) используется обычный путь.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not encoders.accepts_json(request):
+            return super().list(request, *args, **kwargs)
+        return JSONContentResponse(self.render_page(request))
+
+    def render_page(self, request):
+        """
+        Возвращает JSON страницы списка в той же форме, что и пагинированный ответ DRF.
+        """
+        queryset = encoders.habit_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return encoders.dumps([encoders.values_to_dict(values) for values in queryset])
+        return encoders.dumps(self.get_paginated_response([encoders.values_to_dict(values) for values in page]).data)
+
+
+class HabitListCreateView(FastHabitListMixin, generics.ListCreateAPIView):
     """
     Представление для получения списка привычек и создания новой привычки.
 
@@ -40,6 +110,10 @@ class HabitListCreateView(generics.ListCreateAPIView):
     Права доступа:
         - Только аутентифицированные пользователи (IsAuthenticated).
 
+    Пагинация:
+        - Используется курсорная пагинация HabitPagination (по 5 привычек на странице, до 100 по page_size).
+        - Страница в JSON формируется без сериализатора (см. FastHabitListMixin).
+
     Особенности:
         - При создании новой привычки она автоматически привязывается к пользователю,
           отправившему запрос.
@@ -48,12 +122,13 @@ class HabitListCreateView(generics.ListCreateAPIView):
     queryset = Habit.objects.all()
     serializer_class = HabitSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = HabitPagination
 
     def get_queryset(self):
         """
         Возвращает список привычек, принадлежащих текущему аутентифицированному пользователю.
         """
-        return Habit.objects.filter(user=self.request.user)
+        return Habit.objects.filter(user_id=self.request.user.pk)
 
     def perform_create(self, serializer):
         """
@@ -64,7 +139,359 @@ class HabitListCreateView(generics.ListCreateAPIView):
         #     serializer.save(user=self.request.user)
         # except ValidationError as e:
         #     return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        serializer.save(user=self.request.user)
+        serializer.save(user_id=self.request.user.pk)
+
+
+class BulkItemsMixin:
+    """
+    Проверка тела запроса пакетных представлений: непустой список не длиннее max_items.
+    """
+
+    max_items = 500
+
+    def get_items(self, data):
+        """
+        Проверяет, что тело запроса — непустой список допустимой длины.
+        """
+        if not isinstance(data, list) or not data:
+            raise serializers.ValidationError({"non_field_errors": ["Ожидается непустой список."]})
+        if len(data) > self.max_items:
+            raise serializers.ValidationError(
+                {"non_field_errors": [f"В одном запросе допускается не больше {self.max_items} элементов."]}
+            )
+        return data
+
+
+class HabitExportView(generics.GenericAPIView):
+    """
+    Представление для выгрузки всех привычек текущего пользователя одним запросом.
+
+    Методы:
+        - GET: Возвращает привычки в формате NDJSON (одна привычка в форме HabitSerializer на строку).
+
+    Права доступа:
+        - Только аутентифицированные пользователи (IsAuthenticated).
+
+    Особенности:
+        - Привычки читаются потоком и кодируются без сериализатора DRF (см. encoders),
+          поэтому память сервера и время до первого байта не зависят от числа привычек.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Возвращает привычки текущего пользователя в порядке id.
+        """
+        return Habit.objects.filter(user_id=self.request.user.pk).order_by("id")
+
+    def get(self, request, *args, **kwargs):
+        """
+        Возвращает потоковую выгрузку привычек в NDJSON.
+        """
+        response = StreamingHttpResponse(
+            encoders.ndjson_lines(self.get_queryset()), content_type="application/x-ndjson"
+        )
+        response["Content-Disposition"] = 'attachment; filename="habits.ndjson"'
+        return response
+
+
+class HabitBulkView(BulkItemsMixin, generics.GenericAPIView):
+    """
+    Представление для массового создания, обновления и удаления привычек текущего пользователя.
+
+    Методы:
+        - POST: Создает привычки из списка.
+        - PATCH: Частично обновляет привычки из списка (каждый элемент содержит id).
+        - DELETE: Удаляет привычки по списку id ({"ids": [...]}).
+
+    Права доступа:
+        - Только аутентифицированные пользователи (IsAuthenticated).
+
+    Особенности:
+        - Все элементы проверяются за один проход; связанные привычки загружаются одним запросом.
+        - Запись выполняется через bulk_create/bulk_update в одной транзакции: если хотя бы
+          один элемент не прошел проверку, ничего не сохраняется, а ответ 400 содержит
+          список ошибок по каждому элементу (пустой объект — элемент корректен).
+        - В одном запросе допускается не больше max_items элементов.
+    """
+
+    serializer_class = HabitSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Возвращает привычки текущего пользователя.
+        """
+        return Habit.objects.filter(user_id=self.request.user.pk)
+
+    @cached_property
+    def linked_habits(self):
+        """
+        Связанные привычки, на которые ссылаются элементы запроса (загружаются одним запросом).
+        """
+        items = self.request.data if isinstance(self.request.data, list) else []
+        return load_linked_habits(items, linked_habits_for(self.request.user))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["linked_habits"] = self.linked_habits
+        return context
+
+    @staticmethod
+    def item_id(item):
+        """
+        Возвращает id привычки из элемента запроса или None, если это не целое число.
+        """
+        pk = item.get("id") if isinstance(item, dict) else None
+        return pk if isinstance(pk, int) and not isinstance(pk, bool) else None
+
+    @staticmethod
+    def clean_errors(habit):
+        """
+        Проверяет привычку правилами модели (Habit.clean) и возвращает ошибки элемента.
+        """
+        try:
+            habit.clean()
+        except ValidationError as exc:
+            return {"non_field_errors": exc.messages}
+        return {}
+
+    def post(self, request, *args, **kwargs):
+        """
+        Создает привычки из списка одним INSERT.
+        """
+        serializer = self.get_serializer(data=self.get_items(request.data), many=True)
+        serializer.is_valid(raise_exception=True)
+
+        habits = [Habit(user_id=request.user.pk, **data) for data in serializer.validated_data]
+        errors = [self.clean_errors(habit) for habit in habits]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        for habit in habits:
+            habit.update_schedule()
+        with transaction.atomic():
+            Habit.objects.bulk_create(habits)
+            if any(habit.is_public for habit in habits):
+                transaction.on_commit(feed_cache.invalidate)
+        return Response(self.get_serializer(habits, many=True).data, status=status.HTTP_201_CREATED)
+
+    def patch(self, request, *args, **kwargs):
+        """
+        Частично обновляет привычки из списка одним UPDATE.
+        """
+        items = self.get_items(request.data)
+        ids = [self.item_id(item) for item in items]
+        habits = self.get_queryset().select_related("linked_habit").in_bulk([pk for pk in ids if pk is not None])
+        context = self.get_serializer_context()
+
+        errors, updates = [], []
+        for item, pk in zip(items, ids):
+            if pk is None:
+                errors.append({"id": ["Ожидается идентификатор привычки."]})
+                continue
+            habit = habits.get(pk)
+            if habit is None:
+                errors.append({"id": ["Привычка не найдена."]})
+                continue
+            serializer = HabitSerializer(habit, data=item, partial=True, context=context)
+            if not serializer.is_valid():
+                errors.append(serializer.errors)
+                continue
+            for attr, value in serializer.validated_data.items():
+                setattr(habit, attr, value)
+            errors.append(self.clean_errors(habit))
+            if not errors[-1]:
+                updates.append((habit, serializer.validated_data.keys()))
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        fields = set()
+        for habit, changed in updates:
+            fields.update(changed)
+            if habit.update_schedule():
+                fields.add("next_due_at")
+        with transaction.atomic():
+            if fields:
+                Habit.objects.bulk_update([habit for habit, _ in updates], fields)
+            if any(habit.is_public or habit._loaded_is_public for habit, _ in updates):
+                transaction.on_commit(feed_cache.invalidate)
+        return Response(self.get_serializer([habit for habit, _ in updates], many=True).data)
+
+    def delete(self, request, *args, **kwargs):
+        """
+        Удаляет привычки по списку id. Отсутствующие id возвращаются в not_found.
+        """
+        ids = request.data.get("ids") if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            raise serializers.ValidationError({"ids": ["Ожидается список идентификаторов привычек."]})
+        self.get_items(ids)
+
+        with transaction.atomic():
+            habits = self.get_queryset().filter(id__in=ids)
+            found = set(habits.values_list("id", flat=True))
+            habits.delete()
+        return Response({"deleted": sorted(found), "not_found": sorted(set(ids) - found)})
+
+
+class HabitCompletionView(BulkItemsMixin, generics.GenericAPIView):
+    """
+    Представление для пакетной записи выполнений привычек текущего пользователя.
+
+    Методы:
+        - POST: Записывает список выполнений [{"habit": id, "completed_at": ...}, ...].
+
+    Права доступа:
+        - Только аутентифицированные пользователи (IsAuthenticated).
+
+    Особенности:
+        - Принадлежность всех привычек пакета пользователю проверяется одним запросом.
+        - Пакет записывается целиком через COPY или многострочный INSERT (см. completions);
+          при ошибке хотя бы в одном элементе ничего не записывается, а ответ 400 содержит
+          список ошибок по каждому элементу.
+        - В одном запросе допускается не больше max_items элементов.
+    """
+
+    serializer_class = HabitCompletionSerializer
+    permission_classes = [IsAuthenticated]
+    max_items = 5000
+
+    def post(self, request, *args, **kwargs):
+        """
+        Записывает пакет выполнений и возвращает количество записанных строк.
+        """
+        serializer = self.get_serializer(data=self.get_items(request.data), many=True)
+        serializer.is_valid(raise_exception=True)
+
+        items = serializer.validated_data
+        owned = set(
+            Habit.objects.filter(user_id=request.user.pk, id__in={item["habit"] for item in items}).values_list(
+                "id", flat=True
+            )
+        )
+        errors = [{} if item["habit"] in owned else {"habit": ["Привычка не найдена."]} for item in items]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        now = timezone.now()
+        created = record_completions([(item["habit"], item.get("completed_at", now)) for item in items])
+        return Response({"created": created}, status=status.HTTP_201_CREATED)
+
+
+class HabitDoneView(generics.GenericAPIView):
+    """
+    Представление для отметки о выполнении привычки.
+
+    Методы:
+        - POST: Записывает выполнение привычки ({"completed_at": ...} необязателен,
+          по умолчанию — момент запроса) и возвращает обновленную статистику привычки.
+
+    Права доступа:
+        - Только владелец привычки (привычки других пользователей не находятся).
+    """
+
+    serializer_class = HabitCompletionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Возвращает привычки текущего пользователя.
+        """
+        return Habit.objects.filter(user_id=self.request.user.pk)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Записывает выполнение привычки и возвращает ее статистику.
+        """
+        habit = self.get_object()
+        data = {"habit": habit.id}
+        if "completed_at" in request.data:
+            data["completed_at"] = request.data["completed_at"]
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+
+        record_completions([(habit.id, serializer.validated_data.get("completed_at", timezone.now()))])
+        habit_stats = HabitStats.objects.filter(habit=habit).first()
+        return Response(stats.habit_summary(habit, habit_stats), status=status.HTTP_201_CREATED)
+
+
+class HabitStatsView(generics.GenericAPIView):
+    """
+    Представление статистики привычек текущего пользователя.
+
+    Методы:
+        - GET: Возвращает серии, долю выполненных периодов по каждой привычке и сводку
+          выполнений за последние недели.
+
+    Права доступа:
+        - Только аутентифицированные пользователи (IsAuthenticated).
+
+    Особенности:
+        - Статистика читается из агрегатов, обновляемых при каждой отметке, поэтому число
+          запросов не зависит от объема истории выполнений.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Возвращает статистику привычек пользователя.
+        """
+        return Response(stats.user_stats(request.user))
+
+
+class HabitAnalyticsExportView(generics.GenericAPIView):
+    """
+    Представление для выгрузки привычек с данными пользователей для аналитики.
+
+    Методы:
+        - GET: Потоково отдает выгрузку в формате из параметра output
+          (parquet, arrow или csv; по умолчанию — первый доступный).
+
+    Права доступа:
+        - Только сотрудники (IsAdminUser).
+
+    Особенности:
+        - Строки читаются из базы и отдаются клиенту пачками, память не зависит от объема выгрузки.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Возвращает потоковую выгрузку привычек.
+        """
+        output_format = request.query_params.get("output") or analytics.available_formats()[0]
+        if output_format not in analytics.available_formats():
+            raise serializers.ValidationError(
+                {"output": [f"Доступные форматы: {', '.join(analytics.available_formats())}."]}
+            )
+        content_type, extension = analytics.CONTENT_TYPES[output_format]
+        response = StreamingHttpResponse(analytics.export_chunks(output_format), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="habits.{extension}"'
+        return response
+
+
+class HabitAnalyticsSummaryView(generics.GenericAPIView):
+    """
+    Представление сводки по привычкам для аналитики.
+
+    Методы:
+        - GET: Возвращает распределения по времени суток, периодичности и длительности,
+          процентили, долю публичных привычек и самые частые действия и места.
+
+    Права доступа:
+        - Только сотрудники (IsAdminUser).
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Возвращает сводку по привычкам.
+        """
+        return Response(analytics.summarize())
+
 
 class HabitDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -77,25 +504,30 @@ class HabitDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     Права доступа:
         - Только владелец привычки может получить доступ (IsAuthenticated + IsOwner).
+
+    Особенности:
+        - Привычка выбирается одним запросом по (pk, user_id): чужая привычка не находится (404),
+          а IsOwner сравнивает user_id без загрузки пользователя.
     """
 
-    queryset = Habit.objects.all()
     serializer_class = HabitSerializer
     permission_classes = [IsAuthenticated, IsOwner]  # Добавляем проверку прав владельца
 
-    def get_permissions(self):
+    def get_queryset(self):
         """
-        Возвращает права доступа для текущего запроса.
+        Возвращает привычки текущего пользователя.
         """
+        return Habit.objects.filter(user_id=self.request.user.pk)
+
+    @cached_property
+    def permissions(self):
         return [permission() for permission in self.permission_classes]
 
-    def get_object(self):
+    def get_permissions(self):
         """
-        Возвращает объект привычки, принадлежащий текущему пользователю.
+        Возвращает права доступа, созданные один раз на запрос (для проверки запроса и объекта).
         """
-        obj = super().get_object()
-        self.check_object_permissions(self.request, obj)  # Проверяем права на уровне объекта
-        return obj
+        return self.permissions
 
 
 class ReminderViewSet(viewsets.ViewSet):
@@ -110,7 +542,7 @@ class ReminderViewSet(viewsets.ViewSet):
 
     Особенности:
         - Используется асинхронная задача для отправки напоминания в Telegram.
-        - Ожидается, что у пользователя в профиле есть поле `telegram_chat_id` для отправки сообщений.
+        - Напоминание отправляется в Telegram владельца привычки (поле telegram_id).
     """
 
     permission_classes = [IsAuthenticated]
@@ -126,13 +558,13 @@ class ReminderViewSet(viewsets.ViewSet):
         Returns:
             Response: Ответ с подтверждением отправки напоминания.
         """
-        habit = Habit.objects.get(id=habit_id, user=request.user)
-        chat_id = request.user.profile.telegram_id  # предполагается, что есть поле в профиле
+        habit = Habit.objects.select_related("user").get(id=habit_id, user_id=request.user.pk)
+        chat_id = habit.user.telegram_id
         send_telegram_message.delay(habit_id, chat_id)
         return Response({"status": "Напоминание отправлено!"})
 
 
-class PublicHabitListView(generics.ListAPIView):
+class PublicHabitListView(FastHabitListMixin, generics.ListAPIView):
     """
     Представление для получения списка публичных привычек.
 
@@ -143,10 +575,44 @@ class PublicHabitListView(generics.ListAPIView):
         - Доступно для всех (AllowAny).
 
     Пагинация:
-        - Используется пагинация HabitPagination (по 5 привычек на странице).
+        - Используется курсорная пагинация HabitPagination (по 5 привычек на странице, до 100 по page_size).
+        - Страница в JSON формируется без сериализатора (см. FastHabitListMixin).
+
+    Кэширование:
+        - Страницы ленты кэшируются в Redis готовым JSON и сбрасываются при изменении публичных привычек
+          (см. feed_cache).
+        - Ответ содержит ETag и Last-Modified (см. feed_cache.conditional_headers); условный запрос
+          без изменений получает 304.
     """
 
     queryset = Habit.objects.filter(is_public=True)
     serializer_class = HabitSerializer
     permission_classes = [AllowAny]
     pagination_class = HabitPagination
+
+    def list(self, request, *args, **kwargs):
+        """
+        Возвращает страницу ленты из кэша или формирует и кэширует ее.
+        """
+        started = time.perf_counter()
+        version, modified = feed_cache.get_state()
+        headers, last_modified = feed_cache.conditional_headers(version, modified, request)
+
+        not_modified = get_conditional_response(request, etag=headers["ETag"], last_modified=last_modified)
+        if not_modified is not None:
+            for header, value in headers.items():
+                not_modified.headers[header] = value
+            feed_cache.observe("not_modified", started)
+            return not_modified
+
+        key = feed_cache.page_key(version, request)
+        content = cache.get(key)
+        result = "hit"
+        if content is None:
+            result = "miss"
+            content = self.render_page(request)
+            cache.set(key, content, feed_cache.timeout())
+        feed_cache.observe(result, started)
+        if not encoders.accepts_json(request):
+            return Response(orjson.loads(content), headers=headers)
+        return JSONContentResponse(content, headers=headers)
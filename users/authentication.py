@@ -0,0 +1,127 @@
+"""
+JWT-аутентификация без загрузки пользователя из базы на каждый запрос.
+
+Пользователь запроса (StatelessUser) строится из токена: id берется из утверждения токена,
+а флаги — из состояния учетной записи, а не из утверждений (они не менялись бы до истечения
+токена). Состояние (is_active, is_staff, is_superuser) хранится в кэше Redis
+AUTH_USER_STATE_TIMEOUT секунд и читается из базы одним узким запросом, только когда
+записи в кэше нет. Поэтому блокировка пользователя (в том числе задачей
+block_inactive_users, которая меняет is_active одним UPDATE) и удаление учетной записи
+вступают в силу не позже чем через AUTH_USER_STATE_TIMEOUT секунд, а изменения через
+save() — сразу (см. users.signals).
+
+Функции:
+    - user_state: Состояние учетной записи из кэша или из базы.
+    - auser_state: Асинхронный вариант user_state.
+    - invalidate_user_state: Удаляет состояние учетной записи из кэша.
+    - check_user_state: Проверяет, что учетная запись существует и активна.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from users.models import Users
+
+STATE_FIELDS = ["is_active", "is_staff", "is_superuser"]
+MISSING = "missing"  # Значение в кэше для удаленной учетной записи
+
+
+def state_key(user_id):
+    return f"users:auth-state:{user_id}"
+
+
+def user_state(user_id):
+    """
+    Возвращает состояние учетной записи ({"is_active", "is_staff", "is_superuser"}) или None, если ее нет.
+    """
+    state = cache.get(state_key(user_id))
+    if state is None:
+        state = Users.objects.filter(pk=user_id).values(*STATE_FIELDS).first() or MISSING
+        cache.set(state_key(user_id), state, settings.AUTH_USER_STATE_TIMEOUT)
+    return None if state == MISSING else state
+
+
+async def auser_state(user_id):
+    """
+    Асинхронно возвращает состояние учетной записи (см. user_state).
+    """
+    state = await cache.aget(state_key(user_id))
+    if state is None:
+        state = await Users.objects.filter(pk=user_id).values(*STATE_FIELDS).afirst() or MISSING
+        await cache.aset(state_key(user_id), state, settings.AUTH_USER_STATE_TIMEOUT)
+    return None if state == MISSING else state
+
+
+def invalidate_user_state(user_id):
+    cache.delete(state_key(user_id))
+
+
+def check_user_state(state):
+    """
+    Проверяет состояние учетной записи так же, как JWTAuthentication проверяет пользователя.
+
+    Raises:
+        AuthenticationFailed: Учетная запись удалена или заблокирована.
+    """
+    if state is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if not state["is_active"]:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+
+def user_id_from_token(validated_token):
+    try:
+        return validated_token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(_("Token contained no recognizable user identification"))
+
+
+class StatelessUser(TokenUser):
+    """
+    Пользователь запроса, построенный из токена, с актуальными флагами учетной записи.
+
+    Для доступа к остальным полям (email, telegram_id и т.д.) пользователя нужно загрузить
+    из базы явно; в запросах к базе используется user_id=request.user.pk.
+    """
+
+    def __init__(self, token, state):
+        super().__init__(token)
+        self.state = state
+
+    @cached_property
+    def is_active(self):
+        return self.state["is_active"]
+
+    @cached_property
+    def is_staff(self):
+        return self.state["is_staff"]
+
+    @cached_property
+    def is_superuser(self):
+        return self.state["is_superuser"]
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT-аутентификация, которая не выполняет запрос к таблице пользователей при попадании в кэш состояния.
+    """
+
+    def get_user(self, validated_token):
+        state = user_state(user_id_from_token(validated_token))
+        check_user_state(state)
+        return StatelessUser(validated_token, state)
+
+
+async def aget_user(validated_token):
+    """
+    Асинхронно возвращает пользователя для проверенного токена (см. StatelessJWTAuthentication).
+    """
+    state = await auser_state(user_id_from_token(validated_token))
+    check_user_state(state)
+    return StatelessUser(validated_token, state)
@@ -0,0 +1,19 @@
+"""
+Сброс кэшированного состояния учетной записи при ее изменении (см. users.authentication).
+
+Кэш сбрасывается после фиксации транзакции, иначе параллельный запрос мог бы снова
+закэшировать старое состояние.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from users.authentication import invalidate_user_state
+from users.models import Users
+
+
+@receiver(post_save, sender=Users)
+@receiver(post_delete, sender=Users)
+def reset_user_state(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_user_state(user_id))
@@ -1,19 +1,42 @@
 from celery import shared_task
+from django.conf import settings
+from django.db.models import Max, Min, Q
 from django.utils import timezone
 from datetime import timedelta
 from users.models import Users
 
 
 @shared_task
-def block_inactive_users():
+def block_inactive_users(batch_size=None):
     """
     Задача для блокировки неактивных пользователей, которые не заходили на сайт больше 30 дней.
+
+    Блокировка выполняется одним UPDATE ... WHERE без загрузки пользователей в память.
+    Если задан batch_size, таблица обходится диапазонами id такого размера, и каждый UPDATE
+    держит блокировки недолго.
+
+    Пользователи, которые ни разу не входили (last_login IS NULL), блокируются, если
+    зарегистрированы раньше порога и включена настройка BLOCK_NEVER_LOGGED_IN_USERS.
+
+    Args:
+        batch_size (int, optional): Размер диапазона id для одного UPDATE. По умолчанию —
+            настройка BLOCK_INACTIVE_USERS_BATCH_SIZE (0 — одним запросом).
     """
     threshold_date = timezone.now() - timedelta(days=30)  # Устанавливаем порог в 30 дней
-    inactive_users = Users.objects.filter(last_login__lt=threshold_date, is_active=True)
+    inactive = Q(last_login__lt=threshold_date)
+    if settings.BLOCK_NEVER_LOGGED_IN_USERS:
+        inactive |= Q(last_login__isnull=True, date_joined__lt=threshold_date)
+    inactive_users = Users.objects.filter(inactive, is_active=True)
 
-    for user in inactive_users:
-        user.is_active = False
-        user.save()
+    if batch_size is None:
+        batch_size = settings.BLOCK_INACTIVE_USERS_BATCH_SIZE
+    if not batch_size:
+        blocked = inactive_users.update(is_active=False)
+    else:
+        bounds = inactive_users.aggregate(first=Min("id"), last=Max("id"))
+        blocked = 0
+        if bounds["first"] is not None:
+            for start in range(bounds["first"], bounds["last"] + 1, batch_size):
+                blocked += inactive_users.filter(id__gte=start, id__lt=start + batch_size).update(is_active=False)
 
-    return f"{len(inactive_users)} пользователей заблокировано."
+    return f"{blocked} пользователей заблокировано."
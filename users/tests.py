@@ -1,7 +1,17 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from users.authentication import state_key
 from users.models import Users
+from users.tasks import block_inactive_users
 
 
 class UsersTests(APITestCase):
@@ -140,3 +150,127 @@ class UsersTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Users.objects.filter(id=self.user.id).exists())
+
+
+class BlockInactiveUsersTests(TestCase):
+    """
+    Тесты задачи блокировки неактивных пользователей.
+    """
+
+    def setUp(self):
+        long_ago = timezone.now() - timedelta(days=45)
+        self.inactive = [
+            Users.objects.create(email=f"inactive{number}@example.com", telegram_id="1", last_login=long_ago)
+            for number in range(3)
+        ]
+        self.active = Users.objects.create(email="active@example.com", telegram_id="2", last_login=timezone.now())
+        self.never_logged_in = Users.objects.create(email="never@example.com", telegram_id="3")
+        Users.objects.filter(pk=self.never_logged_in.pk).update(date_joined=long_ago)
+
+    @override_settings(BLOCK_NEVER_LOGGED_IN_USERS=True)
+    def test_block_in_single_update(self):
+        """
+        Неактивные пользователи блокируются одним запросом UPDATE.
+        """
+        with self.assertNumQueries(1):
+            result = block_inactive_users()
+
+        self.assertEqual(result, "4 пользователей заблокировано.")
+        self.assertEqual(Users.objects.filter(is_active=False).count(), 4)
+        self.assertTrue(Users.objects.get(pk=self.active.pk).is_active)
+
+    @override_settings(BLOCK_NEVER_LOGGED_IN_USERS=True)
+    def test_block_in_id_batches(self):
+        """
+        При заданном batch_size блокировка выполняется по диапазонам id.
+        """
+        result = block_inactive_users(batch_size=2)
+
+        self.assertEqual(result, "4 пользователей заблокировано.")
+        self.assertTrue(Users.objects.get(pk=self.active.pk).is_active)
+
+    def test_never_logged_in_policy(self):
+        """
+        Пользователи без входа по умолчанию не блокируются.
+        """
+        block_inactive_users()
+
+        self.assertTrue(Users.objects.get(pk=self.never_logged_in.pk).is_active)
+        self.assertEqual(Users.objects.filter(is_active=False).count(), 3)
+
+    @override_settings(BLOCK_NEVER_LOGGED_IN_USERS=True)
+    def test_user_logged_in_via_api_is_not_blocked(self):
+        """
+        Вход через users/login/ записывает last_login, и пользователь не считается неактивным.
+        """
+        user = Users.objects.create(email="daily@example.com", telegram_id="4")
+        user.set_password("password")
+        user.save()
+        Users.objects.filter(pk=user.pk).update(date_joined=timezone.now() - timedelta(days=45))
+
+        response = APIClient().post(
+            reverse("users:login"), {"email": "daily@example.com", "password": "password"}, format="json"
+        )
+        block_inactive_users()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertIsNotNone(user.last_login)
+        self.assertTrue(user.is_active)
+
+
+class StatelessJWTAuthenticationTests(APITestCase):
+    """
+    Тесты JWT-аутентификации без запроса пользователя к базе.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = Users.objects.create(email="stateless@example.com", telegram_id="777")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.url = reverse("habits:habit-list-create")
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query["sql"] for query in queries if '"users_users"' in query["sql"]]
+
+    def test_user_is_not_loaded_per_request(self):
+        """
+        Таблица пользователей читается один раз (узким запросом), дальше состояние берется из кэша.
+        """
+        first = self.user_queries()
+        self.assertEqual(len(first), 1)
+        self.assertNotIn('"avatar"', first[0])
+        self.assertEqual(self.user_queries(), [])
+
+    def test_blocked_user_is_rejected(self):
+        """
+        Блокировка через save() действует сразу, через UPDATE (block_inactive_users) — по истечении кэша.
+        """
+        self.user_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        Users.objects.filter(pk=self.user.pk).update(is_active=True)
+        cache.delete(state_key(self.user.pk))  # Истечение AUTH_USER_STATE_TIMEOUT
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        Users.objects.filter(pk=self.user.pk).update(last_login=timezone.now() - timedelta(days=31))
+        block_inactive_users()
+        cache.delete(state_key(self.user.pk))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_flag_comes_from_account(self):
+        """
+        Права сотрудника берутся из учетной записи, а не из утверждений токена.
+        """
+        url = reverse("habits:habit-analytics-summary")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_staff = True
+            self.user.save()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)